@@ -0,0 +1,305 @@
+"""
+Transfer throughput benchmark. It runs the upload and download code of the application, and the bulk list, rename and
+delete, against a local stand-in for Object Storage (see stand_in.py), so changes to UploadManager.upload_file,
+DownloadThread or the bulk helpers can be measured without an account or a network. Run it from this directory with
+
+    python -m benchmark [--sizes 1M,16M,256M] [--concurrency 1,4,16] [--latency MS] [--bandwidth 100M] [--json]
+
+Every file size is uploaded and downloaded at every concurrency. For uploads the concurrency is the number of files uploaded
+at once, for downloads the number of ranges of an object fetched at once, and for rename and delete the number of requests
+at once. Each run reports MiB/s, requests/s, the p50 and p99 time the stand-in took to answer a request and the peak RSS of
+this process. The stand-in runs in its own process, so its work does not count against the client
+"""
+from oci_manager import oci_manager
+from upload_thread import UploadThread
+from download_thread import DownloadThread
+from bulk import run_bulk
+from util import LazyModule
+from urllib.request import urlopen, Request
+import stand_in
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+oci = LazyModule('oci')
+upload_manager = LazyModule('upload_manager')
+
+BUCKET = 'benchmark'
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+WRITE_CHUNK = 4 * 1024 ** 2
+RSS_INTERVAL = 0.05
+# The columns of the table with the number of decimals of numeric values
+COLUMNS = [('operation', None), ('size', None), ('concurrency', 0), ('files', 0), ('seconds', 2), ('MiB/s', 1), ('requests/s', 1),
+    ('p50 ms', 1), ('p99 ms', 1), ('peak RSS MiB', 1)]
+
+def parse_size(size):
+    """
+    :param size: A number of bytes with an optional K, M or G suffix, e.g '16M'
+    :type size: string
+
+    :return: The number of bytes
+    :rtype: int
+    """
+    size = size.strip().upper()
+    if size[-1:] in UNITS:
+        return int(float(size[:-1]) * UNITS[size[-1]])
+    return int(size)
+
+def format_size(size):
+    for unit, factor in sorted(UNITS.items(), key=lambda unit: -unit[1]):
+        if size >= factor and size % factor == 0:
+            return '{}{}'.format(size // factor, unit)
+    return str(size)
+
+def format_row(values):
+    cells = []
+    for (name, decimals), value in zip(COLUMNS, values):
+        width = max(len(name), 9)
+        cells.append('{:<{}}'.format(value, width) if decimals is None or isinstance(value, str) else '{:>{}.{}f}'.format(value, width, decimals))
+    return ' '.join(cells)
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class PeakRss():
+    def __init__(self, interval=RSS_INTERVAL):
+        """
+        Samples the resident set size of this process on a background thread, so the peak of each run can be reported on its own.
+        Where /proc is missing only the peak of the whole process is known, from getrusage
+
+        :param interval: The time between two samples in seconds
+        :type interval: float
+        """
+        self.interval = interval
+        self.peak = 0
+        self.running = False
+        self.thread = None
+
+    def sample(self):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * resource.getpagesize()
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+    def __enter__(self):
+        self.peak = self.sample()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, self.sample())
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, self.sample())
+            time.sleep(self.interval)
+
+
+class StandInManager(oci_manager):
+    def __init__(self, endpoint, config, pool_size):
+        """
+        An OCI manager whose object storage client talks to the stand-in, so the benchmark runs the same code as the application
+
+        :param endpoint: The URL of the stand-in
+        :type endpoint: string
+        :param config: An OCI config with a key to sign requests with. The stand-in does not check the signature
+        :type config: dict
+        :param pool_size: The number of connections to keep open to the stand-in
+        :type pool_size: int
+        """
+        self.DEFAULT_LOCATION = None
+        self.profile = 'stand-in'
+        self.config = config
+        self.pool_size = pool_size
+        self.tenancy = config['tenancy']
+        self.id_client = None
+        self.os_client = oci.object_storage.ObjectStorageClient(config, service_endpoint=endpoint)
+        upload_manager.UploadManager._add_adapter_to_service_client(self.os_client, True, pool_size)
+        self.namespace = self.os_client.get_namespace().data
+        self.compartments = []
+        self.objects = []
+
+
+class Benchmark():
+    def __init__(self, args):
+        """
+        Starts the stand-in and runs the benchmarks chosen on the command line
+
+        :param args: The parsed command line
+        :type args: :class: 'argparse.Namespace'
+        """
+        self.args = args
+        self.directory = tempfile.mkdtemp(prefix='oci-benchmark-')
+        self.results = []
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=stand_in.serve, args=(0, args.latency / 1000, parse_size(args.bandwidth), sender), daemon=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.process.start()
+        self.endpoint = 'http://127.0.0.1:{}'.format(receiver.recv())
+        self.manager = StandInManager(self.endpoint, self.make_config(), max(args.concurrency) * 8)
+
+    def make_config(self):
+        """
+        :return: A config with a key made for the run, since the SDK signs every request
+        :rtype: dict
+        """
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.hazmat.primitives import serialization
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        key_file = os.path.join(self.directory, 'key.pem')
+        with open(key_file, 'wb') as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption()))
+        return {'user': 'ocid1.user.oc1..standin', 'tenancy': 'ocid1.tenancy.oc1..standin', 'fingerprint': '00:' * 15 + '00',
+            'key_file': key_file, 'region': 'us-ashburn-1'}
+
+    def stand_in_request(self, path, method='GET'):
+        with urlopen(Request(self.endpoint + path, method=method, data=b'' if method == 'POST' else None)) as response:
+            return json.loads(response.read())
+
+    def measure(self, operation, size, concurrency, files, function):
+        """
+        Runs one benchmark and records its result
+
+        :param operation: The name of the operation, e.g 'upload'
+        :type operation: string
+        :param size: The size of each file, or None for operations that move no object data
+        :type size: int
+        :param concurrency: The number of requests or files at once
+        :type concurrency: int
+        :param files: The number of files or objects
+        :type files: int
+        :param function: Runs the operation
+        :type function: function
+        """
+        self.stand_in_request('/_reset', 'POST')
+        with PeakRss() as rss, contextlib.redirect_stdout(io.StringIO()):
+            started = time.monotonic()
+            function()
+            seconds = time.monotonic() - started
+        stats = self.stand_in_request('/_stats')
+        durations = [duration * 1000 for _, duration in stats['requests']]
+        result = {'operation': operation, 'size': format_size(size) if size else '-', 'concurrency': concurrency, 'files': files,
+            'seconds': seconds, 'MiB/s': (size or 0) * files / seconds / UNITS['M'], 'requests/s': len(durations) / seconds,
+            'p50 ms': percentile(durations, 0.5), 'p99 ms': percentile(durations, 0.99), 'peak RSS MiB': rss.peak / UNITS['M']}
+        self.results.append(result)
+        if not self.args.json:
+            print(format_row([result[name] for name, _ in COLUMNS]))
+            sys.stdout.flush()
+
+    def make_files(self, size, count):
+        """
+        Writes count files of size bytes. The content is random, so nothing along the way can compress it, but the same for every run
+
+        :return: The paths of the files
+        :rtype: list
+        """
+        directory = os.path.join(self.directory, 'upload-{}'.format(format_size(size)))
+        os.makedirs(directory, exist_ok=True)
+        generator = random.Random(size)
+        paths = []
+        for i in range(count):
+            path = os.path.join(directory, 'bench-{}-{:05d}'.format(format_size(size), i))
+            with open(path, 'wb') as f:
+                left = size
+                while left > 0:
+                    n = min(WRITE_CHUNK, left)
+                    chunk = generator.getrandbits(8 * n).to_bytes(n, 'little')
+                    f.write(chunk)
+                    left -= len(chunk)
+            paths.append(path)
+        return paths
+
+    def upload(self, paths, concurrency):
+        thread = UploadThread((list(paths), None), BUCKET, self.manager, 0, concurrency=concurrency)
+        thread.run()
+        if thread.failed:
+            raise RuntimeError("Upload failed, see the log")
+
+    def download(self, names, concurrency):
+        directory = os.path.join(self.directory, 'download')
+        os.makedirs(directory, exist_ok=True)
+        thread = DownloadThread(list(names), BUCKET, self.manager, 0, concurrency=concurrency)
+        thread.path = directory + '/'
+        thread.run()
+        shutil.rmtree(directory)
+        if thread.objects or thread.current_download:
+            raise RuntimeError("Download failed, see the log")
+
+    def bulk(self, items, function, concurrency):
+        report = run_bulk(items, function, concurrency)
+        if report.failed:
+            raise RuntimeError("{} of {} requests failed, the first with {}".format(len(report.failed), len(items), report.failed[0][1]))
+
+    def run_transfers(self):
+        for size in [parse_size(size) for size in self.args.sizes.split(',')]:
+            count = self.args.files or max(1, parse_size(self.args.total) // size)
+            paths = self.make_files(size, count)
+            names = [os.path.basename(path) for path in paths]
+            for concurrency in self.args.concurrency:
+                self.measure('upload', size, concurrency, count, lambda: self.upload(paths, concurrency))
+                self.measure('download', size, concurrency, count, lambda: self.download(names, concurrency))
+            shutil.rmtree(os.path.dirname(paths[0]))
+
+    def run_metadata(self):
+        os_client = self.manager.get_os()
+        names = ['meta/{:06d}'.format(i) for i in range(self.args.objects)]
+        renamed = ['renamed/{:06d}'.format(i) for i in range(self.args.objects)]
+        for concurrency in self.args.concurrency:
+            self.bulk(names, lambda name: os_client.put_object(self.manager.get_namespace(), BUCKET, name, b''), max(self.args.concurrency))
+            if concurrency == self.args.concurrency[0]:
+                self.measure('list', None, 1, len(names), lambda: sum(1 for _ in self.manager.iter_objects(BUCKET, 'meta/')))
+            self.measure('rename', None, concurrency, len(names),
+                lambda: self.bulk(names, lambda name: self.manager.rename_object(BUCKET, name, 'renamed/' + name[len('meta/'):]), concurrency))
+            self.measure('delete', None, concurrency, len(renamed), lambda: self.bulk(renamed, lambda name: self.manager.delete_object(BUCKET, name), concurrency))
+
+    def run(self):
+        if not self.args.json:
+            print("Stand-in at {}, {} ms latency, {} bandwidth".format(self.endpoint, self.args.latency,
+                '{}/s'.format(self.args.bandwidth) if parse_size(self.args.bandwidth) else 'unlimited'))
+            print(format_row([name for name, _ in COLUMNS]))
+        try:
+            if 'transfers' in self.args.suites:
+                self.run_transfers()
+            if 'metadata' in self.args.suites and self.args.objects:
+                self.run_metadata()
+        finally:
+            self.process.terminate()
+            shutil.rmtree(self.directory, ignore_errors=True)
+        if self.args.json:
+            print(json.dumps(self.results, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmark', description="Transfer throughput benchmark against a local Object Storage stand-in")
+    parser.add_argument('--sizes', default='1M,16M,256M', help="Comma separated file sizes, with an optional K, M or G suffix")
+    parser.add_argument('--concurrency', default='1,4,16', type=lambda value: [int(c) for c in value.split(',')], help="Comma separated concurrencies")
+    parser.add_argument('--total', default='256M', help="The bytes transferred per file size, split into files of that size")
+    parser.add_argument('--files', type=int, help="The number of files per size instead of --total")
+    parser.add_argument('--objects', type=int, default=1000, help="The number of objects listed, renamed and deleted")
+    parser.add_argument('--latency', type=float, default=0, help="Milliseconds the stand-in adds to every request")
+    parser.add_argument('--bandwidth', default='0', help="Bytes per second the stand-in allows in each direction, e.g 100M. 0 for no limit")
+    parser.add_argument('--suites', default='transfers,metadata', help="Comma separated suites to run, transfers and metadata")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON instead of a table")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    Benchmark(parse_args()).run()
@@ -0,0 +1,132 @@
+from collections import namedtuple
+import random
+import time
+from transfers import run_concurrently
+from util import LazyModule
+
+oci = LazyModule('oci')
+
+BULK_CONCURRENCY = 16
+RETRY_ATTEMPTS = 5
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 16
+RETRY_WAIT = 0.1
+BATCH_INTERVAL = 0.25
+
+REPLACE_PREFIX = 'prefix'
+FIND_REPLACE = 'replace'
+
+BulkReport = namedtuple('BulkReport', ['done', 'failed', 'cancelled'])
+
+def is_retryable(error):
+    """
+    :return: True if a request failed because the service was throttling or briefly unavailable, so it may succeed if sent again
+    :rtype: boolean
+    """
+    return isinstance(error, oci.exceptions.ServiceError) and (error.status == 429 or error.status >= 500)
+
+def with_retry(function, is_cancelled=None, attempts=RETRY_ATTEMPTS, delay=RETRY_DELAY):
+    """
+    Wraps a function so that calls failing with a retryable error are made again after an exponential backoff with jitter,
+    see is_retryable. Other errors, and the last retryable one, are raised
+
+    :param function: The function to wrap
+    :type function: function
+    :param is_cancelled: Optional callable. The backoff is cut short and the last error raised once it returns True
+    :type is_cancelled: function
+    :param attempts: The number of calls made at most
+    :type attempts: int
+    :param delay: The backoff before the second call in seconds. It doubles for every call after it, up to MAX_RETRY_DELAY
+    :type delay: float
+
+    :return: The wrapped function
+    :rtype: function
+    """
+    def call(*args, **kwargs):
+        for attempt in range(attempts):
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if attempt == attempts - 1 or not is_retryable(e):
+                    raise
+                wait_until = time.monotonic() + random.uniform(0.5, 1) * min(delay * 2 ** attempt, MAX_RETRY_DELAY)
+                while time.monotonic() < wait_until:
+                    if is_cancelled and is_cancelled():
+                        raise
+                    time.sleep(RETRY_WAIT)
+    return call
+
+def run_bulk(items, function, concurrency=BULK_CONCURRENCY, is_cancelled=None, on_batch=None, interval=BATCH_INTERVAL):
+    """
+    Calls a function on every item on a pool of worker threads, retrying throttled and failed requests, see with_retry.
+    The items that succeed are handed to on_batch in batches at most every interval seconds, so a view showing thousands of
+    items is updated a few times a second instead of once per item
+
+    :param items: The items, e.g. object names
+    :type items: iterable
+    :param function: Called on a worker thread with a single item
+    :type function: function
+    :param concurrency: The number of items processed at once
+    :type concurrency: int
+    :param is_cancelled: Optional callable. No more items are started once it returns True
+    :type is_cancelled: function
+    :param on_batch: Called with a list of the items that succeeded since the last call
+    :type on_batch: function
+    :param interval: The shortest time between two calls of on_batch in seconds
+    :type interval: float
+
+    :return: The number of items that succeeded, the items that failed with their errors, and whether the run was cancelled
+    :rtype: :class: 'BulkReport'
+    """
+    done = 0
+    failed = []
+    batch = []
+    flushed = time.monotonic()
+    for item, _, error in run_concurrently(items, with_retry(function, is_cancelled), concurrency, is_cancelled):
+        if error:
+            failed.append((item, error))
+            continue
+        done += 1
+        batch.append(item)
+        if on_batch and time.monotonic() - flushed >= interval:
+            on_batch(batch)
+            batch = []
+            flushed = time.monotonic()
+    if on_batch and batch:
+        on_batch(batch)
+    return BulkReport(done, failed, bool(is_cancelled and is_cancelled()))
+
+def renamer(find, replace, mode=REPLACE_PREFIX):
+    """
+    :param find: The prefix, or the text, to replace
+    :type find: string
+    :param replace: What it is replaced with
+    :type replace: string
+    :param mode: REPLACE_PREFIX to move the objects under one prefix to another, FIND_REPLACE to replace the text anywhere in the name
+    :type mode: string
+
+    :return: A function giving the new name of an object, or None if the pattern leaves the name unchanged
+    :rtype: function
+    """
+    def rename(name):
+        if mode == REPLACE_PREFIX:
+            new_name = replace + name[len(find):] if name.startswith(find) else name
+        else:
+            new_name = name.replace(find, replace) if find else name
+        return new_name if new_name != name else None
+    return rename
+
+def plan_renames(names, rename):
+    """
+    :param names: The object names
+    :type names: iterable
+    :param rename: Gives the new name of an object, or None to leave it, see renamer
+    :type rename: function
+
+    :return: Tuples of the current and the new name of each object the rename changes
+    :rtype: generator
+    """
+    for name in names:
+        new_name = rename(name)
+        if new_name is not None:
+            yield name, new_name
@@ -0,0 +1,43 @@
+from PySide2.QtCore import Signal, QThread
+from bulk import run_bulk, BULK_CONCURRENCY
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
+
+class BulkThread(QThread):
+
+    batch_done = Signal(object)
+    bulk_finished = Signal(object)
+
+    def __init__(self, items, function, concurrency=BULK_CONCURRENCY):
+        """
+        BulkThread runs one request per item, such as deleting each selected object, off the GUI thread, see bulk.run_bulk.
+        The items that succeeded are emitted in batches and a report is emitted once every item has been tried or the thread is cancelled
+
+        :param items: The items, e.g. object names
+        :type items: list
+        :param function: Called on a worker thread with a single item
+        :type function: function
+        :param concurrency: The number of requests made at once
+        :type concurrency: int
+        """
+        super().__init__()
+        self.items = items
+        self.function = function
+        self.concurrency = concurrency
+        self.threadactive = True
+
+    def run(self):
+        report = run_bulk(self.items, self.function, self.concurrency, lambda: not self.threadactive, self.batch_done.emit)
+        for item, error in report.failed:
+            logger.error("{} failed: {}".format(item, error))
+        self.bulk_finished.emit(report)
+
+    def stop(self):
+        self.threadactive = False
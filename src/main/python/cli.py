@@ -0,0 +1,356 @@
+"""
+Command line client for OCI Object Storage. It shares the transfer engine of the desktop client without importing Qt, so it
+can script bulk transfers on servers. Run it from this directory with
+
+    python -m cli ls [oci://bucket/prefix]
+    python -m cli put FILE_OR_DIRECTORY... oci://bucket/prefix
+    python -m cli get oci://bucket/object_or_prefix [DESTINATION]
+    python -m cli rm oci://bucket/object_or_prefix
+    python -m cli mv oci://bucket/object_or_prefix oci://bucket/new_name_or_prefix
+    python -m cli cp oci://bucket/object_or_prefix oci://bucket/name_or_prefix [--destination-region REGION]
+    python -m cli sync SOURCE DESTINATION
+
+The oci:// scheme is optional, except for sync where it tells which side is the bucket
+"""
+from oci_manager import oci_manager
+from settings import Settings
+from upload_journal import UploadJournal
+from transfers import UploadJob, TransferProgress, RateLimiter, RangedDownloader, iter_upload_jobs, mtime_metadata, run_concurrently
+from sync import UPLOAD, DOWNLOAD, SYNC_FIELDS, scan_local, plan_sync
+from hash_cache import HashCache
+from bulk import with_retry, renamer, plan_renames
+from server_copy import CopySource, CopyItem, CopyDestination, plan_copies, copy_object
+from util import readable_size
+from mimetypes import guess_type
+import argparse
+import itertools
+import sys
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
+
+SCHEME = 'oci://'
+
+def is_remote(path):
+    return path.startswith(SCHEME)
+
+def parse_remote(path):
+    """
+    :param path: A bucket and an optional object name or prefix, e.g 'oci://bucket/folder/'
+    :type path: string
+
+    :return: The bucket name and the object name or prefix
+    :rtype: tuple
+    """
+    if is_remote(path):
+        path = path[len(SCHEME):]
+    bucket_name, _, name = path.partition('/')
+    return bucket_name, name
+
+
+class CommandLine():
+    def __init__(self, args):
+        """
+        Runs the commands of the command line client with the settings, journal and rate limits of the desktop client
+
+        :param args: The parsed command line
+        :type args: :class: 'argparse.Namespace'
+        """
+        self.args = args
+        self.settings = Settings()
+        self.manager = oci_manager(profile=args.profile, pool_size=max(args.jobs or 0, self.settings.pool_size()))
+        self.jobs = args.jobs or self.settings.get_int('upload_concurrency')
+        self.upload_limiter = RateLimiter(self.settings.get_int('upload_rate'))
+        self.download_limiter = RateLimiter(self.settings.get_int('download_rate'))
+        self.progress = TransferProgress(self.publish_progress)
+        self.failures = 0
+        self.upload_manager = None
+
+    def run(self):
+        """
+        :return: The exit status of the command
+        :rtype: int
+        """
+        if not self.manager.get_os():
+            print("Error: Profile {} is not configured".format(self.args.profile), file=sys.stderr)
+            return 1
+        getattr(self, self.args.command)()
+        return 1 if self.failures else 0
+
+    def publish_progress(self, total, files):
+        if sys.stderr.isatty():
+            sys.stderr.write("\r{} transferred, {} in flight  ".format(" ".join(readable_size(total)), len(files)))
+            sys.stderr.flush()
+
+    def report(self, results, action):
+        """
+        Prints the outcome of each transfer as it finishes
+
+        :param results: The results of run_concurrently
+        :type results: generator
+        :param action: Describes a job, e.g 'upload: a.txt to oci://bucket/a.txt'
+        :type action: function
+        """
+        for job, _, error in results:
+            if sys.stderr.isatty():
+                sys.stderr.write("\r")
+            if error:
+                logger.error("Exception occured", exc_info=error)
+                print("Error: {} failed: {}".format(action(job), error), file=sys.stderr)
+                self.failures += 1
+            else:
+                print(action(job))
+
+    def ls(self):
+        if not self.args.path:
+            compartment_id = self.args.compartment or self.manager.get_tenancy()
+            for bucket in self.manager.list_buckets(compartment_id):
+                print(bucket.name)
+            return
+        bucket_name, prefix = parse_remote(self.args.path)
+        kwargs = {} if self.args.recursive else {'delimiter': '/'}
+        if prefix:
+            kwargs['prefix'] = prefix
+        start = None
+        while True:
+            page = self.manager.list_objects(bucket_name, start=start, **kwargs)
+            for name in page.prefixes or []:
+                print("{:>30}  {}".format("PRE", name))
+            for obj in page.objects:
+                print("{:>19} {:>10}  {}".format(str(obj.time_created)[:19], " ".join(readable_size(obj.size or 0)), obj.name))
+            start = page.next_start_with
+            if not start:
+                return
+
+    def get_upload_manager(self):
+        if not self.upload_manager:
+            self.upload_manager = self.manager.get_upload_manager(self.jobs, self.args.part_size, self.args.part_concurrency, UploadJournal(),
+                self.upload_limiter)
+        return self.upload_manager
+
+    def put(self):
+        bucket_name, prefix = parse_remote(self.args.destination)
+        sources = self.args.sources
+        if len(sources) == 1 and os.path.isfile(sources[0]) and prefix and not prefix.endswith('/'):
+            size = os.stat(sources[0]).st_size
+            jobs = iter([UploadJob(prefix, sources[0], " ".join(readable_size(size)), size)])
+        else:
+            if prefix and not prefix.endswith('/'):
+                prefix += '/'
+            jobs = itertools.chain.from_iterable(iter_upload_jobs(source.rstrip(os.sep) or source, prefix) for source in sources)
+        self.report(run_concurrently(jobs, lambda job: self.upload_file(bucket_name, job), self.jobs),
+            lambda job: "upload: {} to {}{}/{}".format(job.file_path, SCHEME, bucket_name, job.object_name))
+
+    def upload_file(self, bucket_name, job):
+        """
+        Uploads a file with the part size and parallelism picked for it. The file's modification time is kept in the object's metadata
+
+        :param job: The file to upload
+        :type job: :class: 'transfers.UploadJob'
+        """
+        upload_manager = self.get_upload_manager()
+        self.progress.start(job.object_name)
+        try:
+            part_size, parallel_process_count = upload_manager.tune(job.filesize_bits)
+            content_type = guess_type(job.object_name)[0] or 'application/octet-stream'
+            return upload_manager.upload_file(self.manager.get_namespace(), bucket_name, job.object_name, job.file_path,
+                progress_callback=lambda bits: self.progress.add(job.object_name, bits), mixin=job, part_size=part_size,
+                parallel_process_count=parallel_process_count, content_type=content_type, metadata=mtime_metadata(job.file_path))
+        finally:
+            self.progress.finish(job.object_name)
+
+    def get(self):
+        bucket_name, prefix = parse_remote(self.args.source)
+        destination = self.args.destination
+        if self.args.recursive:
+            jobs = [(obj.name, os.path.join(destination, obj.name[len(prefix):].lstrip('/')))
+                for obj in self.manager.list_all_objects(bucket_name, prefix, fields='name')]
+        elif os.path.isdir(destination) or destination.endswith(os.sep):
+            jobs = [(prefix, os.path.join(destination, prefix.split('/')[-1]))]
+        else:
+            jobs = [(prefix, destination)]
+        self.download(bucket_name, jobs)
+
+    def download(self, bucket_name, jobs):
+        """
+        Downloads objects on a pool of workers
+
+        :param jobs: Tuples of the object name and the path to write it to
+        :type jobs: iterable
+        """
+        self.report(run_concurrently(jobs, lambda job: self.download_file(bucket_name, *job), self.jobs),
+            lambda job: "download: {}{}/{} to {}".format(SCHEME, bucket_name, job[0], job[1]))
+
+    def download_file(self, bucket_name, object_name, path):
+        """
+        Downloads an object as concurrent byte ranges. A partial download is journaled next to its .tmp file, so running the
+        command again resumes it
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.progress.start(object_name)
+        downloader = RangedDownloader(self.manager.get_os(), self.manager.get_namespace(), bucket_name,
+            self.args.range_size or self.settings.get_int('download_range_size'), self.settings.get_int('download_concurrency'),
+            lambda bits: self.progress.add(object_name, bits), rate_limiter=self.download_limiter)
+        try:
+            downloader.download(object_name, path + ".tmp", path + ".tmp.journal")
+        finally:
+            self.progress.finish(object_name)
+        os.replace(path + ".tmp", path)
+
+    def rm(self):
+        bucket_name, prefix = parse_remote(self.args.path)
+        if self.args.recursive:
+            names = [obj.name for obj in self.manager.list_all_objects(bucket_name, prefix, fields='name')]
+        else:
+            names = [prefix]
+        self.report(run_concurrently(names, with_retry(lambda name: self.manager.delete_object(bucket_name, name)), self.jobs),
+            lambda name: "delete: {}{}/{}".format(SCHEME, bucket_name, name))
+
+    def mv(self):
+        """
+        Renames an object, or with --recursive moves every object under a prefix to another prefix of the same bucket.
+        The prefix is listed in full before anything is renamed, so moving a prefix under itself does not rename objects twice.
+        Objects are not renamed over existing objects unless --force is given
+        """
+        bucket_name, source = parse_remote(self.args.source)
+        destination_bucket, destination = parse_remote(self.args.destination)
+        if bucket_name != destination_bucket:
+            print("Error: objects can only be renamed within a bucket", file=sys.stderr)
+            self.failures += 1
+            return
+        if self.args.recursive:
+            names = [obj.name for obj in self.manager.list_all_objects(bucket_name, source, fields='name')]
+            renames = list(plan_renames(names, renamer(source, destination)))
+        else:
+            renames = [(source, destination)]
+        rename = with_retry(lambda names: self.manager.rename_object(bucket_name, names[0], names[1], self.args.force))
+        self.report(run_concurrently(renames, rename, self.jobs),
+            lambda names: "move: {0}{1}/{2} to {0}{1}/{3}".format(SCHEME, bucket_name, *names))
+
+    def cp(self):
+        """
+        Copies an object, or with --recursive every object under a prefix to another prefix, into a bucket of this or
+        another region. The service copies the data, so nothing is downloaded, and the copies run at once
+        """
+        bucket_name, source = parse_remote(self.args.source)
+        destination_bucket, destination = parse_remote(self.args.destination)
+        item = CopyItem(source, None if self.args.recursive else 0, source)
+        region = self.args.destination_region or self.manager.get_region()
+        copy_destination = CopyDestination(region, self.manager.get_namespace(), destination_bucket, destination)
+        jobs = plan_copies(CopySource(self.manager, bucket_name, [item]), copy_destination)
+        concurrency = self.args.jobs or self.settings.get_int('copy_concurrency')
+        self.report(run_concurrently(jobs, lambda job: copy_object(self.manager, bucket_name, job, copy_destination), concurrency),
+            lambda job: "copy: {}{}/{} to {}{}/{} ({})".format(SCHEME, bucket_name, job.object_name, SCHEME, destination_bucket,
+                job.destination_name, region))
+
+    def sync(self):
+        """
+        Makes a bucket prefix match a directory, or a directory match a bucket prefix, transferring only the files that are
+        missing or changed. With --delete, what the destination has and the source does not is deleted. With --dry-run
+        the actions are only reported
+        """
+        source, destination = self.args.source, self.args.destination
+        if is_remote(source) == is_remote(destination):
+            print("Error: sync needs one local directory and one {} path".format(SCHEME), file=sys.stderr)
+            self.failures += 1
+            return
+        upload = is_remote(destination)
+        directory = source if upload else destination
+        bucket_name, prefix = parse_remote(destination if upload else source)
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        local_files = scan_local(directory) if os.path.isdir(directory) else []
+        remote_objects = self.manager.iter_objects(bucket_name, prefix, fields=SYNC_FIELDS)
+        hash_cache = HashCache(part_size=self.args.part_size)
+        actions = plan_sync(directory, local_files, remote_objects, prefix, upload, self.args.delete, self.args.checksum, hash_cache.hash_file,
+            with_retry(lambda name: self.manager.head_object(bucket_name, name)))
+
+        describe = lambda action: "{}{}: {} ({})".format("(dryrun) " if self.args.dry_run else "", action.action,
+            action.path if action.object_name is None else "{}{}/{}".format(SCHEME, bucket_name, action.object_name), action.reason)
+        if self.args.dry_run:
+            counts = {}
+            for action in actions:
+                print(describe(action))
+                count, size = counts.get(action.action, (0, 0))
+                counts[action.action] = (count + 1, size + action.size)
+            for name, (count, size) in sorted(counts.items()):
+                print("{} {} file(s), {}".format(count, name, " ".join(readable_size(size))))
+            return
+        self.report(run_concurrently(actions, lambda action: self.apply(bucket_name, action), self.jobs), describe)
+
+    def apply(self, bucket_name, action):
+        """
+        Carries out an action of a sync
+
+        :param action: The upload, download or delete
+        :type action: :class: 'sync.SyncAction'
+        """
+        if action.action == UPLOAD:
+            return self.upload_file(bucket_name, UploadJob(action.object_name, action.path, " ".join(readable_size(action.size)), action.size))
+        if action.action == DOWNLOAD:
+            return self.download_file(bucket_name, action.object_name, action.path)
+        if action.object_name is None:
+            return os.remove(action.path)
+        return self.manager.delete_object(bucket_name, action.object_name)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='cli', description="Command line client for OCI Object Storage")
+    parser.add_argument('--profile', default='DEFAULT', help="The profile of the OCI config file to use")
+    parser.add_argument('-j', '--jobs', type=int, help="The number of files transferred at once. Defaults to upload_concurrency, or copy_concurrency for cp")
+    parser.add_argument('--part-size', type=int, help="The multipart part size in bytes. Picked per file by default")
+    parser.add_argument('--part-concurrency', type=int, help="The number of parts of a file uploaded at once. Picked per file by default")
+    parser.add_argument('--range-size', type=int, help="The number of bytes fetched per download request")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    ls = commands.add_parser('ls', help="List the buckets of a compartment or the objects of a bucket")
+    ls.add_argument('path', nargs='?', help="The bucket and prefix to list")
+    ls.add_argument('--compartment', help="The OCID of the compartment whose buckets are listed. Defaults to the tenancy")
+    ls.add_argument('-r', '--recursive', action='store_true', help="List every object under the prefix instead of one level")
+
+    put = commands.add_parser('put', help="Upload files and directories")
+    put.add_argument('sources', nargs='+')
+    put.add_argument('destination', help="The bucket and prefix to upload to")
+
+    get = commands.add_parser('get', help="Download an object, or every object under a prefix")
+    get.add_argument('source', help="The bucket and the object or prefix to download")
+    get.add_argument('destination', nargs='?', default='.', help="The file or directory to download to")
+    get.add_argument('-r', '--recursive', action='store_true', help="Download every object under the prefix")
+
+    rm = commands.add_parser('rm', help="Delete an object, or every object under a prefix")
+    rm.add_argument('path', help="The bucket and the object or prefix to delete")
+    rm.add_argument('-r', '--recursive', action='store_true', help="Delete every object under the prefix")
+
+    mv = commands.add_parser('mv', help="Rename an object, or move every object under a prefix to another prefix")
+    mv.add_argument('source', help="The bucket and the object or prefix to move")
+    mv.add_argument('destination', help="The new name or prefix in the same bucket")
+    mv.add_argument('-r', '--recursive', action='store_true', help="Move every object under the prefix")
+    mv.add_argument('-f', '--force', action='store_true', help="Replace objects that already have the new name")
+
+    cp = commands.add_parser('cp', help="Copy an object, or every object under a prefix, on the service side")
+    cp.add_argument('source', help="The bucket and the object or prefix to copy")
+    cp.add_argument('destination', help="The bucket and the name or prefix of the copy")
+    cp.add_argument('-r', '--recursive', action='store_true', help="Copy every object under the prefix")
+    cp.add_argument('--destination-region', help="The region of the destination bucket. Defaults to the region of the profile")
+
+    sync = commands.add_parser('sync', help="Transfer the files that are missing or changed between a directory and a bucket prefix")
+    sync.add_argument('source')
+    sync.add_argument('destination')
+    sync.add_argument('--delete', action='store_true', help="Delete what the destination has and the source does not")
+    sync.add_argument('--dry-run', action='store_true', help="Report what would be transferred or deleted without doing it")
+    sync.add_argument('--checksum', action='store_true', help="Compare the MD5 of files of the same size even when their times match")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    return CommandLine(parse_args(argv)).run()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+from PySide2.QtCore import Signal, QThread
+from transfers import TransferProgress, run_concurrently
+from server_copy import CopyCancelled, plan_copies, copy_object, COPY_CONCURRENCY
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
+
+class CopyThread(QThread):
+
+    file_copied = Signal(str, str)
+    bytes_copied = Signal(object, object)
+    all_files_copied = Signal(int)
+    copy_failed = Signal()
+    copies_listed = Signal(object)
+
+    def __init__(self, source, destination, thread_id, concurrency=COPY_CONCURRENCY):
+        """
+        CopyThread copies objects to a bucket of the same or another region on the service side, see server_copy.copy_object.
+        Many copies run at once and only their work requests are polled, so no object data passes through this machine
+
+        :param source: The copied objects and folders
+        :type source: :class: 'server_copy.CopySource'
+        :param destination: The bucket and prefix they are pasted into
+        :type destination: :class: 'server_copy.CopyDestination'
+        :param thread_id: The id of the thread
+        :type thread_id: int
+        :param concurrency: The number of copies in progress at once
+        :type concurrency: int
+        """
+        super().__init__()
+        self.source = source
+        self.destination = destination
+        self.thread_id = thread_id
+        self.concurrency = concurrency
+        self.jobs = None
+        self.threadactive = True
+        self.paused = False
+        self.failed = False
+        self.progress = TransferProgress(self.bytes_copied.emit)
+
+    def __del__(self):
+        self.wait()
+
+    def run(self):
+        """
+        Lists the copied folders the first time the thread runs, then copies the objects not copied yet. After a failure or a pause
+        the copies in progress are followed until they finish and the rest are kept for the next run
+        """
+        self.failed = False
+        if self.jobs is None:
+            try:
+                self.jobs = list(plan_copies(self.source, self.destination, lambda: not self.threadactive))
+            except Exception:
+                logger.exception("Listing the objects to copy failed")
+                self.jobs = None
+                self.connection_failed()
+                return
+            self.copies_listed.emit(sum(job.size for job in self.jobs))
+
+        jobs = iter(self.jobs)
+        self.jobs = []
+        for job, _, error in run_concurrently(jobs, self.copy, self.concurrency, lambda: self.failed or self.paused or not self.threadactive):
+            if error:
+                self.jobs.append(job)
+                if not isinstance(error, CopyCancelled):
+                    logger.error("Exception occured", exc_info=error)
+                    self.failed = True
+            else:
+                self.file_copied.emit(job.destination_name, str(job.size))
+        self.jobs.extend(jobs)
+
+        if self.failed and self.threadactive:
+            self.connection_failed()
+        elif not self.jobs:
+            self.all_files_copied.emit(self.thread_id)
+
+    def copy(self, job):
+        self.progress.start(job.object_name)
+        try:
+            return copy_object(self.source.oci_manager, self.source.bucket_name, job, self.destination, self.progress, lambda: not self.threadactive)
+        finally:
+            self.progress.finish(job.object_name)
+
+    def connection_failed(self):
+        print("Connection failed")
+        self.copy_failed.emit()
+
+    def set_rate_limit(self, rate):
+        """
+        Copies are made by the service, so there is no bandwidth of this machine to limit
+        """
+        pass
+
+    def pause(self):
+        """
+        Starts no more copies. The copies in progress run on the service and are followed until they finish
+        """
+        self.paused = True
+
+    def stop(self):
+        """
+        Stops the thread without waiting for it. Copies in progress are cancelled and the thread returns once they are
+        """
+        print("Connection stopped")
+        self.threadactive = False
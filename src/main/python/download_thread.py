@@ -1,19 +1,28 @@
 from PySide2.QtCore import Qt, Signal, QThread
 from oci_manager import oci_manager
 from config import ConfigWindow
-from progress import ProgressWindow
 from util import get_filesize
+from transfers import RangedDownloader, DownloadCancelled, TransferProgress, RateLimiter, DOWNLOAD_RANGE_SIZE, DOWNLOAD_CONCURRENCY
 import sys
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
 
 class DownloadThread(QThread):
 
     file_downloaded = Signal(str, str)
-    bytes_downloaded = Signal(int)
+    bytes_downloaded = Signal(object, object)
     all_files_downloaded = Signal(int)
     download_failed = Signal()
 
-    def __init__(self, objects, bucket_name, oci_manager, thread_id):
+    def __init__(self, objects, bucket_name, oci_manager, thread_id, range_size=DOWNLOAD_RANGE_SIZE, concurrency=DOWNLOAD_CONCURRENCY,
+            rate_limiter=None):
         """
         downloadThread allows download jobs to run in a differen;t thread than the application, so the application doesn't stall or freeze
         
@@ -23,16 +32,27 @@ class DownloadThread(QThread):
         :type bucket_name: string
         :param oci_manager: The OCI manager to use for OCI related tasks
         :type: :class: 'oci_manager.oci_manager'
+        :param range_size: The number of bytes of an object fetched per request
+        :type range_size: int
+        :param concurrency: The number of ranges of an object fetched at once
+        :type concurrency: int
+        :param rate_limiter: Optional limiter shared by every download. The job's own rate set with set_rate_limit overrides it
+        :type rate_limiter: :class: 'transfers.RateLimiter'
         """
         super().__init__()
         self.objects = objects.copy()
+        self.range_size = range_size
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(shared=rate_limiter)
         self.bucket_name = bucket_name
         self.os_client = oci_manager.get_os()
         self.namespace = oci_manager.get_namespace()
         self.threadactive = True
+        self.paused = False
         self.setTerminationEnabled()
         self.thread_id = thread_id
         self.current_download = None
+        self.progress = TransferProgress(self.publish_progress)
 
         self.path = os.path.expanduser('~/Downloads/')
     
@@ -40,64 +60,39 @@ class DownloadThread(QThread):
         print("Connection failed")
         self.download_failed.emit()
     
-    def progress_callback(self, bits):
+    def publish_progress(self, total, files):
         """
-        Callback function for the downloading
+        Called by the job's TransferProgress at most PROGRESS_INTERVAL seconds apart
 
-        :param bits: The amount of bits downloaded
-        :type bits: int
+        :param total: The bytes downloaded for the whole job
+        :type total: int
+        :param files: The bytes downloaded for each object in progress
+        :type files: dict
         """
-        self.bytes_downloaded.emit(bits)
+        self.bytes_downloaded.emit(total, files)
         
     def __del__(self):
         self.wait()
 
-    def stop(self):
-        print("Connection stopped")
-        self.threadactive = False
-        self.wait()
-    
-    def download_file(self, filename, response):
+    def set_rate_limit(self, rate):
         """
-        download the file and pass in a callback function
-
-        :param file: The absolute path of the file
-        :type file: string
+        :param rate: The rate in bytes per second for this job, or 0 to use the shared limit
+        :type rate: int
         """
-        bits = 0
-
-        duplicate = 0
-        dup_modifier = ''
-        name_split = filename.split(".")
-        dup_path = self.path
-
-        if len(name_split) > 1:
-            for i, part in enumerate(name_split):
-                if i < len(name_split) - 1:
-                    dup_path += part
-                if i < len(name_split) - 2:
-                    dup_path += '.'
-            name_split[-1] = '.' + name_split[-1]
-        else:
-            dup_path += name_split.pop()
-            name_split.append('')
-        
-        while os.path.exists(dup_path + dup_modifier + name_split[-1]):
-            duplicate += 1
-            dup_modifier = ' ({})'.format(duplicate)
-        
-        path = dup_path + dup_modifier + name_split[-1]
+        self.rate_limiter.set_rate(rate)
 
-        with open(path, "wb+") as f:
-            for chunk in response.data:
-                if self.threadactive:
-                    bits = f.write(chunk)
-                    # print("{}/{}".format(bits, response.headers['Content-Length']))
-                    self.progress_callback(bits)
-                else:
-                    break
+    def pause(self):
+        """
+        Stops the download in flight after the ranges being fetched. Starting the thread again resumes it from its journal
+        """
+        self.paused = True
 
-        return True
+    def stop(self):
+        """
+        Stops the thread without waiting for it. The download ends after the ranges in flight, and its .tmp file and journal are kept
+        """
+        print("Connection stopped")
+        self.threadactive = False
     
     def get_path(self, filename):
         duplicate = 0
@@ -125,52 +120,39 @@ class DownloadThread(QThread):
     
     def run(self):
         """
-
+        Downloads the objects one after another. Each object is fetched as concurrent byte ranges into a .tmp file that is renamed once complete.
+        The ranges already written are journaled next to the .tmp file, so a retry, or downloading the object again after a restart, resumes it
         """
-
+        downloader = RangedDownloader(self.os_client, self.namespace, self.bucket_name, self.range_size, self.concurrency,
+            is_cancelled=lambda: self.paused or not self.threadactive, rate_limiter=self.rate_limiter)
 
         while self.objects or self.current_download:
             if self.current_download:
                 object_name = self.current_download["object_name"]
+                path = self.current_download["file_path"]
             else:
                 object_name = self.objects.pop()
-                
+                path = self.get_path(object_name)
+                self.current_download = {"object_name":object_name, "file_path":path}
+
+            self.progress.start(object_name)
+            downloader.progress_callback = lambda bits: self.progress.add(object_name, bits)
             try:
-                response = self.os_client.get_object(self.namespace, self.bucket_name, object_name)
-            except:
-                self.connection_failed()
-                print("GET request to object failed")
+                object_size = downloader.download(object_name, path + ".tmp", path + ".tmp.journal")
+            except DownloadCancelled:
                 break
-            print(response.status, response.data, self.threadactive)
-            if response.status == 200 and self.threadactive:
-                object_size = response.headers['Content-Length']
-                self.current_download = {"object_name":object_name, "file_path":self.path + object_name, "object_size": object_size}
-                path = self.get_path(object_name)
-                try:                        
-                    self.f = open(path + ".tmp","wb+")
-                    for chunk in response.data.iter_content(chunk_size=8192):
-                        if self.threadactive:
-                            bits = self.f.write(chunk)
-                            self.progress_callback(bits)
-                        else:
-                            break
-                    self.f.close()
-                    if self.threadactive:
-                        os.rename(path + ".tmp", path)
-                except:
-                    if self.threadactive:
-                        self.connection_failed()
-                        self.f.close()
-                    break
-    
-                self.file_downloaded.emit(object_name, object_size)
-                self.current_download = None
-            else:
-                self.connection_failed()
+            except Exception:
+                logger.exception("Download of {} failed".format(object_name))
+                if self.threadactive:
+                    self.connection_failed()
                 break
+            if not self.threadactive:
+                break
+            os.rename(path + ".tmp", path)
+            self.progress.finish(object_name)
 
-        
-        
+            self.file_downloaded.emit(object_name, str(object_size))
+            self.current_download = None
 
         if not self.objects and not self.current_download:
-            self.all_files_downloaded.emit(self.thread_id)
\ No newline at end of file
+            self.all_files_downloaded.emit(self.thread_id)
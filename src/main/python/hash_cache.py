@@ -0,0 +1,98 @@
+from collections import namedtuple
+import sqlite3
+import threading
+import time
+import os
+from oci_manager import choose_part_size
+from sync import hash_parts
+from transfers import multipart_md5
+
+DEFAULT_LOCATION = os.path.expanduser(os.path.join('~', '.oci', 'object_storage_hashes.db'))
+
+# Files modified this recently are hashed but not cached, since a change within the resolution of the file system clock
+# would leave the cached hash with the size and modification time of the changed file
+RACY_NANOSECONDS = 2 * 10 ** 9
+
+FileHashes = namedtuple('FileHashes', ['md5', 'part_size', 'part_md5s'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, md5 TEXT);
+CREATE TABLE IF NOT EXISTS parts (
+    path TEXT, part_size INTEGER, md5s TEXT,
+    PRIMARY KEY (path, part_size));
+"""
+
+class HashCache():
+    def __init__(self, location=DEFAULT_LOCATION, part_size=None):
+        """
+        HashCache keeps the MD5 of local files in a local SQLite database, together with the MD5 of each part a file is split into
+        when it is uploaded in parts. Entries are keyed by path, size, modification time and inode, so a file that was changed or
+        replaced is hashed again, while comparing unchanged files with their objects reads nothing but the database
+
+        :param location: The path of the SQLite database
+        :type location: string
+        :param part_size: The part size that part MD5s are stored for when a file is hashed. None picks it the way UploadManager does
+        :type part_size: int
+        """
+        self.part_size = part_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(location, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+
+    def get_hashes(self, path, part_size=None):
+        """
+        Returns the hashes of a file, hashing it only if the cache has nothing for the file as it is now. The MD5 of the file and
+        of its parts are computed in the same pass and cached together
+
+        :param path: The file
+        :type path: string
+        :param part_size: The part size to return part MD5s for, or None for the part size of the cache
+        :type part_size: int
+
+        :return: The base64 encoded MD5 of the file and of each of its parts
+        :rtype: :class: 'FileHashes'
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        part_size = part_size or self.part_size or choose_part_size(stat.st_size)
+        identity = (path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        with self.lock:
+            row = self.connection.execute("SELECT files.md5, parts.md5s FROM files LEFT JOIN parts ON parts.path = files.path AND parts.part_size = ? "
+                "WHERE files.path = ? AND size = ? AND mtime_ns = ? AND inode = ?", (part_size,) + identity).fetchone()
+        if row and row[1] is not None:
+            return FileHashes(row[0], part_size, row[1].split(',') if row[1] else [])
+
+        started = int(time.time() * 10 ** 9)
+        md5, part_md5s = hash_parts(path, part_size)
+        stat = os.stat(path)
+        if (path, stat.st_size, stat.st_mtime_ns, stat.st_ino) == identity and started - stat.st_mtime_ns > RACY_NANOSECONDS:
+            with self.lock, self.connection:
+                if not row:
+                    self.connection.execute("DELETE FROM parts WHERE path = ?", (path,))
+                    self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", identity + (md5,))
+                self.connection.execute("INSERT OR REPLACE INTO parts VALUES (?, ?, ?)", (path, part_size, ",".join(part_md5s)))
+        return FileHashes(md5, part_size, part_md5s)
+
+    def hash_file(self, path, part_size=None):
+        """
+        Drop-in replacement for sync.file_md5 that answers from the cache
+
+        :return: The base64 encoded MD5 of the file, or with a part size the MD5 Object Storage gives a multipart upload of it
+        :rtype: string
+        """
+        hashes = self.get_hashes(path, part_size)
+        return multipart_md5(hashes.part_md5s) if part_size else hashes.md5
+
+    def forget_missing(self):
+        """
+        Removes the entries of files that no longer exist
+        """
+        with self.lock:
+            paths = [path for path, in self.connection.execute("SELECT path FROM files")]
+        missing = [(path,) for path in paths if not os.path.exists(path)]
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM parts WHERE path = ?", missing)
+            self.connection.executemany("DELETE FROM files WHERE path = ?", missing)
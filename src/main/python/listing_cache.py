@@ -0,0 +1,157 @@
+from collections import namedtuple
+import sqlite3
+import threading
+import os
+
+DEFAULT_LOCATION = os.path.expanduser(os.path.join('~', '.oci', 'object_storage_cache.db'))
+
+CachedCompartment = namedtuple('CachedCompartment', ['id', 'compartment_id', 'name', 'lifecycle_state'])
+CachedBucket = namedtuple('CachedBucket', ['name'])
+CachedObject = namedtuple('CachedObject', ['name', 'size', 'etag', 'time_created'])
+CachedPage = namedtuple('CachedPage', ['objects', 'prefixes', 'next_start_with'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS compartments (
+    profile TEXT, tenancy TEXT, id TEXT, parent_id TEXT, name TEXT, lifecycle_state TEXT,
+    PRIMARY KEY (profile, tenancy, id));
+CREATE TABLE IF NOT EXISTS buckets (
+    profile TEXT, namespace TEXT, compartment_id TEXT, name TEXT,
+    PRIMARY KEY (profile, namespace, compartment_id, name));
+CREATE TABLE IF NOT EXISTS objects (
+    profile TEXT, namespace TEXT, bucket TEXT, prefix TEXT, delimiter TEXT, name TEXT,
+    size INTEGER, etag TEXT, time_created TEXT, folder INTEGER,
+    PRIMARY KEY (profile, namespace, bucket, prefix, delimiter, name));
+"""
+
+class ListingCache():
+    def __init__(self, location=DEFAULT_LOCATION):
+        """
+        ListingCache keeps the compartments, buckets and objects last listed for each profile in a local SQLite database,
+        so a listing can be shown as soon as it is requested and revalidated against Object Storage in the background.
+
+        Objects are cached per listing, keyed by profile, namespace, bucket, prefix and delimiter. A listing is stored a page at a time
+        and each stored page replaces the cached rows between its first name and the name the next page starts with
+
+        :param location: The path of the SQLite database
+        :type location: string
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(location, check_same_thread=False)
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+
+    def get_compartments(self, profile, tenancy):
+        """
+        :return: The cached compartments of a tenancy
+        :rtype: list
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT id, parent_id, name, lifecycle_state FROM compartments WHERE profile = ? AND tenancy = ?",
+                (profile, tenancy)).fetchall()
+        return [CachedCompartment(*row) for row in rows]
+
+    def store_compartments(self, profile, tenancy, compartments):
+        """
+        Replaces the cached compartments of a tenancy
+
+        :param compartments: Compartments with id, compartment_id, name and lifecycle_state attributes
+        :type compartments: list
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM compartments WHERE profile = ? AND tenancy = ?", (profile, tenancy))
+            self.connection.executemany("INSERT INTO compartments VALUES (?, ?, ?, ?, ?, ?)",
+                [(profile, tenancy, c.id, c.compartment_id, c.name, c.lifecycle_state) for c in compartments])
+
+    def get_child_compartments(self, profile, tenancy, parent_id):
+        """
+        :return: The cached compartments directly under a compartment, sorted by name
+        :rtype: list
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT id, parent_id, name, lifecycle_state FROM compartments WHERE profile = ? AND tenancy = ? AND parent_id = ? ORDER BY name",
+                (profile, tenancy, parent_id)).fetchall()
+        return [CachedCompartment(*row) for row in rows]
+
+    def store_child_compartments(self, profile, tenancy, parent_id, compartments):
+        """
+        Replaces the cached compartments directly under a compartment. Cached compartments further down the hierarchy are kept
+
+        :param compartments: Compartments with id, compartment_id, name and lifecycle_state attributes
+        :type compartments: list
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM compartments WHERE profile = ? AND tenancy = ? AND parent_id = ?", (profile, tenancy, parent_id))
+            self.connection.executemany("INSERT OR REPLACE INTO compartments VALUES (?, ?, ?, ?, ?, ?)",
+                [(profile, tenancy, c.id, c.compartment_id, c.name, c.lifecycle_state) for c in compartments])
+
+    def get_buckets(self, profile, namespace, compartment_id):
+        """
+        :return: The cached buckets of a compartment
+        :rtype: list
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT name FROM buckets WHERE profile = ? AND namespace = ? AND compartment_id = ? ORDER BY name",
+                (profile, namespace, compartment_id)).fetchall()
+        return [CachedBucket(*row) for row in rows]
+
+    def store_buckets(self, profile, namespace, compartment_id, buckets):
+        """
+        Replaces the cached buckets of a compartment
+
+        :param buckets: Buckets with a name attribute
+        :type buckets: list
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM buckets WHERE profile = ? AND namespace = ? AND compartment_id = ?", (profile, namespace, compartment_id))
+            self.connection.executemany("INSERT INTO buckets VALUES (?, ?, ?, ?)",
+                [(profile, namespace, compartment_id, bucket.name) for bucket in buckets])
+
+    def get_objects(self, key, start=None, limit=1000):
+        """
+        Reads a page of a cached object listing in the same shape as a list_objects response
+
+        :param key: The profile, namespace, bucket, prefix and delimiter of the listing
+        :type key: tuple
+        :param start: The object name to start the page from
+        :type start: string
+        :param limit: The maximum number of objects and prefixes to return
+        :type limit: int
+
+        :return: The cached page, with next_start_with set if the cache holds more rows
+        :rtype: :class: 'CachedPage'
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT name, size, etag, time_created, folder FROM objects "
+                "WHERE profile = ? AND namespace = ? AND bucket = ? AND prefix = ? AND delimiter = ? AND name >= ? ORDER BY name LIMIT ?",
+                self.object_key(key) + (start or '', limit + 1)).fetchall()
+        next_start = rows.pop()[0] if len(rows) > limit else None
+        objects = [CachedObject(*row[:4]) for row in rows if not row[4]]
+        prefixes = [row[0] for row in rows if row[4]]
+        return CachedPage(objects, prefixes, next_start)
+
+    def store_objects(self, key, start, data):
+        """
+        Stores a page of an object listing, replacing the cached rows the page covers
+
+        :param key: The profile, namespace, bucket, prefix and delimiter of the listing
+        :type key: tuple
+        :param start: The object name the page was listed from
+        :type start: string
+        :param data: The page of objects
+        :type data: :class: 'oci.object_storage.models.ListObjects'
+        """
+        object_key = self.object_key(key)
+        rows = [object_key + (obj.name, obj.size, obj.etag, str(obj.time_created) if obj.time_created else None, 0) for obj in data.objects]
+        rows += [object_key + (prefix, 0, None, None, 1) for prefix in (data.prefixes or [])]
+        with self.lock, self.connection:
+            if data.next_start_with:
+                self.connection.execute("DELETE FROM objects WHERE profile = ? AND namespace = ? AND bucket = ? AND prefix = ? AND delimiter = ? AND name >= ? AND name < ?",
+                    object_key + (start or '', data.next_start_with))
+            else:
+                self.connection.execute("DELETE FROM objects WHERE profile = ? AND namespace = ? AND bucket = ? AND prefix = ? AND delimiter = ? AND name >= ?",
+                    object_key + (start or '',))
+            self.connection.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def object_key(self, key):
+        profile, namespace, bucket, prefix, delimiter = key
+        return (profile, namespace, bucket, prefix or '', delimiter or '')
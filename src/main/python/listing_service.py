@@ -0,0 +1,135 @@
+from PySide2.QtCore import Signal, QObject, QRunnable, QThreadPool
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
+
+MAX_LISTING_THREADS = 4
+
+class ListingSignals(QObject):
+    listed = Signal(int, object)
+    failed = Signal(int, object)
+
+
+class ListingTask(QRunnable):
+    def __init__(self, token, function, is_cancelled, signals):
+        """
+        ListingTask runs a single listing call on a worker of the listing service's thread pool
+
+        :param token: The token of the request this task belongs to
+        :type token: int
+        :param function: The listing call. It is passed is_cancelled as a keyword argument
+        :type function: function
+        :param is_cancelled: Returns True once the request has been superseded
+        :type is_cancelled: function
+        :param signals: The signals used to hand the result back to the GUI thread
+        :type signals: :class: 'ListingSignals'
+        """
+        super().__init__()
+        self.token = token
+        self.function = function
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+
+    def run(self):
+        if self.is_cancelled():
+            return
+        try:
+            result = self.function(is_cancelled=self.is_cancelled)
+        except Exception as e:
+            logger.exception("Listing request failed")
+            self.signals.failed.emit(self.token, e)
+        else:
+            self.signals.listed.emit(self.token, result)
+
+
+class ListingService(QObject):
+    def __init__(self, max_threads=MAX_LISTING_THREADS):
+        """
+        ListingService runs compartment, bucket and object listing calls on a thread pool so the GUI thread never waits on the network.
+        Requests are made on a channel such as 'buckets' or 'objects'. A new request on a channel, or cancel(), makes the
+        previous request on that channel stale and its result is dropped instead of delivered
+
+        :param max_threads: The number of listing calls that may run at once
+        :type max_threads: int
+        """
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.signals = ListingSignals()
+        self.signals.listed.connect(self.deliver_result)
+        self.signals.failed.connect(self.deliver_error)
+        self.lock = threading.Lock()
+        self.token_count = 0
+        self.current = {}
+        self.pending = {}
+
+    def request(self, channel, function, on_result, on_error=None):
+        """
+        Runs a listing call in the background and supersedes any request still pending on the channel
+
+        :param channel: The name of the channel the request replaces, e.g 'objects'
+        :type channel: string
+        :param function: The listing call. Must accept an is_cancelled keyword argument
+        :type function: function
+        :param on_result: Slot called on the GUI thread with the result of the call
+        :type on_result: function
+        :param on_error: Slot called on the GUI thread with the exception if the call fails
+        :type on_error: function
+
+        :return: The token of the request
+        :rtype: int
+        """
+        with self.lock:
+            self.token_count += 1
+            token = self.token_count
+            stale = self.current.get(channel)
+            self.current[channel] = token
+        if stale in self.pending:
+            del self.pending[stale]
+        self.pending[token] = (channel, on_result, on_error)
+        self.pool.start(ListingTask(token, function, lambda: not self.is_current(channel, token), self.signals))
+        return token
+
+    def is_current(self, channel, token):
+        """
+        :return: True if the token belongs to the latest request on the channel
+        :rtype: boolean
+        """
+        with self.lock:
+            return self.current.get(channel) == token
+
+    def cancel(self, channel):
+        """
+        Makes the pending request on a channel stale so its result is never delivered
+
+        :param channel: The name of the channel
+        :type channel: string
+        """
+        with self.lock:
+            token = self.current.pop(channel, None)
+        if token in self.pending:
+            del self.pending[token]
+
+    def deliver_result(self, token, result):
+        if token in self.pending:
+            channel, on_result, on_error = self.pending.pop(token)
+            if self.is_current(channel, token):
+                with self.lock:
+                    del self.current[channel]
+                on_result(result)
+
+    def deliver_error(self, token, error):
+        if token in self.pending:
+            channel, on_result, on_error = self.pending.pop(token)
+            if self.is_current(channel, token):
+                with self.lock:
+                    del self.current[channel]
+                if on_error:
+                    on_error(error)
@@ -1,19 +1,35 @@
+import time
+
+# Taken before anything else is imported, so the startup times reported include loading the application
+STARTED = time.monotonic()
+
 from fbs_runtime.application_context.PySide2 import ApplicationContext, cached_property
-from PySide2.QtCore import Qt, Signal
+from PySide2.QtCore import Qt, Signal, QTimer, QObject, QEvent
 from PySide2.QtGui import QColor, QCursor
-from PySide2.QtWidgets import QWidget, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QTreeWidget, QTreeWidgetItem, QDialogButtonBox, QDialog, QLineEdit, QAbstractItemView, QMenuBar, QMenu, QAction, QDialog, QMessageBox, QInputDialog, QLabel
-from oci_manager import oci_manager, UploadId
+from PySide2.QtWidgets import QWidget, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QTreeWidget, QTreeWidgetItem, QDialogButtonBox, QDialog, QLineEdit, QAbstractItemView, QMenuBar, QMenu, QAction, QDialog, QMessageBox, QInputDialog, QLabel, QFormLayout, QSpinBox, QProgressDialog
+from oci_manager import oci_manager
 from config import ConfigWindow
-from progress import ProgressWindow
-from util import get_filesize
+from util import get_filesize, readable_size
 from upload_thread import UploadThread
 from download_thread import DownloadThread
+from copy_thread import CopyThread
 from rename import RenameWindow
-from tree import Tree, TreeWidgetItem
+from tree import Tree, TreeWidgetItem, ObjectTree
+from listing_service import ListingService
+from listing_cache import ListingCache
+from settings import Settings
+from upload_journal import UploadJournal, file_unchanged
+from hash_cache import HashCache
+from sync import plan_upload
+from transfers import UploadJob, RateLimiter
+from transfer_queue import TransferQueue
+from transfer_panel import TransferPanel
 import sys
 import os
 import logging
 
+POLL_INTERVAL = 30000
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
@@ -26,6 +42,10 @@ class AppContext(ApplicationContext):
         try:
             # stylesheet = self.get_resource('styles.qss')
             #self.app.setStyleSheet(open(stylesheet).read())
+            startup = StartupTimer(STARTED)
+            self.window.installEventFilter(startup)
+            startup.first_painted.connect(self.central.start)
+            self.central.interactive.connect(startup.set_interactive)
             self.window.show()
             return self.app.exec_()
         except Exception as e:
@@ -45,6 +65,46 @@ class AppContext(ApplicationContext):
         return ConfigWindow('DEFAULT')
 
 
+class StartupTimer(QObject):
+
+    first_painted = Signal()
+
+    def __init__(self, started):
+        """
+        StartupTimer reports how long each launch took to get the window on screen and usable. Time to first paint is taken when
+        the main window is first drawn, and time to interactive once the compartments of the profile are shown. Both are printed
+        and logged. first_painted is emitted once control is back in the event loop after the first frame, so work started from it
+        never holds the frame back
+
+        :param started: The time.monotonic() of the launch
+        :type started: float
+        """
+        super().__init__()
+        self.started = started
+        self.first_paint = None
+        self.interactive = None
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint and self.first_paint is None:
+            self.first_paint = time.monotonic() - self.started
+            self.report("Time to first paint", self.first_paint)
+            QTimer.singleShot(0, self.first_painted.emit)
+        return False
+
+    def set_interactive(self):
+        """
+        Slot for the main window becoming usable. Only the first call of a launch is reported
+        """
+        if self.interactive is None:
+            self.interactive = time.monotonic() - self.started
+            self.report("Time to interactive", self.interactive)
+
+    def report(self, name, seconds):
+        message = "{}: {:.0f} ms".format(name, seconds * 1000)
+        print(message)
+        logger.info(message)
+
+
 class MainWindow(QMainWindow):
     def __init__(self, main_menu, central_widget, config_window):
         """
@@ -68,7 +128,12 @@ class MainWindow(QMainWindow):
         self.menubar.compartment_view.triggered.connect(self.central_widget.compartment_tree.toggle)
         self.menubar.bucket_view.triggered.connect(self.central_widget.bucket_tree.toggle)
         self.menubar.object_view.triggered.connect(self.central_widget.obj_tree.toggle)
+        self.menubar.folder_view.toggled.connect(self.central_widget.obj_tree.set_folder_mode)
+        self.menubar.auto_refresh.toggled.connect(self.central_widget.set_auto_refresh)
         self.menubar.upload_action.triggered.connect(self.central_widget.select_files)
+        self.menubar.sync_action.triggered.connect(self.central_widget.sync_folder_prompt)
+        self.menubar.transfer_view.triggered.connect(self.central_widget.transfer_panel.show)
+        self.menubar.bandwidth_action.triggered.connect(self.central_widget.bandwidth_prompt)
 
         self.setCentralWidget(self.central_widget)
         self.setWindowTitle(self.central_widget.windowTitle())
@@ -100,30 +165,44 @@ class MainWindow(QMainWindow):
 
 
 class CentralWidget(QWidget):
+
+    interactive = Signal()
     
     def __init__(self):
         """
         The central hub for the application. Contains the tree views for compartments, buckets, and objects.
-        Has buttons for uploading files and creating buckets
+        Has buttons for uploading files and creating buckets. The widget is built with placeholder panes and connects to OCI once start is called,
+        so the window can be shown before any network request is made
         """
         super().__init__()
         self.setWindowTitle("OCI Object Storage: Not Connected")
         self.setMinimumSize(800, 600)
         self.profile = 'DEFAULT'
-        self.oci_manager = oci_manager(profile = self.profile)
-
-        try:
-            self.compartment_tree = self.get_compartment_tree()
-        except:
-            print('Error: Failure to establish connection')
-            self.compartment_tree = self.get_placeholder_tree('Compartments', 'Error: Failure to establish connection')
-        else:
-            self.setWindowTitle("OCI Object Storage: {}".format(self.oci_manager.get_namespace()))
-
+        self.settings = Settings()
+        self.oci_manager = None
+        self.listing_service = ListingService()
+        self.listing_cache = ListingCache()
+        self.upload_journal = UploadJournal()
+        self.hash_cache = HashCache(part_size=self.settings.get_auto_int('part_size'))
+        self.copy_source = None
+        self.upload_limiter = RateLimiter(self.settings.get_int('upload_rate'))
+        self.download_limiter = RateLimiter(self.settings.get_int('download_rate'))
+        self.transfer_queue = TransferQueue(self.settings.get_int('max_active_jobs'), self.settings.get_int('max_jobs_per_bucket'))
+        self.transfer_panel = TransferPanel(self.transfer_queue)
+        self.compartment_id = None
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self.obj_tree_poll)
+
+        self.compartment_tree = self.get_placeholder_tree('Compartments', 'Connecting...')
+        self.compartment_tree.setHeaderLabels(['Compartments', 'OCID'])
+        self.compartment_tree.setColumnHidden(1, True)
+        self.compartment_tree.itemClicked.connect(self.select_compartment)
+        self.compartment_tree.itemExpanded.connect(self.load_child_compartments)
+        self.compartment_channels = set()
         self.bucket_tree = self.get_placeholder_tree('Buckets', 'No compartment selected')
-        self.obj_tree = self.get_placeholder_tree('Objects', 'No bucket selected')
-        self.obj_tree.setHeaderLabels(['Objects', 'Size'])
-        self.obj_tree.resizeColumnToContents(0)
+        self.obj_tree = ObjectTree(self.listing_service, self.listing_cache)
 
         self.bucket_tree.itemClicked.connect(self.select_bucket)
 
@@ -151,14 +230,45 @@ class CentralWidget(QWidget):
         self.layout.addWidget(self.obj_tree)
         self.setLayout(self.layout)
 
-        self.upload_threads = {}
-        self.upload_thread_count = 0
-        self.progress_threads = {}
-        self.progress_thread_count = 0
+        self.thread_count = 0
+
+    def start(self):
+        """
+        Connects to OCI with the current profile off the GUI thread, then lists the compartments and offers to resume interrupted uploads
+        """
+        self.connect_profile(self.started)
+
+    def connect_profile(self, on_connected):
+        """
+        Makes the OCI manager of the current profile off the GUI thread, since it reads the config file and fetches the namespace
+
+        :param on_connected: Slot called with the OCI manager
+        :type on_connected: function
+        """
+        pool_size = self.settings.pool_size()
+        profile = self.profile
+        self.listing_service.request('connect', lambda is_cancelled: oci_manager(profile=profile, pool_size=pool_size), on_connected,
+            self.connection_failed)
+
+    def started(self, manager):
+        """
+        Slot for the OCI manager of the first profile
+        """
+        self.profile_connected(manager)
+        QTimer.singleShot(0, self.offer_pending_uploads)
+
+    def connection_failed(self, error):
+        logger.error("Connecting failed", exc_info=error)
+        print('Error: Failure to establish connection')
+        self.set_placeholder_item(self.compartment_tree, 'Error: Failure to establish connection')
+        self.interactive.emit()
 
     def refresh(self, profile=None, prev_compartment=None, prev_bucket=None):
         """
-        Fetchs all TreeWidgets and window title information using the given profile
+        Fetchs all TreeWidgets and window title information using the given profile. Refreshing without a new profile lists the compartments,
+        buckets and loaded objects again in place, so only what changed is updated and the selected bucket stays open.
+        A profile that could not connect, or whose namespace could not be fetched, is connected again instead. A new profile
+        is connected off the GUI thread, see connect_profile
 
         :param profile: Profile containing the required parameters needed for OCI authentication
         :type profile: dict
@@ -169,43 +279,88 @@ class CentralWidget(QWidget):
 
         TODO: Inserting paremeters prev_compartment and prev_bucket do not work as intended. Find a way to keep the activated item state after refresh
         """
-        if profile:
-            self.profile = profile
-        self.oci_manager = oci_manager(profile=self.profile)
+        if not profile:
+            if self.oci_manager is None:
+                # The first connection failed, so connect as start does, which also offers the interrupted uploads
+                self.connect_profile(self.started)
+                return
+            if not self.oci_manager.is_connected():
+                # Nothing can be listed without the namespace, so connect again, which fetches it and rereads the config file
+                self.connect_profile(self.profile_connected)
+                return
+            if self.compartment_items:
+                self.revalidate_compartments()
+            else:
+                self.load_compartments()
+            if self.compartment_id:
+                self.get_buckets_tree_safe(self.compartment_id)
+            self.obj_tree.model().refresh()
+            return
+
+        self.profile = profile
+        self.connect_profile(lambda manager: self.new_profile_connected(manager, prev_compartment, prev_bucket))
+
+    def new_profile_connected(self, manager, prev_compartment=None, prev_bucket=None):
+        """
+        Slot for the OCI manager of a profile given to refresh
+        """
+        self.profile_connected(manager)
+        if prev_compartment:
+            self.select_compartment(self.compartment_tree.itemAt(prev_compartment))
+        if prev_bucket:
+            self.select_bucket(self.bucket_tree.itemAt(prev_bucket))
+
+    def profile_connected(self, manager):
+        """
+        Shows the compartments of a newly connected profile in place of the previous profile's
 
+        :param manager: The OCI manager of the profile
+        :type manager: :class: 'oci_manager.oci_manager'
+        """
+        self.oci_manager = manager
         self.setWindowTitle("OCI Object Storage: {}".format(self.oci_manager.get_namespace()))
         self.parentWidget().change_title()
 
-        try:
-            n1 = self.get_compartment_tree()
-        except:
-            print('Error: Failure to establish connection')
-            n1 = self.get_placeholder_tree('Compartments', 'Error: Failure to establish connection')
+        self.listing_service.cancel('buckets')
+        self.compartment_id = None
+        self.set_placeholder_item(self.bucket_tree, 'No compartment selected')
+        self.obj_tree.set_bucket(self.oci_manager, None)
+        self.load_compartments()
 
-        n2 = self.get_placeholder_tree('Buckets', 'No compartment selected')
-        n3 = self.get_placeholder_tree('Objects', 'No bucket selected')
+    def set_auto_refresh(self, enabled):
+        """
+        Starts or stops polling the open bucket for changes
 
-        self.layout.removeItem(self.layout.itemAt(3))
-        self.obj_tree.setParent(None)
-        self.obj_tree = n3
-        self.layout.insertWidget(3, self.obj_tree)
+        :param enabled: True to list the loaded objects again every POLL_INTERVAL milliseconds
+        :type enabled: boolean
+        """
+        if enabled:
+            self.poll_timer.start()
+        else:
+            self.poll_timer.stop()
 
-        self.layout.removeItem(self.layout.itemAt(2))
-        self.bucket_tree.setParent(None)
-        self.bucket_tree = n2
-        self.layout.insertWidget(2, self.bucket_tree)
+    def obj_tree_poll(self):
+        """
+        Slot for the poll timer. Applies any objects added, removed or changed in the open bucket since it was last listed
+        """
+        if self.obj_tree.bucket_name:
+            self.obj_tree.model().refresh()
 
-        self.layout.removeItem(self.layout.itemAt(1))
-        self.compartment_tree.setParent(None)
-        self.compartment_tree = n1
-        self.layout.insertWidget(1, self.compartment_tree)
+    def bandwidth_prompt(self):
+        """
+        Open a prompt to change the upload and download rate limits. The new limits apply to running transfers straight away
+        """
 
-        self.bucket_tree.itemClicked.connect(self.select_bucket)
+        def set_limits():
+            for name, limiter, spin_box in [('upload_rate', self.upload_limiter, self.bandwidth_form.upload_rate),
+                    ('download_rate', self.download_limiter, self.bandwidth_form.download_rate)]:
+                limiter.set_rate(spin_box.value() * 1024)
+                self.settings.set(name, spin_box.value() * 1024)
+            self.bandwidth_form.hide()
 
-        if prev_compartment:
-            self.select_compartment(self.compartment_tree.itemAt(prev_compartment))
-        if prev_bucket:
-            self.select_bucket(self.bucket_tree.itemAt(prev_bucket))
+        self.bandwidth_form = BandwidthForm(self.upload_limiter.rate // 1024, self.download_limiter.rate // 1024)
+        self.bandwidth_form.button.clicked.connect(set_limits)
+        self.bandwidth_form.show()
 
     def create_bucket_prompt(self):
         """
@@ -244,65 +399,162 @@ class CentralWidget(QWidget):
         else:
             print("Must choose a bucket")        
 
+    def sync_folder_prompt(self):
+        """
+        Asks for a folder to sync with the prefix of the same name in the selected bucket. The uploads the sync needs are planned
+        in the background and listed for confirmation before any file is uploaded
+        """
+        buckets = self.bucket_tree.selectedItems()
+        if not buckets:
+            print("Must choose a bucket")
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Select a folder to sync")
+        if not directory:
+            return
+        bucket_name = buckets[0].text(0)
+        manager = self.oci_manager
+        hash_file = self.hash_cache.hash_file
+        progress = QProgressDialog("Comparing {} with {}...".format(directory, bucket_name), "Cancel", 0, 0, self)
+        progress.setWindowTitle("Sync Folder")
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(lambda: self.listing_service.cancel('sync'))
+        plan = lambda is_cancelled: list(plan_upload(manager, bucket_name, directory, hash_file, is_cancelled))
+        self.listing_service.request('sync', plan, lambda actions: self.sync_planned(progress, directory, bucket_name, actions),
+            lambda error: self.sync_failed(progress, directory, error))
+
+    def sync_planned(self, progress, directory, bucket_name, actions):
+        """
+        Slot for the planned uploads of a folder sync. Shows what would be uploaded and queues the uploads once confirmed
+
+        :param actions: The uploads, see sync.plan_sync
+        :type actions: list
+        """
+        progress.reset()
+        progress.deleteLater()
+        if not actions:
+            QMessageBox.information(self, "Sync Folder", "{} is up to date in {}".format(directory, bucket_name))
+            return
+        sync_prompt = QMessageBox()
+        sync_prompt.setWindowTitle("Sync Folder")
+        sync_prompt.setText("Upload {} new or changed file(s), {}, from {} to {}?".format(len(actions),
+            " ".join(readable_size(sum(action.size for action in actions))), directory, bucket_name))
+        sync_prompt.setDetailedText("\n".join("{} ({})".format(action.object_name, action.reason) for action in actions))
+        sync_prompt.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
+        sync_prompt.setDefaultButton(QMessageBox.Ok)
+        if sync_prompt.exec_() != QMessageBox.Ok:
+            return
+        jobs = [UploadJob(action.object_name, action.path, " ".join(readable_size(action.size)), action.size) for action in actions]
+        self.upload_files(([action.path for action in actions], "All files"), bucket_name, jobs)
+
+    def sync_failed(self, progress, directory, error):
+        progress.reset()
+        progress.deleteLater()
+        logger.error("Sync of {} failed".format(directory), exc_info=error)
+        QMessageBox.warning(self, "Sync Folder", "Comparing {} with the bucket failed: {}".format(directory, getattr(error, 'message', None) or error))
+
     def download_files(self, objects, filesizes, bucket_name):
+        """
+        Queues the download of objects from a bucket in the transfer queue
 
-        c = self.progress_thread_count
-        self.progress_thread_count += 1
-        self.upload_thread_count += 1
+        :param objects: The names of the objects
+        :type objects: list
+        :param filesizes: The size of each object, as returned by util.get_filesize
+        :type filesizes: list
+        :param bucket_name: The name of the bucket to download from
+        :type bucket_name: string
+        """
+        c = self.thread_count
+        self.thread_count += 1
 
-        progress_thread = ProgressWindow((objects, 'All files'), filesizes, c, download=True)
-        download_thread = DownloadThread(objects, bucket_name, self.oci_manager, c)
-        
-        download_thread.file_downloaded.connect(progress_thread.next_file)
-        download_thread.bytes_downloaded.connect(progress_thread.set_progress)
-        download_thread.all_files_downloaded.connect(self.delete_threads)
-        progress_thread.cancel_signal.connect(self.thread_cancelled)
-        download_thread.download_failed.connect(progress_thread.retry_handler)
-        progress_thread.retry.clicked.connect(download_thread.start)
+        download_thread = DownloadThread(objects, bucket_name, self.oci_manager, c,
+            self.settings.get_int('download_range_size'), self.settings.get_int('download_concurrency'), self.download_limiter)
+        self.transfer_queue.add('Download', bucket_name, download_thread, list(objects), sum(filesize[0] for filesize in filesizes))
+        self.transfer_panel.show()
 
-        self.progress_threads[c] = progress_thread
-        self.upload_threads[c] = download_thread
+    def copy_objects(self, source, destination):
+        """
+        Queues a server-side copy of objects and folders in the transfer queue
 
-        self.progress_threads[c].show()
-        self.upload_threads[c].start()
+        :param source: The copied objects and folders
+        :type source: :class: 'server_copy.CopySource'
+        :param destination: The bucket and prefix to copy them to
+        :type destination: :class: 'server_copy.CopyDestination'
+        """
+        c = self.thread_count
+        self.thread_count += 1
 
+        copy_thread = CopyThread(source, destination, c, self.settings.get_int('copy_concurrency'))
+        self.transfer_queue.add('Copy', destination.bucket_name, copy_thread, [item.name for item in source.items],
+            sum(item.size or 0 for item in source.items))
+        self.transfer_panel.show()
 
-    
-    def upload_files(self, files, bucket_name):
+    def upload_files(self, files, bucket_name, jobs=None):
         """
-        Uploads files to a bucket in OCI Object Storage. Can be called from the select_files function.
+        Queues the upload of files to a bucket in OCI Object Storage in the transfer queue. Can be called from the select_files function.
 
         :param files: A tuple of files. First element is a list of absolute paths to the files. Second element is the mimetype of files
         :type files: tuple
         :param bucket_name: The name of bucket to upload file(s) to in OCI
         :type bucket_name: string
+        :param jobs: Upload jobs to run, one for each file, e.g. interrupted uploads to resume
+        :type jobs: list
 
         """
-        
-        filesizes = []
+        c = self.thread_count
+        self.thread_count += 1
 
-        for file in files[0]:
-            filesizes.append(get_filesize(file))
+        upload_thread = UploadThread(files, bucket_name, self.oci_manager, c, self.settings.get_int('upload_concurrency'),
+            self.settings.get_auto_int('part_size'), self.settings.get_auto_int('part_concurrency'), self.upload_journal, jobs, self.upload_limiter)
+        upload_thread.file_uploaded.connect(self.file_uploaded)
+        # Files and directories are sized by the upload thread as it scans them, so nothing is stat'ed here
+        self.transfer_queue.add('Upload', bucket_name, upload_thread, list(files[0]), sum(job.filesize_bits for job in jobs or []))
+        self.transfer_panel.show()
 
-        c = self.progress_thread_count
-        self.progress_thread_count += 1
-        self.upload_thread_count += 1
+    def offer_pending_uploads(self):
+        """
+        Offers to resume the multipart uploads of the current profile that were interrupted when the application last exited.
+        Uploads whose file has since changed cannot be resumed and are aborted
+        """
+        pending = self.upload_journal.pending_uploads(self.oci_manager.get_profile())
+        resumable = [upload for upload in pending if file_unchanged(upload)]
+        for upload in pending:
+            if upload not in resumable:
+                print("{} changed since its upload was interrupted. Aborting upload {}".format(upload.file_path, upload.upload_id))
+                self.discard_pending_upload(upload)
+        if not resumable:
+            return
+
+        resume_prompt = QMessageBox()
+        resume_prompt.setText("{} upload(s) did not finish the last time the application was closed. Resume them?".format(len(resumable)))
+        resume_prompt.setDetailedText("\n".join("{}/{}".format(upload.bucket, upload.object_name) for upload in resumable))
+        resume_prompt.setStandardButtons(QMessageBox.Yes | QMessageBox.Discard | QMessageBox.Cancel)
+        resume_prompt.setDefaultButton(QMessageBox.Yes)
+        ret = resume_prompt.exec_()
+        if ret == QMessageBox.Yes:
+            buckets = {}
+            for upload in resumable:
+                job = UploadJob(upload.object_name, upload.file_path, " ".join(get_filesize(upload.file_path)[1]), upload.file_size)
+                job.upload_id = upload.upload_id
+                job.part_size = upload.part_size
+                buckets.setdefault(upload.bucket, []).append(job)
+            for bucket_name, jobs in buckets.items():
+                self.upload_files(([job.file_path for job in jobs], 'All files'), bucket_name, jobs)
+        elif ret == QMessageBox.Discard:
+            for upload in resumable:
+                self.discard_pending_upload(upload)
+
+    def discard_pending_upload(self, upload):
+        """
+        Aborts an interrupted multipart upload so its parts are not left behind in the bucket, and removes it from the upload journal
 
-        progress_thread = ProgressWindow(files, filesizes, c)
-        upload_thread = UploadThread(files, bucket_name, self.oci_manager, filesizes, c)
-        upload_thread.file_uploaded.connect(progress_thread.next_file)
-        upload_thread.file_uploaded.connect(self.file_uploaded)
-        upload_thread.bytes_uploaded.connect(progress_thread.set_progress)
-        upload_thread.all_files_uploaded.connect(self.delete_threads)
-        upload_thread.upload_failed.connect(progress_thread.retry_handler)
-        progress_thread.cancel_signal.connect(self.thread_cancelled)
-        progress_thread.retry.clicked.connect(upload_thread.start)
-        # progress_thread.setMinimumHeight(50)
-        self.progress_threads[c] = progress_thread
-        self.upload_threads[c] = upload_thread
-
-        self.progress_threads[c].show()
-        self.upload_threads[c].start()
+        :param upload: The interrupted upload
+        :type upload: :class: 'upload_journal.PendingUpload'
+        """
+        try:
+            self.oci_manager.abort_multipart_upload(upload.bucket, upload.object_name, upload.upload_id)
+        except Exception:
+            print("Error: Failure to abort upload {}".format(upload.upload_id))
+        self.upload_journal.finish_upload(upload.upload_id)
 
     def file_uploaded(self, filename, filesize, bucket_name, filesize_bits):
         """
@@ -318,88 +570,199 @@ class CentralWidget(QWidget):
         items = [item.text(0) for item in self.bucket_tree.selectedItems()]
 
         if items and items[0] == bucket_name:
-            obj_tree_item = TreeWidgetItem(self.obj_tree)
-            obj_tree_item.setText(0, filename)
-            obj_tree_item.setText(1, filesize)
-            obj_tree_item.setText(2, str(filesize_bits))
+            self.obj_tree.model().add_object(filename, filesize_bits)
     
-    def delete_threads(self, thread_id):
+    def load_compartments(self):
         """
-        Deletes the upload thread from the dictionary of upload threads when it completes
-
-        :param thread_id: The id given to the thread upon creation
-        :type thread_id: int
+        Shows the top level of the compartment tree and lists the rest of the hierarchy in the background. Each level of the tree
+        is only built when its compartment is expanded, and is shown from the listing cache if it was listed before, even under another profile session
         """
-        print("All files uploaded. Deleting upload thread")
-        if thread_id in self.upload_threads:
-            del self.upload_threads[thread_id]
-    
-    
-    def thread_cancelled(self, thread_id):
+        for channel in self.compartment_channels:
+            self.listing_service.cancel(channel)
+        self.compartment_channels = set()
+        self.compartment_items = {}
+        self.loaded_compartments = set()
+        self.compartment_parents = None
+
+        tenancy = self.oci_manager.get_tenancy()
+        self.compartment_tree.clear()
+        root = TreeWidgetItem(self.compartment_tree)
+        root.setText(0, '(root)')
+        root.setText(1, tenancy)
+        root.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        self.compartment_items[tenancy] = root
+        self.load_child_compartments(root)
+        root.setExpanded(True)
+        self.revalidate_compartments()
+
+    def revalidate_compartments(self):
         """
-        Deletes the upload thread and progress window threads from their respective dictionaries when the job is cancelled
-
-        :param thread_id: The id given to the threads upon creation
-        :type thread_id: int
+        Lists every compartment in the tenancy in the background and stores the hierarchy in the listing cache. The levels of the tree
+        that are already shown are updated in place, and compartments expanded afterwards are shown from the cache without another request
         """
+        manager = self.oci_manager
+        profile, tenancy = manager.get_profile(), manager.get_tenancy()
 
-        self.upload_threads[thread_id].stop()
-        if thread_id in self.upload_threads:
-            del self.upload_threads[thread_id]
-        if thread_id in self.progress_threads:
-            del self.progress_threads[thread_id]
+        def list_compartments(is_cancelled):
+            data = manager.list_compartments(is_cancelled=is_cancelled)
+            self.listing_cache.store_compartments(profile, tenancy, data)
+            return data
 
-    def get_compartment_tree(self):
+        self.compartment_channels.add('compartments')
+        self.listing_service.request('compartments', list_compartments, self.hierarchy_listed, self.revalidation_failed)
+
+    def load_child_compartments(self, item):
         """
-        Using the current profile, constructs a tree widget that displays a directory of compartments and subcompartments
+        Slot to list the compartments directly under a compartment the first time it is expanded
 
-        :return: A tree widget that displays a directory of compartments and subcompartments
-        :rtype :class: QTreeWidget
+        :param item: The expanded compartment tree item
+        :type item: QTreeWidgetItem
         """
+        ocid = item.text(1)
+        if item.isDisabled() or ocid in self.loaded_compartments:
+            return
+        self.loaded_compartments.add(ocid)
+        manager = self.oci_manager
+        profile, tenancy = manager.get_profile(), manager.get_tenancy()
+        cached = self.listing_cache.get_child_compartments(profile, tenancy, ocid)
+        if self.compartment_parents is not None:
+            self.populate_child_compartments(ocid, cached)
+            return
+        if cached:
+            self.populate_child_compartments(ocid, cached)
+        else:
+            self.set_child_placeholder(item, 'Loading compartments...')
 
-        root = self.oci_manager.get_tenancy()
-        compartments = self.oci_manager.get_id().list_compartments(root, compartment_id_in_subtree=True)
+        def list_compartments(is_cancelled):
+            data = manager.list_compartments(ocid, subtree=False, is_cancelled=is_cancelled)
+            self.listing_cache.store_child_compartments(profile, tenancy, ocid, data)
+            return data
 
-        data = compartments.data
+        channel = 'compartments:' + ocid
+        self.compartment_channels.add(channel)
+        self.listing_service.request(channel, list_compartments, lambda data: self.populate_child_compartments(ocid, data),
+            self.revalidation_failed if cached else lambda error: self.compartments_failed(ocid, error))
 
-        compartment_dic = {}
-        hierarchy = {}
-        tree_dic = {}
+    def revalidation_failed(self, error):
+        """
+        Slot for a failed listing whose cached result is already on screen. The cached result is kept
+
+        :param error: The exception raised by the listing call
+        :type error: Exception
+        """
+        print("Error: Failure to refresh listing, showing cached results")
+
+    def compartments_failed(self, ocid, error):
+        """
+        Slot to show a failed compartment listing under the compartment it was listed for
+
+        :param ocid: The OCID of the parent compartment
+        :type ocid: string
+        :param error: The exception raised by the listing call
+        :type error: Exception
+        """
+        self.loaded_compartments.discard(ocid)
+        if ocid == self.oci_manager.get_tenancy():
+            print('Error: Failure to establish connection')
+            self.set_placeholder_item(self.compartment_tree, 'Error: Failure to establish connection')
+            self.compartment_items = {}
+            self.interactive.emit()
+            return
+        item = self.compartment_items.get(ocid)
+        if item is not None:
+            print("You do not have authorization to perform this request, or the requested resource could not be found")
+            self.set_child_placeholder(item, 'You do not have authorization to perform this request, or the requested resource could not be found')
 
-        while compartments.next_page:
-            compartments = self.oci_manager.get_id().list_compartments(root, compartment_id_in_subtree=True, page=compartments.next_page)
-            data += compartments.data
+    def hierarchy_listed(self, data):
+        """
+        Slot to update the shown levels of the compartment tree with a listing of the whole hierarchy
 
+        :param data: Every compartment in the tenancy
+        :type data: list
+        """
+        hierarchy = {}
         for compartment in data:
-            if (compartment.lifecycle_state == 'ACTIVE'):
-                compartment_dic[compartment.id] = compartment
-                if compartment.compartment_id in hierarchy:
-                    hierarchy[compartment.compartment_id] += [compartment.id]
-                else:
-                    hierarchy[compartment.compartment_id] = [compartment.id]
+            if compartment.lifecycle_state == 'ACTIVE':
+                hierarchy.setdefault(compartment.compartment_id, []).append(compartment)
+        self.compartment_parents = set(hierarchy)
+        for ocid in list(self.loaded_compartments):
+            self.populate_child_compartments(ocid, hierarchy.get(ocid, []))
+        for ocid, item in self.compartment_items.items():
+            if ocid not in self.loaded_compartments and ocid not in hierarchy:
+                item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
+
+    def populate_child_compartments(self, ocid, data):
+        """
+        Slot to update the items under a compartment with its listed children. Items of compartments that are still listed are kept,
+        so subtrees the user has expanded stay expanded
 
-        tree_widget = Tree()
-        tree_widget.setHeaderLabels(['Compartments', 'OCID'])
-        tree_dic[root] = TreeWidgetItem(tree_widget)
-        tree_dic[root].setText(0, '(root)')
-        tree_dic[root].setText(1, root)
+        :param ocid: The OCID of the parent compartment
+        :type ocid: string
+        :param data: The compartments directly under the parent
+        :type data: list
+        """
+        item = self.compartment_items.get(ocid)
+        if item is None:
+            return
+        listed = {compartment.id: compartment for compartment in data if compartment.lifecycle_state == 'ACTIVE'}
+        for i in reversed(range(item.childCount())):
+            child = item.child(i)
+            if child.isDisabled() or child.text(1) not in listed:
+                self.remove_compartment_item(child)
+        for compartment in listed.values():
+            child = self.compartment_items.get(compartment.id)
+            if child is not None and child.parent() is not item:
+                self.remove_compartment_item(child)
+                child = None
+            if child is None:
+                child = TreeWidgetItem(item)
+                child.setText(1, compartment.id)
+                self.compartment_items[compartment.id] = child
+                if self.compartment_parents is None or compartment.id in self.compartment_parents:
+                    child.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            if child.text(0) != compartment.name:
+                child.setText(0, compartment.name)
+        if not listed:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
+
+        if ocid == self.oci_manager.get_tenancy():
+            self.setWindowTitle("OCI Object Storage: {}".format(self.oci_manager.get_namespace()))
+            if self.parentWidget():
+                self.parentWidget().change_title()
+            self.interactive.emit()
+
+    def remove_compartment_item(self, item):
+        """
+        Removes a compartment tree item and forgets the compartments below it
 
-        stack = [root]
+        :param item: The compartment tree item to remove
+        :type item: QTreeWidgetItem
+        """
+        stack = [item]
         while stack:
-            compartment_id = stack.pop()
-            parent_tree = tree_dic[compartment_id]
-            for child_id in hierarchy[compartment_id]:
-                child_tree = TreeWidgetItem(parent_tree)
-                child_tree.setText(0, compartment_dic[child_id].name)
-                child_tree.setText(1, child_id)
-                tree_dic[child_id] = child_tree
-                if child_id in hierarchy:
-                    stack.append(child_id)
-    
-        tree_widget.itemClicked.connect(self.select_compartment)
-        tree_widget.setColumnHidden(1, True)
-        return tree_widget
-    
+            node = stack.pop()
+            if not node.isDisabled() and self.compartment_items.get(node.text(1)) is node:
+                del self.compartment_items[node.text(1)]
+                self.loaded_compartments.discard(node.text(1))
+            stack.extend(node.child(i) for i in range(node.childCount()))
+        item.parent().removeChild(item)
+
+    def set_child_placeholder(self, item, text):
+        """
+        Replaces the children of a tree item with a single greyed out item, e.g while its children are loading
+
+        :param item: The tree item to clear
+        :type item: QTreeWidgetItem
+        :param text: The tree item text to display
+        :type text: string
+        """
+        for i in reversed(range(item.childCount())):
+            self.remove_compartment_item(item.child(i))
+        child = TreeWidgetItem(item)
+        child.setText(0, text)
+        child.setTextColor(0, QColor(220,220,220))
+        child.setDisabled(True)
+
     def select_compartment(self, item):
         """
         Slot to populate the bucket and object list view when a compartment is activated
@@ -417,74 +780,58 @@ class CentralWidget(QWidget):
             self.get_objects_tree_safe(None)
             # self.layout.insertWidget(3, self.obj_tree)
     
-    def get_buckets_tree(self, ocid):
+    def get_buckets_tree_safe(self, ocid):
         """
-        Constructs a tree widget that displays a list of buckets
+        Lists the buckets of a compartment in the background into the bucket tree. A request for a previously clicked compartment is cancelled.
+        Buckets cached for the compartment are shown until the listing arrives
 
         :param ocid: The OCID of the compartment
         :type ocid: string
+        """
+        self.compartment_id = ocid
+        manager = self.oci_manager
+        profile, namespace = manager.get_profile(), manager.get_namespace()
+        cached = self.listing_cache.get_buckets(profile, namespace, ocid)
+        if cached:
+            self.populate_bucket_tree(cached)
+        else:
+            self.set_placeholder_item(self.bucket_tree, 'Loading buckets...')
+
+        def list_buckets(is_cancelled):
+            data = manager.list_buckets(ocid, is_cancelled)
+            self.listing_cache.store_buckets(profile, namespace, ocid, data)
+            return data
+
+        self.listing_service.request('buckets', list_buckets, self.populate_bucket_tree,
+            self.revalidation_failed if cached else self.buckets_failed)
 
-        :return: A tree widget that displays a list of buckets
-        :rtype :class: QTreeWidget
+    def buckets_failed(self, error):
         """
-        namespace = self.oci_manager.get_namespace()
-        tree_widget = Tree()
-        tree_widget.setHeaderLabel('Buckets')
-        data = []
-        try:
-            data = self.oci_manager.get_os().list_buckets(namespace, ocid).data
-        except:
-            print("You do not have authorization to perform this request, or the requested resource could not be found")
-            bucket_tree = TreeWidgetItem(tree_widget)
-            bucket_tree.setText(0, 'You do not have authorization to perform this request, or the requested resource could not be found')
-            bucket_tree.setTextColor(0, QColor(220,220,220))
-        finally:
-            if not data:
-                bucket_tree = TreeWidgetItem(tree_widget)
-                bucket_tree.setText(0, 'Compartment contains no buckets')
-                bucket_tree.setTextColor(0, QColor(220,220,220))
-            else:
-                for bucket in data:
-                    print(bucket.name)
-                    bucket_tree = TreeWidgetItem(tree_widget)
-                    bucket_tree.setText(0, bucket.name)
-                tree_widget.itemClicked.connect(self.select_bucket)
+        Slot to show a failed bucket listing in the bucket tree
 
-        return tree_widget
-    
-    def get_buckets_tree_safe(self, ocid):
+        :param error: The exception raised by the listing call
+        :type error: Exception
         """
-        Constructs a tree widget that displays a list of buckets
+        print("You do not have authorization to perform this request, or the requested resource could not be found")
+        self.set_placeholder_item(self.bucket_tree, 'You do not have authorization to perform this request, or the requested resource could not be found')
 
-        :param ocid: The OCID of the compartment
-        :type ocid: string
+    def populate_bucket_tree(self, data):
+        """
+        Slot to fill the bucket tree with the buckets of a compartment
 
-        :return: A tree widget that displays a list of buckets
-        :rtype :class: QTreeWidget
+        :param data: The bucket summaries of the compartment
+        :type data: list
         """
-        namespace = self.oci_manager.get_namespace()
-        self.bucket_tree.clear()
-        data = []
-        try:
-            data = self.oci_manager.get_os().list_buckets(namespace, ocid).data
-        except:
-            print("You do not have authorization to perform this request, or the requested resource could not be found")
-            bucket_tree_item = TreeWidgetItem(self.bucket_tree)
-            bucket_tree_item.setText(0, 'You do not have authorization to perform this request, or the requested resource could not be found')
-            bucket_tree_item.setTextColor(0, QColor(220,220,220))
-            bucket_tree_item.setDisabled(True)
-        finally:
-            if not data:
+        if not data:
+            self.set_placeholder_item(self.bucket_tree, 'Compartment contains no buckets')
+        else:
+            shown = [self.bucket_tree.topLevelItem(i).text(0) for i in range(self.bucket_tree.topLevelItemCount())]
+            if sorted(shown) == sorted(bucket.name for bucket in data):
+                return
+            self.bucket_tree.clear()
+            for bucket in data:
                 bucket_tree_item = TreeWidgetItem(self.bucket_tree)
-                bucket_tree_item.setText(0, 'Compartment contains no buckets')
-                bucket_tree_item.setTextColor(0, QColor(220,220,220))
-                bucket_tree_item.setDisabled(True)
-            else:
-                for bucket in data:
-                    print(bucket.name)
-                    bucket_tree_item = TreeWidgetItem(self.bucket_tree)
-                    bucket_tree_item.setText(0, bucket.name)
-                # self.bucket_tree.itemClicked.connect(self.select_bucket)
+                bucket_tree_item.setText(0, bucket.name)
     
     def select_bucket(self, item):
         """
@@ -499,81 +846,15 @@ class CentralWidget(QWidget):
             self.get_objects_tree_safe(item.text(0))
             # self.layout.insertWidget(3, self.obj_tree)
     
-    def get_objects_tree(self, bucket_name):
-        """
-        Constructs a tree widget that displays a list of objects in a bucket
-
-        :param bucket_name: The name of the bucket
-        :type bucket_name: string
-
-        :return: A tree widget that displays a directory of compartments and subcompartments
-        :rtype :class: QTreeWidget
-        """
-        namespace = self.oci_manager.get_namespace()
-
-        tree_widget = Tree(accept_drop=True, bucket_name=bucket_name, oci_manager=self.oci_manager)
-        tree_widget.setColumnCount(2)
-        tree_widget.setHeaderLabels(['Objects', 'Size'])
-
-        byte_type = ['KB', 'MB', 'GB', 'TB', 'PB']
-
-        data = self.oci_manager.get_os().list_objects(namespace, bucket_name, fields='size').data.objects
-
-        for obj in data:
-            print(obj.name)
-            obj_tree_item = TreeWidgetItem(tree_widget)
-            obj_tree_item.setText(0, obj.name)
-            byte_type_pointer = 0
-            byte_size = obj.size/1024.0
-            while byte_size > 1024:
-                byte_size = byte_size/1024.0
-                byte_type_pointer += 1
-            byte_size = round(byte_size, 2)
-            obj_tree_item.setText(1, "{} {}".format(str(byte_size), byte_type[byte_type_pointer]))
-
-        return tree_widget
-
     def get_objects_tree_safe(self, bucket_name):
         """
-        Constructs a tree widget that displays a list of objects in a bucket
+        Points the object view at a bucket. Objects are listed a page at a time by the view's model as the user scrolls
 
         :param bucket_name: The name of the bucket
         :type bucket_name: string
+        """
+        self.obj_tree.set_bucket(self.oci_manager, bucket_name)
 
-        :return: A tree widget that displays a directory of compartments and subcompartments
-        :rtype :class: QTreeWidget
-        """
-        self.obj_tree.clear()
-        if bucket_name:
-            if not self.obj_tree.accept_drop:
-                self.obj_tree.accept_drop = True
-                self.obj_tree.object_tree_init()
-            if not self.obj_tree.oci_manager:
-                self.obj_tree.oci_manager = self.oci_manager
-            self.obj_tree.bucket_name = bucket_name
-            namespace = self.oci_manager.get_namespace()
-            byte_type = ['KB', 'MB', 'GB', 'TB', 'PB']
-
-            data = self.oci_manager.get_os().list_objects(namespace, bucket_name, fields='size').data.objects
-            for obj in data:
-                print(obj.name)
-                obj_tree_item = TreeWidgetItem(self.obj_tree)
-                obj_tree_item.setText(0, obj.name)
-                byte_type_pointer = 0
-                byte_size = obj.size/1024.0
-                while byte_size > 1024:
-                    byte_size = byte_size/1024.0
-                    byte_type_pointer += 1
-                byte_size = round(byte_size, 2)
-                obj_tree_item.setText(1, "{} {}".format(str(byte_size), byte_type[byte_type_pointer]))
-                obj_tree_item.setText(2, str(obj.size))
-        else:
-            tree_item = TreeWidgetItem(self.obj_tree)
-            tree_item.setText(0, "No bucket selected")
-            tree_item.setTextColor(0, QColor(220,220,220))
-            tree_item.setDisabled(True)
-            self.obj_tree.accept_drop = False
-            
     def get_placeholder_tree(self, header, text):
         """
         Create a placeholder tree widget for situations where real object storage information is not fetched
@@ -588,11 +869,23 @@ class CentralWidget(QWidget):
         """
         tree_widget = Tree()
         tree_widget.setHeaderLabel(header)
+        self.set_placeholder_item(tree_widget, text)
+        return tree_widget
+
+    def set_placeholder_item(self, tree_widget, text):
+        """
+        Replaces the contents of a tree widget with a single greyed out item, e.g while a listing is loading
+
+        :param tree_widget: The tree widget to clear
+        :type tree_widget: QTreeWidget
+        :param text: The tree item text to display in tree
+        :type text: string
+        """
+        tree_widget.clear()
         tree_item = TreeWidgetItem(tree_widget)
         tree_item.setText(0, text)
         tree_item.setTextColor(0, QColor(220,220,220))
         tree_item.setDisabled(True)
-        return tree_widget
 
 
 class CreateBucketForm(QDialog):
@@ -611,6 +904,33 @@ class CreateBucketForm(QDialog):
         self.setLayout(layout)
 
 
+class BandwidthForm(QDialog):
+    def __init__(self, upload_rate, download_rate, parent=None):
+        """
+        A BandwidthForm prompts users with a dialog to set the upload and download rate limits shared by every transfer
+
+        :param upload_rate: The current upload rate limit in KB/s, 0 for no limit
+        :type upload_rate: int
+        :param download_rate: The current download rate limit in KB/s, 0 for no limit
+        :type download_rate: int
+        """
+        super(BandwidthForm, self).__init__(parent)
+        self.setWindowTitle("Bandwidth Limits")
+        layout = QFormLayout()
+        self.upload_rate = QSpinBox()
+        self.download_rate = QSpinBox()
+        for spin_box, rate in [(self.upload_rate, upload_rate), (self.download_rate, download_rate)]:
+            spin_box.setRange(0, 10 ** 7)
+            spin_box.setSuffix(" KB/s")
+            spin_box.setSpecialValueText("No limit")
+            spin_box.setValue(rate)
+        self.button = QPushButton("Save")
+        layout.addRow("Upload", self.upload_rate)
+        layout.addRow("Download", self.download_rate)
+        layout.addRow(self.button)
+        self.setLayout(layout)
+
+
 class MainMenu(QMenuBar):
 
     toggle_compartment = Signal()
@@ -638,10 +958,12 @@ class MainMenu(QMenuBar):
 
         self.file_menu = self.addMenu('&File')
         self.upload_action = self.file_menu.addAction("Upload File(s)")
+        self.sync_action = self.file_menu.addAction("Sync Folder...")
         # self.file_menu.triggered.connect(self.upload_file_handler)
         self.edit_menu = self.addMenu('&Edit')
         profile_action = self.edit_menu.addAction("Profile Settings")
         profile_action.triggered.connect(self.settings)
+        self.bandwidth_action = self.edit_menu.addAction("Bandwidth Limits")
         self.view_menu = self.addMenu('&View')
 
         self.compartment_view = self.view_menu.addAction("Compartments")
@@ -656,6 +978,18 @@ class MainMenu(QMenuBar):
         self.object_view.setCheckable(True)
         self.object_view.setChecked(True)
 
+        self.view_menu.addSeparator()
+        self.folder_view = self.view_menu.addAction("Browse by Folder")
+        self.folder_view.setCheckable(True)
+        self.folder_view.setChecked(False)
+
+        self.auto_refresh = self.view_menu.addAction("Auto Refresh Objects")
+        self.auto_refresh.setCheckable(True)
+        self.auto_refresh.setChecked(False)
+
+        self.view_menu.addSeparator()
+        self.transfer_view = self.view_menu.addAction("Transfers")
+
     def about(self):
         self.about_box = QDialog()
         self.about_box.setWindowTitle("About")
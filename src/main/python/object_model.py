@@ -0,0 +1,639 @@
+from PySide2.QtCore import Qt, QAbstractItemModel, QModelIndex
+from PySide2.QtGui import QColor
+from util import readable_size
+from bisect import bisect_left
+
+PAGE_SIZE = 1000
+DELIMITER = '/'
+
+class ObjectRow():
+    __slots__ = ('name', 'size', 'etag', 'parent', 'children', 'names', 'next_start', 'fetched', 'loading')
+
+    def __init__(self, name, size, parent=None, folder=False, etag=None):
+        """
+        A single object or pseudo-folder listed in a bucket. Rows only hold what the object pane displays so that
+        memory grows with the rows the user has scrolled through or expanded, not with the size of the bucket
+
+        :param name: The full name of the object, or the prefix of the folder including the trailing delimiter
+        :type name: string
+        :param size: The size of the object in bytes
+        :type size: int
+        :param parent: The folder the row is listed in
+        :type parent: :class: 'ObjectRow'
+        :param folder: True if the row is a folder whose children are listed on demand
+        :type folder: boolean
+        :param etag: The entity tag of the object, used to tell when a listed object has changed
+        :type etag: string
+        """
+        self.name = name
+        self.size = size
+        self.etag = etag
+        self.parent = parent
+        self.children = [] if folder else None
+        self.names = [] if folder else None
+        self.next_start = None
+        self.fetched = False
+        self.loading = False
+
+    def is_folder(self):
+        return self.children is not None
+
+    def has_more(self):
+        """
+        :return: True if the folder has children past the last loaded page
+        :rtype: boolean
+        """
+        return self.is_folder() and (self.next_start is not None or not self.fetched)
+
+    def find(self, name):
+        """
+        :return: The position of the child with the given name, or None
+        :rtype: int
+        """
+        row = bisect_left(self.names, name)
+        if row < len(self.names) and self.names[row] == name:
+            return row
+        return None
+
+
+def diff_rows(shown, listed):
+    """
+    Compares the rows on screen with a new listing of the same range of names
+
+    :param shown: The rows currently in the model, sorted by name
+    :type shown: list
+    :param listed: The rows of the new listing, sorted by name
+    :type listed: list
+
+    :return: The listed rows that are new, the shown rows that are gone, and the listed rows whose etag or size changed
+    :rtype: tuple
+    """
+    shown_rows = {row.name: row for row in shown}
+    listed_rows = {row.name: row for row in listed}
+    added = []
+    changed = []
+    for row in listed:
+        old = shown_rows.get(row.name)
+        if old is None or old.is_folder() != row.is_folder():
+            added.append(row)
+        elif not row.is_folder() and (old.etag, old.size) != (row.etag, row.size):
+            changed.append(row)
+    removed = [row for row in shown if row.name not in listed_rows or listed_rows[row.name].is_folder() != row.is_folder()]
+    return (added, removed, changed)
+
+
+class ObjectListModel(QAbstractItemModel):
+
+    headers = ['Objects', 'Size']
+
+    def __init__(self, listing_service, listing_cache=None, page_size=PAGE_SIZE):
+        """
+        ObjectListModel lists the objects of a bucket one page at a time. The view asks for more rows
+        through canFetchMore/fetchMore as the user scrolls, and each fetch follows next_start_with from the previous page.
+        Pages are listed on the listing service's thread pool and appended when they arrive.
+
+        In folder mode the bucket is listed with a delimiter, so each pseudo-folder is a single row whose children are only
+        listed, with its prefix, when the folder is expanded
+
+        :param listing_service: The service that runs listing calls off the GUI thread
+        :type listing_service: :class: 'listing_service.ListingService'
+        :param listing_cache: Optional cache that pages are shown from while they are listed again in the background
+        :type listing_cache: :class: 'listing_cache.ListingCache'
+        :param page_size: The number of objects requested per list_objects call
+        :type page_size: int
+
+        A view can set fetch_gate to a function that is given a folder and returns True once the folder's last loaded row
+        is on screen. QTreeView asks to fetch more on every layout of an expanded folder, so without a gate it would list the whole bucket
+        """
+        super().__init__()
+        self.listing_service = listing_service
+        self.listing_cache = listing_cache
+        self.page_size = page_size
+        self.oci_manager = None
+        self.bucket_name = None
+        self.delimiter = None
+        self.root = ObjectRow('', 0, folder=True)
+        self.channels = set()
+        self.placeholder = "No bucket selected"
+        self.fetch_gate = None
+
+    def set_bucket(self, oci_manager, bucket_name):
+        """
+        Drops all loaded rows and begins listing a new bucket. No request is made until the view asks for rows
+
+        :param oci_manager: The OCI manager used to list the bucket
+        :type oci_manager: :class: 'oci_manager.oci_manager'
+        :param bucket_name: The name of the bucket, or None to show the placeholder
+        :type bucket_name: string
+        """
+        for channel in self.channels:
+            self.listing_service.cancel(channel)
+        self.channels = set()
+        self.beginResetModel()
+        self.oci_manager = oci_manager
+        self.bucket_name = bucket_name
+        self.root = ObjectRow('', 0, folder=True)
+        self.placeholder = None if bucket_name else "No bucket selected"
+        self.endResetModel()
+
+    def set_folder_mode(self, enabled):
+        """
+        Switches between a flat listing of full object names and folder navigation, then lists the bucket again
+
+        :param enabled: True to browse the bucket by pseudo-folder
+        :type enabled: boolean
+        """
+        self.delimiter = DELIMITER if enabled else None
+        self.set_bucket(self.oci_manager, self.bucket_name)
+
+    def node(self, index):
+        """
+        :return: The row at the index, or the root folder for an invalid index
+        :rtype: :class: 'ObjectRow'
+        """
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def node_index(self, node):
+        """
+        :return: The index of a row, or an invalid index for the root folder
+        :rtype: QModelIndex
+        """
+        if node is self.root or node.parent is None:
+            return QModelIndex()
+        row = node.parent.find(node.name)
+        if row is None:
+            return QModelIndex()
+        return self.createIndex(row, 0, node)
+
+    def canFetchMore(self, parent):
+        if not self.bucket_name or self.placeholder:
+            return False
+        node = self.node(parent)
+        if node.loading or not node.has_more():
+            return False
+        return not node.children or not self.fetch_gate or self.fetch_gate(node)
+
+    def fetchMore(self, parent):
+        if parent.isValid() and self.placeholder:
+            return
+        node = self.node(parent)
+        if not node.is_folder() or node.loading:
+            return
+        node.loading = True
+        start = node.next_start
+        cached = None
+        if self.listing_cache:
+            cached = self.listing_cache.get_objects(self.listing_key(node), start, self.page_size)
+            if cached.objects or cached.prefixes:
+                node.next_start = cached.next_start_with
+                self.show_page(node, cached)
+            else:
+                cached = None
+        if node is self.root and not node.children:
+            self.set_placeholder("Loading objects...")
+        self.request_page(node, start, lambda data: self.page_listed(node, start, data, cached), lambda error: self.page_failed(node, error, cached))
+
+    def request_page(self, node, start, on_result, on_error):
+        """
+        Lists a page of a folder on the listing service and stores it in the listing cache
+
+        :param node: The folder to list
+        :type node: :class: 'ObjectRow'
+        :param start: The object name to list the page from
+        :type start: string
+        :param on_result: Slot called with the page
+        :type on_result: function
+        :param on_error: Slot called with the exception if the listing fails
+        :type on_error: function
+        """
+        kwargs = {'start': start, 'limit': self.page_size}
+        if self.delimiter:
+            kwargs['delimiter'] = self.delimiter
+            if node.name:
+                kwargs['prefix'] = node.name
+        oci_manager, bucket_name, listing_cache, key = self.oci_manager, self.bucket_name, self.listing_cache, self.listing_key(node)
+
+        def list_page(is_cancelled):
+            data = oci_manager.list_objects(bucket_name, **kwargs)
+            if listing_cache:
+                listing_cache.store_objects(key, start, data)
+            return data
+
+        channel = 'objects:' + node.name
+        self.channels.add(channel)
+        self.listing_service.request(channel, list_page, on_result, on_error)
+
+    def refresh(self):
+        """
+        Lists every loaded page of the bucket again in the background. Only the rows that were added, removed or changed
+        are applied to the model, so selection and expanded folders are kept
+        """
+        if not self.bucket_name:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.fetched and not node.loading:
+                node.loading = True
+                self.refresh_page(node, None, node.next_start)
+            stack.extend(child for child in node.children if child.is_folder() and child.fetched)
+
+    def refresh_page(self, node, start, end):
+        """
+        Lists one page of a folder again and requests the following page until the loaded range has been covered
+
+        :param node: The folder to refresh
+        :type node: :class: 'ObjectRow'
+        :param start: The object name to list the page from
+        :type start: string
+        :param end: The name the folder's next unloaded page starts with, or None if the folder is fully loaded
+        :type end: string
+        """
+        self.request_page(node, start, lambda data: self.page_refreshed(node, start, end, data), lambda error: self.refresh_failed(node, error))
+
+    def page_refreshed(self, node, start, end, data):
+        """
+        Slot to apply the differences between a listed page and the rows on screen
+
+        :param node: The folder the page was listed for
+        :type node: :class: 'ObjectRow'
+        :param start: The object name the page was listed from
+        :type start: string
+        :param end: The name the folder's next unloaded page starts with, or None if the folder is fully loaded
+        :type end: string
+        :param data: The page of objects
+        :type data: :class: 'oci.object_storage.models.ListObjects'
+        """
+        if not self.attached(node):
+            return
+        self.apply_diff(node, start, data)
+        next_start = data.next_start_with
+        if next_start and (end is None or next_start < end):
+            self.refresh_page(node, next_start, end)
+        else:
+            node.loading = False
+            node.next_start = next_start
+
+    def refresh_failed(self, node, error):
+        """
+        Slot for a failed refresh. The rows on screen are kept
+
+        :param node: The folder the page was listed for
+        :type node: :class: 'ObjectRow'
+        :param error: The exception raised by the listing call
+        :type error: Exception
+        """
+        print("Error: Failure to refresh objects in {}".format(self.bucket_name))
+        node.loading = False
+
+    def attached(self, node):
+        """
+        :return: True if the row is still part of the model, i.e. neither it nor a parent folder has been removed
+        :rtype: boolean
+        """
+        while node.parent is not None:
+            row = node.parent.find(node.name)
+            if row is None or node.parent.children[row] is not node:
+                return False
+            node = node.parent
+        return node is self.root
+
+    def listing_key(self, node):
+        """
+        :return: The key the listing of a folder is cached under
+        :rtype: tuple
+        """
+        return (self.oci_manager.get_profile(), self.oci_manager.get_namespace(), self.bucket_name,
+            node.name if self.delimiter else '', self.delimiter)
+
+    def page_listed(self, node, start, data, cached=None):
+        """
+        Slot to add a page of objects and folders delivered by the listing service. If the page was already shown from the
+        listing cache, the rows the page covers are replaced when they differ from what was listed
+
+        :param node: The folder the page was listed for
+        :type node: :class: 'ObjectRow'
+        :param start: The object name the page was listed from
+        :type start: string
+        :param data: The page of objects
+        :type data: :class: 'oci.object_storage.models.ListObjects'
+        :param cached: The page shown from the listing cache, if any
+        :type cached: :class: 'listing_cache.CachedPage'
+        """
+        node.loading = False
+        node.fetched = True
+        node.next_start = data.next_start_with
+        if cached:
+            self.apply_diff(node, start, data)
+        else:
+            self.show_page(node, data)
+
+    def show_page(self, node, data):
+        """
+        :param node: The folder to add the page to
+        :type node: :class: 'ObjectRow'
+        :param data: The page of objects, from Object Storage or the listing cache
+        :type data: :class: 'oci.object_storage.models.ListObjects'
+        """
+        rows = self.page_rows(node, data)
+        if node is self.root:
+            if not rows and not node.children:
+                self.set_placeholder("Bucket contains no objects")
+                return
+            if self.placeholder:
+                self.set_placeholder(None)
+        self.insert_rows(node, rows)
+
+    def page_rows(self, node, data):
+        """
+        :return: The rows of a page sorted by name
+        :rtype: list
+        """
+        rows = [ObjectRow(obj.name, obj.size, node, etag=obj.etag) for obj in data.objects]
+        rows += [ObjectRow(prefix, 0, node, folder=True) for prefix in (data.prefixes or [])]
+        return sorted(rows, key=lambda row: row.name)
+
+    def apply_diff(self, node, start, data):
+        """
+        Applies a listed page to the rows of a folder that the page covers. Rows that are gone are removed, new rows are inserted
+        and rows whose etag or size changed are updated in place; every other row is left untouched
+
+        :param node: The folder the page was listed for
+        :type node: :class: 'ObjectRow'
+        :param start: The object name the page was listed from
+        :type start: string
+        :param data: The page of objects
+        :type data: :class: 'oci.object_storage.models.ListObjects'
+        """
+        rows = self.page_rows(node, data)
+        first = bisect_left(node.names, start or '')
+        last = bisect_left(node.names, data.next_start_with) if data.next_start_with else len(node.names)
+        added, removed, changed = diff_rows(node.children[first:last], rows)
+        if not (added or removed or changed):
+            return
+        self.remove_rows(node, [row.name for row in removed])
+        for row in changed:
+            position = node.find(row.name)
+            old = node.children[position]
+            old.size, old.etag = row.size, row.etag
+            self.dataChanged.emit(self.createIndex(position, 0, old), self.createIndex(position, len(self.headers) - 1, old))
+        if node is self.root and self.placeholder and added:
+            self.set_placeholder(None)
+        self.insert_rows(node, added)
+        if node is self.root and not node.children and not self.placeholder:
+            self.set_placeholder("Bucket contains no objects")
+
+    def page_failed(self, node, error, cached=None):
+        """
+        Slot to show the failure of a listing request in place of the objects. Rows already shown from the listing cache are kept
+
+        :param node: The folder the page was listed for
+        :type node: :class: 'ObjectRow'
+        :param error: The exception raised by the listing call
+        :type error: Exception
+        :param cached: The page shown from the listing cache, if any
+        :type cached: :class: 'listing_cache.CachedPage'
+        """
+        print("Error: Failure to list objects in {}".format(self.bucket_name))
+        node.loading = False
+        node.fetched = True
+        if not cached:
+            node.next_start = None
+        if node is self.root and not node.children:
+            self.set_placeholder("You do not have authorization to perform this request, or the requested resource could not be found")
+
+    def insert_rows(self, node, rows):
+        """
+        Adds rows to a folder in listing order. Rows that fall between the same two loaded rows are inserted together,
+        so a page that sorts after every loaded row is appended in a single insert
+
+        :param node: The folder to add the rows to
+        :type node: :class: 'ObjectRow'
+        :param rows: The rows to add, sorted by name
+        :type rows: list
+        """
+        parent = self.node_index(node) if rows else None
+        i = 0
+        while i < len(rows):
+            position = bisect_left(node.names, rows[i].name)
+            if position < len(node.names) and node.names[position] == rows[i].name:
+                i += 1
+                continue
+            bound = node.names[position] if position < len(node.names) else None
+            j = i + 1
+            while j < len(rows) and (bound is None or rows[j].name < bound):
+                j += 1
+            self.beginInsertRows(parent, position, position + j - i - 1)
+            node.children[position:position] = rows[i:j]
+            node.names[position:position] = [row.name for row in rows[i:j]]
+            self.endInsertRows()
+            i = j
+
+    def remove_rows(self, node, names):
+        """
+        Removes rows from a folder. Rows that are next to each other are removed together
+
+        :param node: The folder to remove the rows from
+        :type node: :class: 'ObjectRow'
+        :param names: The names of the rows to remove
+        :type names: list
+        """
+        positions = sorted(position for position in (node.find(name) for name in names) if position is not None)
+        parent = self.node_index(node) if positions else None
+        while positions:
+            last = positions.pop()
+            first = last
+            while positions and positions[-1] == first - 1:
+                first = positions.pop()
+            self.beginRemoveRows(parent, first, last)
+            del node.children[first:last + 1]
+            del node.names[first:last + 1]
+            self.endRemoveRows()
+
+    def set_placeholder(self, text):
+        """
+        Shows a single greyed out row with the given text in place of the objects
+
+        :param text: The text to display, or None to remove the placeholder
+        :type text: string
+        """
+        self.beginResetModel()
+        self.placeholder = text
+        self.endResetModel()
+
+    def folder_for(self, name, create=False):
+        """
+        Finds the loaded folder an object name belongs in
+
+        :param name: The full name of an object
+        :type name: string
+        :param create: Add missing folders whose parent has already been listed past the folder's name
+        :type create: boolean
+
+        :return: The folder, or None if the folder has not been listed yet
+        :rtype: :class: 'ObjectRow'
+        """
+        node = self.root
+        if not self.delimiter:
+            return node
+        position = name.find(self.delimiter)
+        while position != -1:
+            prefix = name[:position + 1]
+            row = node.find(prefix)
+            if row is None:
+                if not create or (bisect_left(node.names, prefix) == len(node.names) and node.has_more()):
+                    return None
+                self.insert_rows(node, [ObjectRow(prefix, 0, node, folder=True)])
+                row = node.find(prefix)
+            node = node.children[row]
+            if not node.fetched:
+                return None
+            position = name.find(self.delimiter, position + 1)
+        return node
+
+    def add_object(self, name, size):
+        """
+        Adds an uploaded object in listing order. Objects that sort after the last loaded page, or that belong in a folder that
+        has not been expanded, are skipped since the listing will return them when the view fetches that far
+
+        :param name: The name of the object
+        :type name: string
+        :param size: The size of the object in bytes
+        :type size: int
+        """
+        if not self.bucket_name or (self.placeholder and self.root.has_more()):
+            return
+        if self.placeholder:
+            self.set_placeholder(None)
+        node = self.folder_for(name, create=True)
+        if node is None:
+            return
+        row = node.find(name)
+        if row is not None:
+            node.children[row].size = size
+            index = self.createIndex(row, 1, node.children[row])
+            self.dataChanged.emit(index, index)
+            return
+        if bisect_left(node.names, name) == len(node.names) and node.has_more():
+            return
+        self.insert_rows(node, [ObjectRow(name, size, node)])
+
+    def remove_object(self, name):
+        """
+        :param name: The name of the object to remove from the model
+        :type name: string
+        """
+        self.remove_objects([name])
+
+    def remove_objects(self, names):
+        """
+        Removes a batch of objects from the model, grouped by folder so rows that are next to each other are removed together
+
+        :param names: The names of the objects to remove
+        :type names: list
+        """
+        folders = {}
+        for name in names:
+            node = self.folder_for(name)
+            if node is not None:
+                folders.setdefault(id(node), (node, []))[1].append(name)
+        for node, folder_names in folders.values():
+            self.remove_rows(node, folder_names)
+
+    def rename_object(self, source_name, new_name):
+        """
+        :param source_name: The current name of the object
+        :type source_name: string
+        :param new_name: The name the object was renamed to
+        :type new_name: string
+        """
+        self.rename_objects([(source_name, new_name)])
+
+    def rename_objects(self, renames):
+        """
+        Moves a batch of renamed objects to their new names. Objects that were not loaded are left for the listing to return
+
+        :param renames: Tuples of the previous and the new name of each object
+        :type renames: list
+        """
+        sizes = {}
+        for source_name, new_name in renames:
+            node = self.folder_for(source_name)
+            row = node.find(source_name) if node else None
+            if row is not None:
+                sizes[source_name] = node.children[row].size
+        self.remove_objects(list(sizes))
+        for source_name, new_name in renames:
+            if source_name in sizes:
+                self.add_object(new_name, sizes[source_name])
+
+    def object_row(self, index):
+        """
+        :return: The row at the index, or None for the placeholder
+        :rtype: :class: 'ObjectRow'
+        """
+        if not index.isValid() or self.placeholder:
+            return None
+        return index.internalPointer()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if self.placeholder:
+            return self.createIndex(row, column, None)
+        return self.createIndex(row, column, self.node(parent).children[row])
+
+    def parent(self, index=None):
+        if index is None or not index.isValid() or self.placeholder:
+            return QModelIndex()
+        return self.node_index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if self.placeholder:
+            return 0 if parent.isValid() else 1
+        if parent.column() > 0:
+            return 0
+        node = self.node(parent)
+        return len(node.children) if node.is_folder() else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return True
+        if self.placeholder or parent.column() > 0:
+            return False
+        return parent.internalPointer().is_folder()
+
+    def flags(self, index):
+        if not index.isValid() or self.placeholder:
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if self.placeholder:
+            if role == Qt.DisplayRole and index.column() == 0:
+                return self.placeholder
+            if role == Qt.ForegroundRole:
+                return QColor(220,220,220)
+            return None
+        row = index.internalPointer()
+        if role == Qt.DisplayRole:
+            if index.column() == 0:
+                return row.name[len(row.parent.name):] if self.delimiter else row.name
+            if row.is_folder():
+                return None
+            return " ".join(readable_size(row.size))
+        if role == Qt.UserRole:
+            return row.size
+        return None
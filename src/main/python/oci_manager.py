@@ -1,20 +1,139 @@
-import oci
+from collections import OrderedDict
 import os
 import sys
-from PySide2.QtCore import Qt, Signal, QObject
+import threading
+import logging
+from util import LazyModule
+
+# The SDK takes longer to import than the rest of the application, so it is loaded when the first client is made
+oci = LazyModule('oci')
+upload_manager = LazyModule('upload_manager')
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
 
 MEBIBYTE = 1024 * 1024
 STREAMING_DEFAULT_PART_SIZE = 10 * MEBIBYTE
 DEFAULT_PART_SIZE = 128 * MEBIBYTE
 OBJECT_USE_MULTIPART_SIZE = 128 * MEBIBYTE
+DEFAULT_PARALLEL_PROCESS_COUNT = 3
+MIN_PART_SIZE = 10 * MEBIBYTE
+MAX_AUTO_PART_SIZE = 512 * MEBIBYTE
+MAX_PARTS = 10000
+TARGET_PART_COUNT = 64
+TARGET_PART_SECONDS = 5
+MAX_PARALLEL_PROCESS_COUNT = 8
+MAX_PARTS_IN_FLIGHT = 16
+DEFAULT_POOL_SIZE = 16
+CLIENT_CACHE_SIZE = 4
+# The namespace of a manager that could not reach object storage
+NOT_CONNECTED = "Not connected"
+
+class CachedClients():
+    def __init__(self, config, pool_size):
+        """
+        The clients of one profile and region, kept by :class: 'ClientCache' with the namespace once it was fetched
+
+        :param config: The validated config of the profile
+        :type config: dict
+        :param pool_size: The number of connections the object storage client keeps open
+        :type pool_size: int
+        """
+        self.config = config
+        self.id_client = oci.identity.IdentityClient(config)
+        self.os_client = oci.object_storage.ObjectStorageClient(config, timeout=10)
+        self.namespace = None
+        self.pool_size = 0
+        self.grow_pool(pool_size)
+
+    def grow_pool(self, pool_size):
+        """
+        Mounts a larger connection pool on the object storage client. A pool is never shrunk, since that would drop its open connections
+        """
+        if pool_size > self.pool_size:
+            factor = upload_manager.UploadManager.REQUESTS_POOL_SIZE_FACTOR
+            upload_manager.UploadManager._add_adapter_to_service_client(self.os_client, True, -(-pool_size // factor))
+            self.pool_size = pool_size
+
+
+class ClientCache():
+    def __init__(self, size=CLIENT_CACHE_SIZE):
+        """
+        ClientCache keeps the parsed config file and the clients of the most recently used profiles and regions, so building an
+        OCI manager again, e.g. on a refresh or when switching back to a profile, reuses warm connections and the fetched namespace
+        instead of parsing the config file, signing in and calling get_namespace again. A profile whose settings changed in the
+        config file gets new clients
+
+        :param size: The number of profile and region pairs kept. The least recently used clients are dropped beyond it
+        :type size: int
+        """
+        self.size = size
+        self.lock = threading.Lock()
+        self.configs = {}
+        self.clients = OrderedDict()
+
+    def get_config(self, location, profile):
+        """
+        :return: The profile from the config file, parsed again only when the file changed
+        :rtype: dict
+        """
+        stat = os.stat(location)
+        key = (location, profile)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.configs.get(key)
+        if cached and cached[0] == stamp:
+            return dict(cached[1])
+        config = oci.config.from_file(location, profile_name=profile)
+        with self.lock:
+            self.configs[key] = (stamp, config)
+        return dict(config)
+
+    def get_clients(self, profile, config, pool_size=DEFAULT_POOL_SIZE):
+        """
+        :param profile: The name of the profile
+        :type profile: string
+        :param config: The validated config of the profile
+        :type config: dict
+        :param pool_size: The number of connections the object storage client should keep open
+        :type pool_size: int
+
+        :return: The clients of the profile and its region
+        :rtype: :class: 'CachedClients'
+        """
+        key = (profile, config.get('region'))
+        with self.lock:
+            clients = self.clients.get(key)
+            if clients and clients.config == config:
+                self.clients.move_to_end(key)
+                clients.grow_pool(pool_size)
+                return clients
+        clients = CachedClients(config, pool_size)
+        with self.lock:
+            self.clients[key] = clients
+            self.clients.move_to_end(key)
+            # Dropped clients are not closed, since a transfer started with them may still be running
+            while len(self.clients) > self.size:
+                self.clients.popitem(last=False)
+        return clients
+
+
+client_cache = ClientCache()
 
 class oci_manager():
-    def __init__(self, profile='DEFAULT'):
+    def __init__(self, profile='DEFAULT', pool_size=DEFAULT_POOL_SIZE):
         """
         :param profile: The config profile the OCI manager will use
         :type profile: string
+        :param pool_size: The number of connections to keep open to object storage, see Settings.pool_size
+        :type pool_size: int
         """
         self.DEFAULT_LOCATION = os.path.expanduser(os.path.join('~', '.oci', 'config'))
+        self.pool_size = pool_size
         self.change_profile(profile)
     
     def get_config(self):
@@ -46,6 +165,20 @@ class oci_manager():
         """
         return self.namespace
     
+    def is_connected(self):
+        """
+        :return: Whether the namespace was fetched, which every bucket and object request needs
+        :rtype: boolean
+        """
+        return self.namespace not in (None, NOT_CONNECTED)
+
+    def get_profile(self):
+        """
+        :return: The name of the config profile
+        :rtype: string
+        """
+        return self.profile
+
     def get_tenancy(self):
         """
         :return: The OCID of the tenancy
@@ -58,8 +191,9 @@ class oci_manager():
         :param new_profile: The profile the OCI manager will begin to use to instantiate OCI classes such as an identity client, object storage client, etc
         :rtype new_profile: string
         """
+        self.profile = new_profile
         try:
-            self.config = oci.config.from_file(profile_name=new_profile)
+            self.config = client_cache.get_config(self.DEFAULT_LOCATION, new_profile)
         except:
             print("Config file does not exist. Creating config file in {}".format(self.DEFAULT_LOCATION))
             f = open(self.DEFAULT_LOCATION, "w+")
@@ -67,8 +201,9 @@ class oci_manager():
             for key in ['user', 'fingerprint', 'key_file', 'tenancy', 'region', 'pass_phrase']:
                 f.write('{}=\n'.format(key))
             f.close()
-            self.config = oci.config.from_file(profile_name=new_profile)
+            self.config = client_cache.get_config(self.DEFAULT_LOCATION, new_profile)
 
+        clients = None
         try:
             oci.config.validate_config(self.config)
         except:
@@ -76,15 +211,20 @@ class oci_manager():
             self.os_client = None
             self.tenancy = None
         else:
-            self.id_client = oci.identity.IdentityClient(self.config)
-            self.os_client = oci.object_storage.ObjectStorageClient(self.config, timeout=10)
+            clients = client_cache.get_clients(new_profile, self.config, self.pool_size)
+            self.id_client = clients.id_client
+            self.os_client = clients.os_client
             self.tenancy = self.config['tenancy']
 
-        try:
-            self.namespace = self.os_client.get_namespace().data
-        except:
-            print("Error: Failure to establish connection", sys.exc_info()[0])
-            self.namespace = "Not connected"
+        if clients and clients.namespace:
+            self.namespace = clients.namespace
+        else:
+            try:
+                self.namespace = self.os_client.get_namespace().data
+                clients.namespace = self.namespace
+            except:
+                print("Error: Failure to establish connection", sys.exc_info()[0])
+                self.namespace = NOT_CONNECTED
         self.compartments = []
         self.objects = []
     
@@ -95,163 +235,228 @@ class oci_manager():
         """
         return oci.object_storage.models.CreateBucketDetails(name=name, compartment_id=compartment_id)
     
-    def get_upload_manager(self):
+    def get_upload_manager(self, concurrency=1, part_size=None, parallel_process_count=None, journal=None, rate_limiter=None):
         """
+        :param concurrency: The number of files that will be uploaded at once with the upload manager
+        :type concurrency: int
+        :param part_size: The multipart part size in bytes, or None to pick it per file
+        :type part_size: int
+        :param parallel_process_count: The number of parts of a file uploaded at once, or None to pick it per file
+        :type parallel_process_count: int
+        :param journal: Optional journal that multipart uploads and their parts are recorded in
+        :type journal: :class: 'upload_journal.UploadJournal'
+        :param rate_limiter: Optional limiter the bytes of every upload are passed through
+        :type rate_limiter: :class: 'transfers.RateLimiter'
+
         :return: Upload manager for calling upload jobs with object storage
-        :rtype: :class: 'oci.object_storage.UploadManager'
+        :rtype: :class: 'upload_manager.UploadManager'
         """
-        return UploadManager(self.get_os())
+        return upload_manager.UploadManager(self.get_os(), concurrency=concurrency, part_size=part_size, parallel_process_count=parallel_process_count,
+            journal=journal, profile=self.profile, rate_limiter=rate_limiter)
     
-    def delete_object(self, bucket_name, object_name):
-        response = self.get_os().delete_object(self.get_namespace(), bucket_name, object_name)
-        return response
-    
-    def rename_object(self, bucket_name, source_name, new_name):
-        details = oci.object_storage.models.RenameObjectDetails(source_name=source_name, new_name=new_name)
-        response = self.get_os().rename_object(self.get_namespace(), bucket_name, details)
-        return response
-        
-
-class UploadId(QObject):
-    test = Signal(str)
-    def __init__(self):
-        super().__init__()
-        self.id = None
-    def signal_upload_id(self, upload_id):
-        self.test.emit(upload_id)
-        self.id = upload_id
-
-class UploadManager(oci.object_storage.UploadManager):
-    def __init__(self, object_storage_client):
-        super().__init__(object_storage_client)
-        self.ma = None
-
-    def commit(self):
-        self.ma.commit()
-
-    def abort(self, upload_id):
-        if self.ma:
-            self.ma.abort(upload_id=upload_id) if upload_id else self.ma.abort()
-
-    def resume(self, upload_id):
-        if self.ma:
-            self.ma.resume()
-            # self.ma.resume(upload_id=upload_id) if upload_id else self.ma.resume()
-    
-    def upload_file(self,
-                    namespace_name,
-                    bucket_name,
-                    object_name,
-                    file_path,
-                    **kwargs):
+    def list_compartments(self, compartment_id=None, subtree=True, is_cancelled=None):
         """
-        Uploads an object to Object Storage. Depending on the options provided and the
-        size of the object, the object may be uploaded in multiple parts.
-
-        :param str namespace_name:
-            The namespace containing the bucket in which to store the object.
+        Lists the compartments under a compartment, following pagination
 
-        :param str bucket_name:
-            The name of the bucket in which to store the object.
+        :param compartment_id: The OCID of the parent compartment. Defaults to the tenancy
+        :type compartment_id: string
+        :param subtree: List every compartment below the parent instead of only its direct children. Only supported for the tenancy
+        :type subtree: boolean
+        :param is_cancelled: Optional callable that stops paging when it returns True
+        :type is_cancelled: function
 
-        :param str object_name:
-            The name of the object in Object Storage.
-
-        :param file_path:
-            The path to the file to upload.
-
-        :param int part_size (optional):
-            Override the default part size of 128 MiB, value is in bytes.
-
-        :param function progress_callback (optional):
-            Callback function to receive the number of bytes uploaded since
-            the last call to the callback function.
-
-        :param str if_match (optional):
-            The entity tag of the object to match.
-
-        :param str if_none_match (optional):
-            The entity tag of the object to avoid matching. The only valid value is ‘*’,
-            which indicates that the request should fail if the object already exists.
+        :return: The compartments
+        :rtype: list
+        """
+        compartment_id = compartment_id or self.get_tenancy()
+        response = self.get_id().list_compartments(compartment_id, compartment_id_in_subtree=subtree)
+        data = response.data
+        while response.next_page and not (is_cancelled and is_cancelled()):
+            response = self.get_id().list_compartments(compartment_id, compartment_id_in_subtree=subtree, page=response.next_page)
+            data += response.data
+        return data
+
+    def list_buckets(self, compartment_id, is_cancelled=None):
+        """
+        Lists every bucket in a compartment, following pagination
 
-        :param str content_md5: (optional)
-            The base-64 encoded MD5 hash of the body. This parameter is only used if the object is uploaded in a single part.
+        :param compartment_id: The OCID of the compartment
+        :type compartment_id: string
+        :param is_cancelled: Optional callable that stops paging when it returns True
+        :type is_cancelled: function
 
-        :param str content_type (optional):
-            The content type of the object to upload.
+        :return: The bucket summaries of the compartment
+        :rtype: list
+        """
+        response = self.get_os().list_buckets(self.get_namespace(), compartment_id)
+        data = response.data
+        while response.next_page and not (is_cancelled and is_cancelled()):
+            response = self.get_os().list_buckets(self.get_namespace(), compartment_id, page=response.next_page)
+            data += response.data
+        return data
+
+    def list_objects(self, bucket_name, start=None, limit=1000, fields='name,size,etag,timeCreated', **kwargs):
+        """
+        Lists a single page of objects in a bucket
 
-        :param str content_language (optional):
-            The content language of the object to upload.
+        :param bucket_name: The name of the bucket
+        :type bucket_name: string
+        :param start: The object name to start listing from
+        :type start: string
+        :param limit: The maximum number of objects to return
+        :type limit: int
 
-        :param str content_encoding (optional):
-            The content encoding of the object to upload.
+        :return: The page of objects, with next_start_with set if the bucket has more objects
+        :rtype: :class: 'oci.object_storage.models.ListObjects'
+        """
+        if start:
+            kwargs['start'] = start
+        return self.get_os().list_objects(self.get_namespace(), bucket_name, limit=limit, fields=fields, **kwargs).data
 
-        :param dict metadata (optional):
-            A dictionary of string to string values to associate with the object to upload
+    def iter_objects(self, bucket_name, prefix=None, fields='name,size,etag,timeCreated', is_cancelled=None):
+        """
+        Lists the objects in a bucket under a prefix one page at a time, so the first objects can be used before the listing finishes
 
-        :param dict mixin (optional):
-            QT mixin for signal/slots
+        :param bucket_name: The name of the bucket
+        :type bucket_name: string
+        :param prefix: Only objects whose name starts with the prefix are listed
+        :type prefix: string
+        :param is_cancelled: Optional callable that stops paging when it returns True
+        :type is_cancelled: function
 
-        :return:
-            The response from multipart commit operation or the put operation.  In both cases this will be a :class:`~oci.response.Response` object with data of type None.
-            For a multipart upload the :class:`~oci.response.Response` will contain the :code:`opc-multipart-md5` header and for a non-multipart upload
-            it will contain the :code:`opc-content-md5 header`.
-        :rtype: :class:`~oci.response.Response`
+        :return: The object summaries in name order
+        :rtype: generator
+        """
+        kwargs = {'prefix': prefix} if prefix else {}
+        page = self.list_objects(bucket_name, fields=fields, **kwargs)
+        yield from page.objects
+        while page.next_start_with and not (is_cancelled and is_cancelled()):
+            page = self.list_objects(bucket_name, start=page.next_start_with, fields=fields, **kwargs)
+            yield from page.objects
+
+    def list_all_objects(self, bucket_name, prefix=None, fields='name,size,etag,timeCreated', is_cancelled=None):
         """
-        part_size = DEFAULT_PART_SIZE
-        if 'part_size' in kwargs:
-            part_size = kwargs['part_size']
-            kwargs.pop('part_size')
+        Lists every object in a bucket under a prefix, following pagination
 
-        mixin = None
-        if 'mixin' in kwargs:
-            mixin = kwargs['mixin']
-            kwargs.pop('mixin')
+        :return: The object summaries
+        :rtype: list
+        """
+        return list(self.iter_objects(bucket_name, prefix, fields, is_cancelled))
 
-        with open(file_path, 'rb') as file_object:
-            file_size = os.fstat(file_object.fileno()).st_size
-            if not self.allow_multipart_uploads or not UploadManager._use_multipart(file_size, part_size=part_size):
-                return self._upload_singlepart(namespace_name, bucket_name, object_name, file_path, **kwargs)
-            else:
-                if 'content_md5' in kwargs:
-                    kwargs.pop('content_md5')
+    def head_object(self, bucket_name, object_name):
+        """
+        :return: The headers of the object, with its metadata as opc-meta- headers
+        :rtype: dict
+        """
+        return self.get_os().head_object(self.get_namespace(), bucket_name, object_name).headers
 
-                kwargs['part_size'] = part_size
-                kwargs['allow_parallel_uploads'] = self.allow_parallel_uploads
-                if self.parallel_process_count is not None:
-                    kwargs['parallel_process_count'] = self.parallel_process_count
+    def delete_object(self, bucket_name, object_name):
+        response = self.get_os().delete_object(self.get_namespace(), bucket_name, object_name)
+        return response
+    
+    def rename_object(self, bucket_name, source_name, new_name, overwrite=True):
+        """
+        :param overwrite: Replace an object that already has the new name. Without it the rename fails with a 412 instead
+        :type overwrite: boolean
+        """
+        details = oci.object_storage.models.RenameObjectDetails(source_name=source_name, new_name=new_name,
+            new_obj_if_none_match_e_tag=None if overwrite else '*')
+        response = self.get_os().rename_object(self.get_namespace(), bucket_name, details)
+        return response
 
-                ma = oci.object_storage.MultipartObjectAssembler(self.object_storage_client,
-                                              namespace_name,
-                                              bucket_name,
-                                              object_name,
-                                              **kwargs)
+    def abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        response = self.get_os().abort_multipart_upload(self.get_namespace(), bucket_name, object_name, upload_id)
+        return response
 
-                self.ma = ma
+    def get_region(self):
+        """
+        :return: The region of the profile
+        :rtype: string
+        """
+        return self.config.get('region')
 
-                upload_kwargs = {}
-                if 'progress_callback' in kwargs:
-                    upload_kwargs['progress_callback'] = kwargs['progress_callback']
+    def list_regions(self):
+        """
+        :return: The names of the regions the tenancy is subscribed to
+        :rtype: list
+        """
+        return [region.region_name for region in self.get_id().list_region_subscriptions(self.get_tenancy()).data]
 
-                ma.new_upload()
+    def copy_object(self, bucket_name, object_name, destination_bucket, destination_name=None, destination_region=None, destination_namespace=None):
+        """
+        Starts copying an object to a bucket of this or another region. The service copies the data itself, as a work request
+        that can be followed with get_work_request
 
-                if mixin:
-                    mixin.signal_upload_id(ma.manifest['uploadId'])
+        :param destination_name: The name of the copy. Defaults to the name of the object
+        :type destination_name: string
+        :param destination_region: The region of the destination bucket. Defaults to the region of the profile
+        :type destination_region: string
+        :param destination_namespace: The namespace of the destination bucket. Defaults to the namespace of the profile
+        :type destination_namespace: string
 
-                ma.add_parts_from_file(file_path)
+        :return: The id of the work request
+        :rtype: string
+        """
+        details = oci.object_storage.models.CopyObjectDetails(source_object_name=object_name, destination_region=destination_region or self.get_region(),
+            destination_namespace=destination_namespace or self.get_namespace(), destination_bucket=destination_bucket,
+            destination_object_name=destination_name or object_name)
+        response = self.get_os().copy_object(self.get_namespace(), bucket_name, details)
+        return response.headers['opc-work-request-id']
 
-                # try:
-                #     ma.upload(**upload_kwargs)
-                #     response = ma.commit()
-                # except:
-                #     print("Connection failure. Retry with Upload ID {}".format(ma.manifest['uploadId']))
-                # else:
-                #     return response
+    def get_work_request(self, work_request_id):
+        """
+        :return: The work request, with its status and percent_complete
+        :rtype: :class: 'oci.object_storage.models.WorkRequest'
+        """
+        return self.get_os().get_work_request(work_request_id).data
 
-                ma.upload(**upload_kwargs)
-                response = ma.commit()
-                return response
-    
+    def cancel_work_request(self, work_request_id):
+        response = self.get_os().cancel_work_request(work_request_id)
+        return response
 
+    def work_request_errors(self, work_request_id):
+        """
+        :return: The error messages of a failed work request
+        :rtype: list
+        """
+        return [error.message for error in self.get_os().list_work_request_errors(work_request_id).data]
+        
 
-    
\ No newline at end of file
+def choose_part_size(file_size, throughput=None):
+    """
+    Picks a multipart part size for a file. Without a throughput estimate the file is split into about TARGET_PART_COUNT parts.
+    With one, parts are sized to take about TARGET_PART_SECONDS each, so fast links send fewer, larger requests. The part size
+    is always large enough to fit the file in MAX_PARTS parts and is rounded up to a whole MiB
+
+    :param file_size: The size of the file in bytes
+    :type file_size: int
+    :param throughput: The observed upload rate of a single part in bytes per second
+    :type throughput: float
+
+    :return: The part size in bytes
+    :rtype: int
+    """
+    if throughput:
+        part_size = throughput * TARGET_PART_SECONDS
+    else:
+        part_size = file_size / TARGET_PART_COUNT
+    part_size = min(max(part_size, MIN_PART_SIZE), MAX_AUTO_PART_SIZE)
+    part_size = max(part_size, -(-file_size // MAX_PARTS))
+    return int(-(-part_size // MEBIBYTE) * MEBIBYTE)
+
+def choose_parallel_process_count(file_size, part_size, concurrency=1):
+    """
+    Picks how many parts of a file are uploaded at once. Files uploaded side by side share MAX_PARTS_IN_FLIGHT between them
+
+    :param file_size: The size of the file in bytes
+    :type file_size: int
+    :param part_size: The multipart part size in bytes
+    :type part_size: int
+    :param concurrency: The number of files uploaded at once
+    :type concurrency: int
+
+    :return: The number of parts to upload in parallel
+    :rtype: int
+    """
+    parts = -(-file_size // part_size)
+    return max(1, min(parts, MAX_PARALLEL_PROCESS_COUNT, MAX_PARTS_IN_FLIGHT // concurrency))
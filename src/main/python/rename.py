@@ -1,7 +1,10 @@
 import sys
-from PySide2.QtWidgets import QDialog, QApplication, QWidget, QPushButton, QAction, QLineEdit, QMessageBox, QVBoxLayout, QDialogButtonBox
+from PySide2.QtWidgets import QDialog, QApplication, QWidget, QPushButton, QAction, QLineEdit, QMessageBox, QVBoxLayout, QDialogButtonBox, QFormLayout, QComboBox, QLabel
 from PySide2.QtGui import QIcon
 from PySide2.QtCore import Qt, Signal
+from bulk import renamer, plan_renames, REPLACE_PREFIX, FIND_REPLACE
+
+PREVIEW_COUNT = 5
 
 
 class RenameWindow(QDialog):
@@ -43,6 +46,66 @@ class RenameWindow(QDialog):
         self.new_name.emit(self.filename, self.textbox.text())
         self.accept()
 
+
+class BulkRenameWindow(QDialog):
+
+    pattern = Signal(str, str, str)
+
+    def __init__(self, names, find=''):
+        """
+        BulkRenameWindow asks how to rename many objects at once, either by moving them from one prefix to another or by replacing
+        text in their names, and previews the new names of a few of them
+
+        :param names: The objects or prefixes selected, used for the preview
+        :type names: list
+        :param find: The prefix initially offered for replacement
+        :type find: string
+        """
+        super().__init__()
+        self.names = names
+        self.find = find
+        self.initUI()
+
+    def initUI(self):
+        self.setWindowTitle("Rename / Move")
+        self.mode = QComboBox()
+        self.mode.addItem("Replace prefix", REPLACE_PREFIX)
+        self.mode.addItem("Find and replace", FIND_REPLACE)
+        self.find_box = QLineEdit(self.find)
+        self.replace_box = QLineEdit(self.find)
+        self.preview = QLabel()
+        self.preview.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        for signal in [self.mode.currentIndexChanged, self.find_box.textChanged, self.replace_box.textChanged]:
+            signal.connect(self.update_preview)
+
+        self.ok_button = QPushButton('Ok')
+        self.ok_button.clicked.connect(self.on_click)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.reject)
+        self.button_box = QDialogButtonBox()
+        self.button_box.setOrientation(Qt.Horizontal)
+        self.button_box.addButton(self.cancel_button, QDialogButtonBox.RejectRole)
+        self.button_box.addButton(self.ok_button, QDialogButtonBox.AcceptRole)
+
+        self.layout = QFormLayout()
+        self.layout.addRow("Mode", self.mode)
+        self.layout.addRow("Find", self.find_box)
+        self.layout.addRow("Replace with", self.replace_box)
+        self.layout.addRow(self.preview)
+        self.layout.addRow(self.button_box)
+        self.setLayout(self.layout)
+        self.update_preview()
+
+    def update_preview(self):
+        rename = renamer(self.find_box.text(), self.replace_box.text(), self.mode.currentData())
+        renames = list(plan_renames(self.names[:PREVIEW_COUNT], rename))
+        self.preview.setText("\n".join("{} \u2192 {}".format(*names) for names in renames) or "Nothing is renamed")
+        self.ok_button.setEnabled(bool(self.find_box.text()))
+
+    def on_click(self):
+        self.pattern.emit(self.mode.currentData(), self.find_box.text(), self.replace_box.text())
+        self.accept()
+
 if __name__ == '__main__':
     print("Test")
     app = QApplication(sys.argv)
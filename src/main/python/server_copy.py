@@ -0,0 +1,110 @@
+from collections import namedtuple
+import time
+from bulk import with_retry
+
+COPY_CONCURRENCY = 16
+POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 10
+POLL_WAIT = 0.1
+
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+CANCELED = 'CANCELED'
+
+CopySource = namedtuple('CopySource', ['oci_manager', 'bucket_name', 'items'])
+CopyItem = namedtuple('CopyItem', ['name', 'size', 'base'])
+CopyDestination = namedtuple('CopyDestination', ['region', 'namespace', 'bucket_name', 'prefix'])
+CopyJob = namedtuple('CopyJob', ['object_name', 'destination_name', 'size'])
+
+class CopyCancelled(Exception):
+    pass
+
+
+def plan_copies(source, destination, is_cancelled=None):
+    """
+    Turns copied objects and folders into one job per object. Every object under a copied folder is listed, so this
+    is called on a worker thread. The part of a name up to its item's base is replaced with the destination prefix,
+    so a folder keeps its structure wherever it is pasted. Copies onto the object itself are left out
+
+    :param source: What was copied
+    :type source: :class: 'CopySource'
+    :param destination: Where it is pasted
+    :type destination: :class: 'CopyDestination'
+
+    :return: The copy jobs
+    :rtype: generator
+    """
+    manager = source.oci_manager
+    same_bucket = (destination.region, destination.namespace, destination.bucket_name) == (manager.get_region(), manager.get_namespace(),
+        source.bucket_name)
+    for item in source.items:
+        if item.size is None:
+            objects = ((obj.name, obj.size) for obj in manager.iter_objects(source.bucket_name, item.name, fields='name,size', is_cancelled=is_cancelled))
+        else:
+            objects = [(item.name, item.size)]
+        for name, size in objects:
+            destination_name = destination.prefix + name[len(item.base):]
+            if not (same_bucket and destination_name == name):
+                yield CopyJob(name, destination_name, size or 0)
+
+def wait(seconds, is_cancelled=None):
+    """
+    Sleeps, waking up every POLL_WAIT seconds to check is_cancelled
+
+    :return: False if the wait was cancelled
+    :rtype: boolean
+    """
+    until = time.monotonic() + seconds
+    while time.monotonic() < until:
+        if is_cancelled and is_cancelled():
+            return False
+        time.sleep(POLL_WAIT)
+    return True
+
+def copy_object(manager, bucket_name, job, destination, progress=None, is_cancelled=None):
+    """
+    Copies an object on the service side and waits for the copy to finish. The work request is polled every POLL_INTERVAL
+    seconds at first and less often as the copy goes on, up to MAX_POLL_INTERVAL, and its progress is reported as bytes
+    of the object. No data passes through this machine
+
+    :param manager: The OCI manager of the source bucket
+    :type manager: :class: 'oci_manager.oci_manager'
+    :param bucket_name: The source bucket
+    :type bucket_name: string
+    :param job: The object to copy
+    :type job: :class: 'CopyJob'
+    :param destination: The bucket to copy to
+    :type destination: :class: 'CopyDestination'
+    :param progress: Optional progress of the whole job, counted per object name
+    :type progress: :class: 'transfers.TransferProgress'
+    :param is_cancelled: Optional callable. Once it returns True the work request is cancelled and CopyCancelled is raised
+    :type is_cancelled: function
+
+    :return: The id of the work request
+    :rtype: string
+    """
+    work_request_id = with_retry(manager.copy_object, is_cancelled)(bucket_name, job.object_name, destination.bucket_name, job.destination_name,
+        destination.region, destination.namespace)
+    get_work_request = with_retry(manager.get_work_request, is_cancelled)
+    interval = POLL_INTERVAL
+    reported = 0
+    while True:
+        if not wait(interval, is_cancelled):
+            try:
+                manager.cancel_work_request(work_request_id)
+            except Exception:
+                # The copy may have finished in the meantime
+                pass
+            raise CopyCancelled(job.object_name)
+        work_request = get_work_request(work_request_id)
+        done = job.size if work_request.status == COMPLETED else job.size * (work_request.percent_complete or 0) // 100
+        if progress and done > reported:
+            progress.add(job.object_name, done - reported)
+            reported = done
+        if work_request.status == COMPLETED:
+            return work_request_id
+        if work_request.status in (FAILED, CANCELED):
+            errors = manager.work_request_errors(work_request_id)
+            raise IOError("Copy of {} to {} {}: {}".format(job.object_name, destination.bucket_name, work_request.status.lower(),
+                "; ".join(errors) or "no reason given"))
+        interval = min(interval * 1.5, MAX_POLL_INTERVAL)
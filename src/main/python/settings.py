@@ -0,0 +1,80 @@
+import configparser
+import os
+
+DEFAULT_LOCATION = os.path.expanduser(os.path.join('~', '.oci', 'object_storage.ini'))
+SECTION = 'transfers'
+
+DEFAULTS = {
+    'upload_concurrency': '4',
+    'part_size': 'auto',
+    'part_concurrency': 'auto',
+    'download_range_size': '16777216',
+    'download_concurrency': '4',
+    'max_active_jobs': '3',
+    'max_jobs_per_bucket': '2',
+    'upload_rate': '0',
+    'download_rate': '0',
+    'bulk_concurrency': '16',
+    'copy_concurrency': '16',
+}
+
+# The settings for the number of requests a job makes at once, which its connections to object storage are sized for
+CONCURRENCY_SETTINGS = ['upload_concurrency', 'download_concurrency', 'bulk_concurrency', 'copy_concurrency']
+
+class Settings():
+    def __init__(self, location=DEFAULT_LOCATION):
+        """
+        Settings reads the transfer settings of the application from an ini file next to the OCI config file.
+        Settings missing from the file fall back to DEFAULTS, so the file only needs the values a user wants to change, e.g
+
+            [transfers]
+            upload_concurrency = 8
+
+        :param location: The path of the settings file
+        :type location: string
+        """
+        self.location = location
+        self.config = configparser.ConfigParser(interpolation=None)
+        self.config.read_dict({SECTION: DEFAULTS})
+        self.config.read(location)
+
+    def get(self, name):
+        return self.config.get(SECTION, name)
+
+    def get_int(self, name):
+        return self.config.getint(SECTION, name)
+
+    def get_auto_int(self, name):
+        """
+        :return: The setting as an int, or None if it is set to 'auto'
+        :rtype: int
+        """
+        if self.get(name).strip().lower() == 'auto':
+            return None
+        return self.get_int(name)
+
+    def pool_size(self):
+        """
+        :return: The number of connections to keep open to object storage, enough for every job that may be active at once
+        :rtype: int
+        """
+        return self.get_int('max_active_jobs') * max(self.get_int(name) for name in CONCURRENCY_SETTINGS)
+
+    def get_float(self, name):
+        return self.config.getfloat(SECTION, name)
+
+    def get_boolean(self, name):
+        return self.config.getboolean(SECTION, name)
+
+    def set(self, name, value):
+        """
+        Changes a setting and writes the settings file
+
+        :param name: The name of the setting
+        :type name: string
+        :param value: The new value
+        :type value: string, int, float or boolean
+        """
+        self.config.set(SECTION, name, str(value))
+        with open(self.location, 'w') as f:
+            self.config.write(f)
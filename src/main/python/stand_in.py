@@ -0,0 +1,361 @@
+"""
+Local stand-in for the Object Storage endpoints the application uses, for benchmarks that run offline. It serves the
+namespace, put, get and head with Range and If-Match, multipart create, upload, commit and abort, list, rename and delete,
+keeping objects in memory. A fixed latency can be added to every request and the bandwidth of the link can be capped, so
+runs are reproducible. Run it on its own with
+
+    python -m stand_in [--port PORT] [--latency MS] [--bandwidth BYTES_PER_SECOND]
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs, unquote
+from email.utils import formatdate
+from datetime import datetime, timezone
+from transfers import RateLimiter, multipart_md5
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import threading
+import time
+
+NAMESPACE = 'standin'
+CHUNK_SIZE = 64 * 1024
+LIST_LIMIT = 1000
+# Seconds of transfer the simulated link lets through at once after it was idle. Short, so each run sees the bandwidth it asked for
+LINK_BURST = 0.05
+
+def iso_time(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+class StoredObject():
+    def __init__(self, data, md5, metadata, multipart_md5=None):
+        """
+        An object held by the stand-in
+
+        :param data: The content of the object
+        :type data: bytes
+        :param md5: The base64 encoded MD5 of the content
+        :type md5: string
+        :param metadata: The opc-meta- headers of the object
+        :type metadata: dict
+        :param multipart_md5: The MD5 of a multipart upload, see transfers.multipart_md5
+        :type multipart_md5: string
+        """
+        self.data = data
+        self.md5 = md5
+        self.metadata = metadata
+        self.multipart_md5 = multipart_md5
+        self.etag = hashlib.md5(md5.encode() + repr(time.time()).encode()).hexdigest()
+        self.modified = time.time()
+
+
+class StandIn():
+    def __init__(self, latency=0, bandwidth=0):
+        """
+        The state of the stand-in shared by every connection: buckets, multipart uploads in progress, the simulated link and
+        the time each request took, which benchmarks read and reset through the /_stats and /_reset endpoints
+
+        :param latency: Seconds added to every request before it is answered
+        :type latency: float
+        :param bandwidth: Bytes per second the bodies of all requests share in each direction, or 0 for no limit
+        :type bandwidth: int
+        """
+        self.latency = latency
+        self.upload_link = RateLimiter(bandwidth, burst=LINK_BURST)
+        self.download_link = RateLimiter(bandwidth, burst=LINK_BURST)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.uploads = {}
+        self.upload_ids = itertools.count(1)
+        self.durations = []
+        self.bytes = 0
+
+    def bucket(self, name):
+        with self.lock:
+            return self.buckets.setdefault(name, {})
+
+    def record(self, method, seconds, count):
+        with self.lock:
+            self.durations.append((method, seconds))
+            self.bytes += count
+
+    def stats(self):
+        """
+        :return: The number of bytes sent and received and the method and duration of every request since the last reset
+        :rtype: dict
+        """
+        with self.lock:
+            return {'bytes': self.bytes, 'requests': list(self.durations)}
+
+    def reset(self):
+        with self.lock:
+            self.durations = []
+            self.bytes = 0
+
+
+class ServiceError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_HEAD(self):
+        self.handle_request()
+
+    def do_PUT(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def do_DELETE(self):
+        self.handle_request()
+
+    def handle_request(self):
+        started = time.monotonic()
+        self.transferred = 0
+        url = urlsplit(self.path)
+        self.query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        path = [unquote(part) for part in url.path.split('/')[1:]]
+        try:
+            self.route(path)
+        except ServiceError as e:
+            self.send_json({'code': e.code, 'message': str(e)}, e.status)
+        if path and not path[0].startswith('_'):
+            self.server.stand_in.record(self.command, time.monotonic() - started, self.transferred)
+
+    def route(self, path):
+        """
+        Dispatches a request on the path of the Object Storage API, /n/{namespace}/b/{bucket}/o/{object} and so on
+        """
+        stand_in = self.server.stand_in
+        if path == ['_stats']:
+            return self.send_json(stand_in.stats())
+        if path == ['_reset']:
+            stand_in.reset()
+            return self.send_json({})
+        if stand_in.latency:
+            time.sleep(stand_in.latency)
+        if path in (['n'], ['n', '']):
+            return self.send_json(NAMESPACE)
+        if len(path) < 4 or path[0] != 'n' or path[2] != 'b':
+            raise ServiceError(404, 'NotFound', "Unknown path {}".format(self.path))
+        bucket = stand_in.bucket(path[3])
+        resource, name = path[4] if len(path) > 4 else None, '/'.join(path[5:]) or None
+        if resource == 'o' and name is None and self.command == 'GET':
+            return self.list_objects(bucket)
+        if resource == 'o' and name is not None:
+            return {'PUT': self.put_object, 'GET': self.get_object, 'HEAD': self.get_object, 'DELETE': self.delete_object}[self.command](bucket, name)
+        if resource == 'u' and name is None and self.command == 'POST':
+            return self.create_multipart_upload(path[3])
+        if resource == 'u' and name is not None:
+            return {'PUT': self.upload_part, 'POST': self.commit_multipart_upload, 'DELETE': self.abort_multipart_upload}[self.command](bucket, name)
+        if resource == 'actions' and name == 'renameObject':
+            return self.rename_object(bucket)
+        raise ServiceError(404, 'NotFound', "Unknown path {}".format(self.path))
+
+    def read_body(self):
+        """
+        :return: The request body, read through the upload side of the simulated link
+        :rtype: bytes
+        """
+        left = int(self.headers.get('Content-Length', 0))
+        chunks = []
+        while left > 0:
+            chunk = self.rfile.read(min(CHUNK_SIZE, left))
+            if not chunk:
+                break
+            self.server.stand_in.upload_link.consume(len(chunk))
+            chunks.append(chunk)
+            left -= len(chunk)
+        body = b''.join(chunks)
+        self.transferred += len(body)
+        return body
+
+    def send_body(self, status, body=b'', headers=None):
+        """
+        Sends a response. Bodies pass through the download side of the simulated link
+        """
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('opc-request-id', repr(time.monotonic()))
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        view = memoryview(body)
+        for offset in range(0, len(view), CHUNK_SIZE):
+            chunk = view[offset:offset + CHUNK_SIZE]
+            self.server.stand_in.download_link.consume(len(chunk))
+            self.wfile.write(chunk)
+        self.transferred += len(body)
+
+    def send_json(self, data, status=200, headers=None):
+        self.send_body(status, json.dumps(data).encode(), dict(headers or {}, **{'Content-Type': 'application/json'}))
+
+    def metadata_headers(self):
+        return {name.lower(): value for name, value in self.headers.items() if name.lower().startswith('opc-meta-')}
+
+    def find(self, bucket, name):
+        obj = bucket.get(name)
+        if obj is None:
+            raise ServiceError(404, 'ObjectNotFound', "The object '{}' does not exist".format(name))
+        return obj
+
+    def put_object(self, bucket, name):
+        data = self.read_body()
+        md5 = base64.b64encode(hashlib.md5(data).digest()).decode()
+        obj = StoredObject(data, md5, self.metadata_headers())
+        bucket[name] = obj
+        self.send_body(200, headers={'etag': obj.etag, 'opc-content-md5': md5, 'last-modified': formatdate(obj.modified, usegmt=True)})
+
+    def get_object(self, bucket, name):
+        obj = self.find(bucket, name)
+        if self.headers.get('if-match') not in (None, obj.etag):
+            raise ServiceError(412, 'IfMatchFailed', "The etag of '{}' changed".format(name))
+        headers = dict(obj.metadata)
+        headers.update({'etag': obj.etag, 'last-modified': formatdate(obj.modified, usegmt=True), 'accept-ranges': 'bytes',
+            'Content-Type': 'application/octet-stream'})
+        if obj.multipart_md5:
+            headers['opc-multipart-md5'] = obj.multipart_md5
+        else:
+            headers['content-md5'] = obj.md5
+        byte_range = self.headers.get('range')
+        if byte_range and byte_range.startswith('bytes='):
+            first, last = byte_range[len('bytes='):].split('-')
+            first, last = int(first), min(int(last) if last else len(obj.data) - 1, len(obj.data) - 1)
+            headers['content-range'] = 'bytes {}-{}/{}'.format(first, last, len(obj.data))
+            return self.send_body(206, obj.data[first:last + 1], headers)
+        self.send_body(200, obj.data, headers)
+
+    def delete_object(self, bucket, name):
+        with self.server.stand_in.lock:
+            if bucket.pop(name, None) is None:
+                raise ServiceError(404, 'ObjectNotFound', "The object '{}' does not exist".format(name))
+        self.send_body(204)
+
+    def list_objects(self, bucket):
+        prefix = self.query.get('prefix', '')
+        start = self.query.get('start', '')
+        delimiter = self.query.get('delimiter')
+        limit = int(self.query.get('limit', LIST_LIMIT))
+        with self.server.stand_in.lock:
+            names = sorted(name for name in bucket if name.startswith(prefix) and name >= start)
+        objects, prefixes, next_start = [], [], None
+        for name in names:
+            if delimiter and delimiter in name[len(prefix):]:
+                folder = prefix + name[len(prefix):].split(delimiter)[0] + delimiter
+                if folder not in prefixes:
+                    prefixes.append(folder)
+                continue
+            if len(objects) == limit:
+                next_start = name
+                break
+            obj = bucket[name]
+            modified = iso_time(obj.modified)
+            objects.append({'name': name, 'size': len(obj.data), 'md5': obj.multipart_md5 or obj.md5, 'etag': obj.etag,
+                'timeCreated': modified, 'timeModified': modified})
+        self.send_json({'objects': objects, 'prefixes': prefixes, 'nextStartWith': next_start})
+
+    def rename_object(self, bucket):
+        details = json.loads(self.read_body())
+        with self.server.stand_in.lock:
+            if details['sourceName'] not in bucket:
+                raise ServiceError(404, 'ObjectNotFound', "The object '{}' does not exist".format(details['sourceName']))
+            if details.get('newObjIfNoneMatchETag') == '*' and details['newName'] in bucket:
+                raise ServiceError(412, 'IfNoneMatchFailed', "The object '{}' already exists".format(details['newName']))
+            bucket[details['newName']] = bucket.pop(details['sourceName'])
+        self.send_body(200)
+
+    def create_multipart_upload(self, bucket_name):
+        details = json.loads(self.read_body())
+        upload_id = 'upload-{}'.format(next(self.server.stand_in.upload_ids))
+        self.server.stand_in.uploads[upload_id] = {'object': details['object'], 'metadata': details.get('metadata') or {}, 'parts': {}}
+        self.send_json({'namespace': NAMESPACE, 'bucket': bucket_name, 'object': details['object'], 'uploadId': upload_id,
+            'timeCreated': iso_time(time.time())})
+
+    def find_upload(self):
+        upload = self.server.stand_in.uploads.get(self.query.get('uploadId'))
+        if upload is None:
+            raise ServiceError(404, 'NoSuchUpload', "The upload '{}' does not exist".format(self.query.get('uploadId')))
+        return upload
+
+    def upload_part(self, bucket, name):
+        upload = self.find_upload()
+        data = self.read_body()
+        md5 = base64.b64encode(hashlib.md5(data).digest()).decode()
+        etag = hashlib.md5(md5.encode() + self.query['uploadPartNum'].encode()).hexdigest()
+        upload['parts'][int(self.query['uploadPartNum'])] = (data, md5, etag)
+        self.send_body(200, headers={'etag': etag, 'opc-content-md5': md5})
+
+    def commit_multipart_upload(self, bucket, name):
+        upload = self.find_upload()
+        details = json.loads(self.read_body())
+        parts = []
+        for part in sorted(details['partsToCommit'], key=lambda part: part['partNum']):
+            data, md5, etag = upload['parts'].get(part['partNum'], (None, None, None))
+            if etag != part['etag']:
+                raise ServiceError(400, 'InvalidPart', "Part {} was not uploaded with etag {}".format(part['partNum'], part['etag']))
+            parts.append((data, md5))
+        data = b''.join(data for data, _ in parts)
+        metadata = {key if key.startswith('opc-meta-') else 'opc-meta-' + key: value for key, value in upload['metadata'].items()}
+        obj = StoredObject(data, base64.b64encode(hashlib.md5(data).digest()).decode(), metadata, multipart_md5([md5 for _, md5 in parts]))
+        bucket[name] = obj
+        del self.server.stand_in.uploads[self.query['uploadId']]
+        self.send_body(200, headers={'etag': obj.etag, 'opc-multipart-md5': obj.multipart_md5})
+
+    def abort_multipart_upload(self, bucket, name):
+        self.find_upload()
+        del self.server.stand_in.uploads[self.query['uploadId']]
+        self.send_body(204)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Serves each request on its own thread, as http.server.ThreadingHTTPServer does from Python 3.7
+    """
+    daemon_threads = True
+
+
+def serve(port=0, latency=0, bandwidth=0, ready=None):
+    """
+    Runs the stand-in until the process is stopped
+
+    :param port: The port to listen on, or 0 for any free port
+    :type port: int
+    :param latency: Seconds added to every request
+    :type latency: float
+    :param bandwidth: Bytes per second shared by the bodies of all requests in each direction, or 0 for no limit
+    :type bandwidth: int
+    :param ready: Optional connection the port is sent on once the stand-in listens, e.g. the end of a multiprocessing.Pipe
+    :type ready: :class: 'multiprocessing.connection.Connection'
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.stand_in = StandIn(latency, bandwidth)
+    if ready is not None:
+        ready.send(server.server_address[1])
+    print("Object Storage stand-in listening on http://127.0.0.1:{}".format(server.server_address[1]))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='stand_in', description="Local stand-in for the Object Storage endpoints the application uses")
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0, help="Milliseconds added to every request")
+    parser.add_argument('--bandwidth', type=int, default=0, help="Bytes per second shared by all requests in each direction. 0 for no limit")
+    args = parser.parse_args()
+    serve(args.port, args.latency / 1000, args.bandwidth)
@@ -0,0 +1,294 @@
+from collections import namedtuple
+import mmap
+import os
+from oci_manager import choose_part_size, DEFAULT_PART_SIZE, MIN_PART_SIZE, MEBIBYTE
+from transfers import PartHasher, PART_SIZE_METADATA, multipart_md5, remote_mtime
+from util import scan_files
+
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+SYNC_FIELDS = 'name,size,md5,timeModified'
+# Modification times closer than this many seconds are the same, as file systems store them with different precision
+MTIME_WINDOW = 1
+
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+DELETE = 'delete'
+
+LocalFile = namedtuple('LocalFile', ['name', 'path', 'size', 'mtime'])
+SyncAction = namedtuple('SyncAction', ['action', 'object_name', 'path', 'size', 'reason'])
+
+def scan_local(directory, is_cancelled=None):
+    """
+    Lists the files under a directory as they are found, see util.scan_files. Partial downloads and their journals are left out
+
+    :param directory: The directory to scan
+    :type directory: string
+    :param is_cancelled: Optional callable that stops the scan when it returns True
+    :type is_cancelled: function
+
+    :return: The files, named by their path relative to the directory with '/' separators, in name order
+    :rtype: generator
+    """
+    for name, entry in scan_files(directory):
+        if is_cancelled and is_cancelled():
+            return
+        if name.endswith('.tmp.journal') or name.endswith('.tmp') and os.path.exists(entry.path + '.journal'):
+            continue
+        stat = entry.stat()
+        yield LocalFile(name, entry.path, stat.st_size, stat.st_mtime)
+
+def read_chunks(path):
+    """
+    Reads a file in a single pass. The file is mapped into memory, or read into one reused buffer when it cannot be mapped,
+    so large files are hashed without copying them chunk by chunk. Each chunk is only valid until the next one is read
+
+    :param path: The file to read
+    :type path: string
+
+    :return: The chunks of the file
+    :rtype: generator
+    """
+    offset = 0
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and files on some file systems cannot be mapped
+            mapped = None
+        view = memoryview(mapped) if mapped is not None else None
+        buffer = memoryview(bytearray(HASH_BUFFER_SIZE)) if mapped is None else None
+        try:
+            while True:
+                chunk = view[offset:offset + HASH_BUFFER_SIZE] if view is not None else buffer[:f.readinto(buffer)]
+                with chunk:
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    yield chunk
+        finally:
+            if view is not None:
+                view.release()
+                mapped.close()
+
+def hash_parts(path, part_size=None):
+    """
+    Hashes a file in a single pass, see read_chunks
+
+    :param path: The file to hash
+    :type path: string
+    :param part_size: Also hash each part of this size the way Object Storage does for a multipart upload
+    :type part_size: int
+
+    :return: The base64 encoded MD5 of the file and a list of the base64 encoded MD5s of its parts
+    :rtype: tuple
+    """
+    whole = PartHasher()
+    parts = PartHasher(part_size) if part_size else None
+    for chunk in read_chunks(path):
+        whole.update(chunk)
+        if parts:
+            parts.update(chunk)
+    return whole.part_md5s()[0], parts.part_md5s() if parts else []
+
+def multipart_md5s(path, part_sizes):
+    """
+    Hashes a file in a single pass the way Object Storage hashes multipart uploads of each of the part sizes
+
+    :param path: The file to hash
+    :type path: string
+    :param part_sizes: The part sizes in bytes
+    :type part_sizes: list
+
+    :return: The multipart MD5 of the file for each part size, see transfers.multipart_md5
+    :rtype: dict
+    """
+    hashers = {part_size: PartHasher(part_size) for part_size in part_sizes}
+    for chunk in read_chunks(path):
+        for hasher in hashers.values():
+            hasher.update(chunk)
+    return {part_size: multipart_md5(hasher.part_md5s()) for part_size, hasher in hashers.items()}
+
+def file_md5(path, part_size=None):
+    """
+    :param path: The file to hash
+    :type path: string
+    :param part_size: Hash the file the way Object Storage hashes a multipart upload with parts of this size
+    :type part_size: int
+
+    :return: The base64 encoded MD5 of the file, or for a multipart upload the MD5 of the part MD5s followed by '-' and the part count
+    :rtype: string
+    """
+    md5, part_md5s = hash_parts(path, part_size)
+    return multipart_md5(part_md5s) if part_size else md5
+
+def multipart_part_sizes(size, part_count):
+    """
+    Works out which part sizes a multipart upload of part_count parts may have been made with. The part size picked
+    by UploadManager is tried first, then the SDK's default, the smallest part size and the smallest whole MiB that
+    gives part_count parts
+
+    :param size: The size of the object
+    :type size: int
+    :param part_count: The number of parts the object was uploaded in
+    :type part_count: int
+
+    :return: The part sizes in bytes that split an object of this size into part_count parts, most likely first
+    :rtype: list
+    """
+    smallest = -(-size // part_count)
+    smallest = -(-smallest // MEBIBYTE) * MEBIBYTE
+    candidates = []
+    for part_size in [choose_part_size(size), DEFAULT_PART_SIZE, MIN_PART_SIZE, smallest]:
+        if part_size not in candidates and -(-size // part_size) == part_count:
+            candidates.append(part_size)
+    return candidates
+
+def same_content(local, md5, hash_file=file_md5, part_size=None):
+    """
+    Compares a file with the MD5 Object Storage lists for an object, hashing the file the way the object was uploaded.
+    The file is read once, even when the part size of a multipart upload has to be guessed
+
+    :param local: The file
+    :type local: :class: 'LocalFile'
+    :param md5: The MD5 of the object
+    :type md5: string
+    :param hash_file: Called with the path and the part size, or None, to hash the file
+    :type hash_file: function
+    :param part_size: The part size recorded in the metadata of a multipart upload, see UploadManager.upload_file
+    :type part_size: int
+
+    :return: True or False, or None if the MD5 cannot be compared
+    :rtype: boolean
+    """
+    if not md5:
+        return None
+    part_count = md5.partition('-')[2]
+    if not part_count:
+        return hash_file(local.path) == md5
+    if part_size and -(-local.size // part_size) == int(part_count):
+        return hash_file(local.path, part_size) == md5
+    part_sizes = multipart_part_sizes(local.size, int(part_count))
+    if len(part_sizes) == 1:
+        return hash_file(local.path, part_sizes[0]) == md5 or None
+    if md5 in multipart_md5s(local.path, part_sizes).values():
+        return True
+    return None
+
+def compare(local, remote, upload, checksum=False, hash_file=file_md5, head_object=None, is_cancelled=None):
+    """
+    Decides whether a file and an object differ. Sizes are compared first. A file last changed before the object was written
+    (when uploading), or an object last changed before the file was written (when downloading), is unchanged. Otherwise the
+    object is read with head_object, and a file whose modification time is the one recorded in the object's metadata, which
+    uploads record and downloads restore, is unchanged. Only files of the same size whose times differ are hashed and compared
+    with the object's MD5, so files that were only touched are not transferred again
+
+    :param upload: True when the file is the source, False when the object is
+    :type upload: boolean
+    :param checksum: Compare the MD5 of every file of the same size, even when the times say it is unchanged
+    :type checksum: boolean
+    :param head_object: Called with the name of the object to get the headers of a HEAD request for it
+    :type head_object: function
+    :param is_cancelled: Optional callable. Neither the object is read nor the file hashed once it returns True
+    :type is_cancelled: function
+
+    :return: Why the destination must be replaced, or None if it is unchanged or the comparison was cancelled
+    :rtype: string
+    """
+    if local.size != remote.size:
+        return "size differs"
+    remote_time = remote.time_modified.timestamp() if remote.time_modified else None
+    if not checksum and remote_time is not None:
+        if upload and local.mtime <= remote_time or not upload and local.mtime >= remote_time:
+            return None
+    if is_cancelled and is_cancelled():
+        return None
+    headers = head_object(remote.name) if head_object else {}
+    recorded = remote_mtime(headers)
+    if not checksum and recorded is not None and abs(local.mtime - recorded) < MTIME_WINDOW:
+        return None
+    try:
+        part_size = int(headers['opc-meta-' + PART_SIZE_METADATA])
+    except (KeyError, ValueError):
+        part_size = None
+    if is_cancelled and is_cancelled():
+        return None
+    same = same_content(local, getattr(remote, 'md5', None), hash_file, part_size)
+    if same:
+        return None
+    if same is None and checksum:
+        return "MD5 unavailable"
+    return "MD5 differs" if same is False else "newer" if upload else "older"
+
+def plan_sync(directory, local_files, remote_objects, prefix, upload, delete=False, checksum=False, hash_file=file_md5, head_object=None,
+        is_cancelled=None):
+    """
+    Walks a directory and a bucket prefix side by side in name order and yields what has to change for the destination to
+    match the source. The listing is consumed as it arrives, so transfers can start before the prefix has been listed
+
+    :param directory: The directory that is synced
+    :type directory: string
+    :param local_files: The files of the directory, in name order, see scan_local
+    :type local_files: iterable
+    :param remote_objects: The objects under the prefix in name order, listed with at least SYNC_FIELDS
+    :type remote_objects: iterable
+    :param prefix: The prefix the directory is synced with, ending with '/' or empty
+    :type prefix: string
+    :param upload: True to sync the directory to the prefix, False to sync the prefix to the directory
+    :type upload: boolean
+    :param delete: Also delete what the destination has and the source does not
+    :type delete: boolean
+    :param head_object: Called with an object name to get its headers, so its recorded modification time can be compared, see compare
+    :type head_object: function
+    :param is_cancelled: Optional callable that ends the plan when it returns True, also in the middle of a comparison
+    :type is_cancelled: function
+
+    :return: The actions to take
+    :rtype: generator
+    """
+    local_files = iter(local_files)
+    remote_objects = (obj for obj in remote_objects if not obj.name.endswith('/'))
+    local = next(local_files, None)
+    remote = next(remote_objects, None)
+    while (local or remote) and not (is_cancelled and is_cancelled()):
+        remote_name = remote.name[len(prefix):] if remote else None
+        if remote is None or local is not None and local.name < remote_name:
+            if upload:
+                yield SyncAction(UPLOAD, prefix + local.name, local.path, local.size, "missing")
+            elif delete:
+                yield SyncAction(DELETE, None, local.path, local.size, "not in bucket")
+            local = next(local_files, None)
+        elif local is None or remote_name < local.name:
+            if not upload:
+                yield SyncAction(DOWNLOAD, remote.name, os.path.join(directory, *remote_name.split('/')), remote.size, "missing")
+            elif delete:
+                yield SyncAction(DELETE, remote.name, None, remote.size, "not in directory")
+            remote = next(remote_objects, None)
+        else:
+            reason = compare(local, remote, upload, checksum, hash_file, head_object, is_cancelled)
+            if reason:
+                yield SyncAction(UPLOAD if upload else DOWNLOAD, remote.name, local.path, remote.size if not upload else local.size, reason)
+            local = next(local_files, None)
+            remote = next(remote_objects, None)
+
+def plan_upload(manager, bucket_name, directory, hash_file=file_md5, is_cancelled=None):
+    """
+    Plans the sync of a directory to the prefix of the same name in a bucket, see plan_sync
+
+    :param manager: The OCI manager to list and read the objects with
+    :type manager: :class: 'oci_manager.oci_manager'
+    :param bucket_name: The name of the bucket
+    :type bucket_name: string
+    :param directory: The directory to upload
+    :type directory: string
+    :param hash_file: Called with the path and the part size, or None, to hash a file, e.g HashCache.hash_file
+    :type hash_file: function
+    :param is_cancelled: Optional callable that stops the scan, the listing and the comparisons when it returns True
+    :type is_cancelled: function
+
+    :return: The uploads that make the prefix match the directory
+    :rtype: generator
+    """
+    prefix = os.path.basename(directory.rstrip('/')) + '/'
+    return plan_sync(directory, scan_local(directory, is_cancelled), manager.iter_objects(bucket_name, prefix, fields=SYNC_FIELDS,
+        is_cancelled=is_cancelled), prefix, upload=True, hash_file=hash_file, head_object=lambda name: manager.head_object(bucket_name, name),
+        is_cancelled=is_cancelled)
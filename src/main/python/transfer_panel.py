@@ -0,0 +1,114 @@
+from PySide2.QtCore import Qt
+from PySide2.QtWidgets import QWidget, QPushButton, QVBoxLayout, QTreeWidget, QTreeWidgetItem, QDialogButtonBox, QProgressBar, QAbstractItemView, QInputDialog
+from transfer_queue import ACTIVE, FAILED, FINISHED
+from util import readable_size
+
+PROGRESS_STEPS = 1000
+
+class TransferPanel(QWidget):
+
+    def __init__(self, transfer_queue):
+        """
+        TransferPanel lists every job of the transfer queue, queued, active and finished, and lets the user pause, resume,
+        cancel, retry and reprioritise the selected jobs
+
+        :param transfer_queue: The queue of upload and download jobs
+        :type transfer_queue: :class: 'transfer_queue.TransferQueue'
+        """
+        super().__init__()
+        self.transfer_queue = transfer_queue
+        self.items = {}
+        self.initUI()
+        self.transfer_queue.job_added.connect(self.add_job)
+        self.transfer_queue.job_changed.connect(self.update_job)
+        self.transfer_queue.job_removed.connect(self.remove_job)
+
+    def initUI(self):
+        self.setWindowTitle("Transfers")
+        self.resize(720, 300)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(['Job', 'Bucket', 'Status', 'Priority', 'Files Done', 'Progress', 'Size', 'Rate Limit'])
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tree.setColumnWidth(0, 220)
+
+        self.button_box = QDialogButtonBox()
+        self.button_box.setOrientation(Qt.Horizontal)
+        for text, handler in [("Pause", self.transfer_queue.pause), ("Resume", self.transfer_queue.resume),
+                ("Cancel", self.transfer_queue.cancel), ("Raise Priority", self.raise_priority), ("Lower Priority", self.lower_priority)]:
+            button = QPushButton(text)
+            button.clicked.connect(lambda checked=False, handler=handler: self.for_selected(handler))
+            self.button_box.addButton(button, QDialogButtonBox.ActionRole)
+        limit = QPushButton("Limit Rate")
+        limit.clicked.connect(self.rate_limit_prompt)
+        self.button_box.addButton(limit, QDialogButtonBox.ActionRole)
+        clear = QPushButton("Clear Finished")
+        clear.clicked.connect(self.transfer_queue.clear_finished)
+        self.button_box.addButton(clear, QDialogButtonBox.ActionRole)
+
+        self.layout = QVBoxLayout()
+        self.layout.addWidget(self.tree)
+        self.layout.addWidget(self.button_box)
+        self.setLayout(self.layout)
+
+    def for_selected(self, handler):
+        for item in self.tree.selectedItems():
+            handler(item.data(0, Qt.UserRole))
+
+    def raise_priority(self, job_id):
+        self.transfer_queue.set_priority(job_id, self.transfer_queue.jobs[job_id].priority + 1)
+
+    def lower_priority(self, job_id):
+        self.transfer_queue.set_priority(job_id, self.transfer_queue.jobs[job_id].priority - 1)
+
+    def rate_limit_prompt(self):
+        """
+        Prompts for a rate limit that replaces the shared upload or download limit for the selected jobs
+        """
+        items = self.tree.selectedItems()
+        if not items:
+            return
+        current = self.transfer_queue.jobs[items[0].data(0, Qt.UserRole)].rate_limit // 1024
+        rate, ok = QInputDialog.getInt(self, "Limit Rate", "KB/s for the selected jobs, 0 to use the shared limit", current, 0, 10 ** 7)
+        if ok:
+            self.for_selected(lambda job_id: self.transfer_queue.set_rate_limit(job_id, rate * 1024))
+
+    def add_job(self, job_id):
+        job = self.transfer_queue.jobs[job_id]
+        item = QTreeWidgetItem(self.tree)
+        item.setData(0, Qt.UserRole, job_id)
+        item.setText(0, job.description())
+        item.setToolTip(0, "\n".join(job.files))
+        item.setText(1, job.bucket_name)
+        progress = QProgressBar()
+        progress.setMaximum(PROGRESS_STEPS)
+        self.tree.setItemWidget(item, 5, progress)
+        self.items[job_id] = item
+        self.update_job(job_id)
+
+    def update_job(self, job_id):
+        """
+        Slot for a change to a job in the transfer queue
+        """
+        job = self.transfer_queue.jobs[job_id]
+        item = self.items[job_id]
+        item.setText(2, job.state)
+        item.setText(3, str(job.priority))
+        item.setText(4, str(job.files_done))
+        item.setText(6, "{} of {}".format(" ".join(readable_size(job.bytes_done)), " ".join(readable_size(job.bytes_total))))
+        item.setText(7, "{}/s".format(" ".join(readable_size(job.rate_limit))) if job.rate_limit else "Shared")
+        if job.state == FAILED:
+            item.setToolTip(2, "Connection failed. Resume the job to retry it")
+        elif job.state == ACTIVE:
+            item.setToolTip(2, "\n".join(sorted(name.split('/')[-1] for name in job.active_files)))
+        else:
+            item.setToolTip(2, "")
+        progress = self.tree.itemWidget(item, 5)
+        if job.state == FINISHED:
+            progress.setValue(PROGRESS_STEPS)
+        elif job.bytes_total:
+            progress.setValue(min(job.bytes_done, job.bytes_total) * PROGRESS_STEPS // job.bytes_total)
+
+    def remove_job(self, job_id):
+        item = self.items.pop(job_id)
+        self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
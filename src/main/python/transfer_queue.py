@@ -0,0 +1,216 @@
+from PySide2.QtCore import Signal, QObject
+import itertools
+
+MAX_ACTIVE_JOBS = 3
+MAX_JOBS_PER_BUCKET = 2
+
+QUEUED = 'Queued'
+ACTIVE = 'Active'
+PAUSED = 'Paused'
+FAILED = 'Failed'
+FINISHED = 'Finished'
+CANCELLING = 'Cancelling'
+CANCELLED = 'Cancelled'
+
+class TransferJob():
+    def __init__(self, job_id, kind, bucket_name, thread, files, bytes_total, priority=0):
+        """
+        An upload, download or copy job in the transfer queue
+
+        :param job_id: The id of the job in the queue
+        :type job_id: int
+        :param kind: 'Upload', 'Download' or 'Copy'
+        :type kind: string
+        :param bucket_name: The bucket the job transfers to or from
+        :type bucket_name: string
+        :param thread: The thread that runs the transfer. It is started by the queue
+        :type thread: :class: 'upload_thread.UploadThread', :class: 'download_thread.DownloadThread' or :class: 'copy_thread.CopyThread'
+        :param files: The names of the files or objects the job transfers
+        :type files: list
+        :param bytes_total: The size of the job in bytes
+        :type bytes_total: int
+        :param priority: Jobs with a higher priority are started first
+        :type priority: int
+        """
+        self.job_id = job_id
+        self.kind = kind
+        self.bucket_name = bucket_name
+        self.thread = thread
+        self.files = files
+        self.bytes_total = bytes_total
+        self.priority = priority
+        self.state = QUEUED
+        self.files_done = 0
+        self.bytes_done = 0
+        self.active_files = {}
+        self.pausing = False
+        self.rate_limit = 0
+
+    def description(self):
+        name = self.files[0].split('/')[-1] if self.files else ''
+        if len(self.files) > 1:
+            return "{} {} and {} more".format(self.kind, name, len(self.files) - 1)
+        return "{} {}".format(self.kind, name)
+
+
+class TransferQueue(QObject):
+
+    job_added = Signal(int)
+    job_changed = Signal(int)
+    job_removed = Signal(int)
+
+    def __init__(self, max_active=MAX_ACTIVE_JOBS, max_per_bucket=MAX_JOBS_PER_BUCKET):
+        """
+        TransferQueue starts upload and download threads in priority order while keeping at most max_active of them running,
+        and at most max_per_bucket against the same bucket. Jobs can be paused, resumed, cancelled, retried, reprioritised and given their own rate limit
+
+        :param max_active: The number of jobs that may run at once
+        :type max_active: int
+        :param max_per_bucket: The number of jobs that may run at once against one bucket
+        :type max_per_bucket: int
+        """
+        super().__init__()
+        self.max_active = max_active
+        self.max_per_bucket = max_per_bucket
+        self.jobs = {}
+        self.job_count = itertools.count()
+
+    def add(self, kind, bucket_name, thread, files, bytes_total, priority=0):
+        """
+        Queues a transfer thread. The thread must not have been started
+
+        :return: The queued job
+        :rtype: :class: 'TransferJob'
+        """
+        job = TransferJob(next(self.job_count), kind, bucket_name, thread, files, bytes_total, priority)
+        self.jobs[job.job_id] = job
+        if kind == 'Upload':
+            thread.file_uploaded.connect(lambda *args: self.file_done(job))
+            thread.bytes_uploaded.connect(lambda total, files: self.progress(job, total, files))
+            thread.files_found.connect(lambda count, bytes_total: self.set_size(job, bytes_total))
+            thread.all_files_uploaded.connect(lambda *args: self.set_state(job, FINISHED))
+            thread.upload_failed.connect(lambda: self.set_state(job, FAILED))
+        elif kind == 'Copy':
+            thread.file_copied.connect(lambda *args: self.file_done(job))
+            thread.bytes_copied.connect(lambda total, files: self.progress(job, total, files))
+            thread.copies_listed.connect(lambda bytes_total: self.set_size(job, bytes_total))
+            thread.all_files_copied.connect(lambda *args: self.set_state(job, FINISHED))
+            thread.copy_failed.connect(lambda: self.set_state(job, FAILED))
+        else:
+            thread.file_downloaded.connect(lambda *args: self.file_done(job))
+            thread.bytes_downloaded.connect(lambda total, files: self.progress(job, total, files))
+            thread.all_files_downloaded.connect(lambda *args: self.set_state(job, FINISHED))
+            thread.download_failed.connect(lambda: self.set_state(job, FAILED))
+        thread.finished.connect(lambda: self.thread_stopped(job))
+        self.job_added.emit(job.job_id)
+        self.schedule()
+        return job
+
+    def schedule(self):
+        """
+        Starts queued jobs, highest priority first, until the global or per-bucket limits are reached. A cancelled job counts
+        against the limits until its thread returns
+        """
+        active = [job for job in self.jobs.values() if job.state in (ACTIVE, CANCELLING)]
+        queued = sorted((job for job in self.jobs.values() if job.state == QUEUED), key=lambda job: (-job.priority, job.job_id))
+        for job in queued:
+            if len(active) >= self.max_active:
+                break
+            if sum(1 for other in active if other.bucket_name == job.bucket_name) >= self.max_per_bucket:
+                continue
+            active.append(job)
+            job.pausing = False
+            job.thread.paused = False
+            self.set_state(job, ACTIVE)
+            job.thread.start()
+
+    def set_state(self, job, state):
+        job.state = state
+        self.job_changed.emit(job.job_id)
+
+    def file_done(self, job):
+        job.files_done += 1
+        self.job_changed.emit(job.job_id)
+
+    def progress(self, job, total, files):
+        job.bytes_done = total
+        job.active_files = files
+        self.job_changed.emit(job.job_id)
+
+    def set_size(self, job, bytes_total):
+        """
+        Slot for a job whose size is only known once its thread has listed what it transfers
+        """
+        job.bytes_total = bytes_total
+        self.job_changed.emit(job.job_id)
+
+    def thread_stopped(self, job):
+        """
+        Slot for a transfer thread that returned. A job that neither finished nor failed was paused or cancelled
+        """
+        if job.state == CANCELLING:
+            self.set_state(job, CANCELLED)
+        elif job.state == ACTIVE:
+            self.set_state(job, PAUSED if job.pausing else FINISHED)
+        self.schedule()
+
+    def pause(self, job_id):
+        """
+        Pauses a job. A running job finishes the files in flight and then stops; a queued job is held back
+        """
+        job = self.jobs[job_id]
+        if job.state == ACTIVE:
+            job.pausing = True
+            job.thread.pause()
+        elif job.state == QUEUED:
+            self.set_state(job, PAUSED)
+
+    def resume(self, job_id):
+        """
+        Queues a paused or failed job again. It continues where it stopped
+        """
+        job = self.jobs[job_id]
+        if job.state in (PAUSED, FAILED):
+            self.set_state(job, QUEUED)
+            self.schedule()
+
+    def cancel(self, job_id):
+        """
+        Cancels a job without waiting for its thread. A running job stays Cancelling, and keeps its place against the limits,
+        until the thread returns
+        """
+        job = self.jobs[job_id]
+        if job.state in (QUEUED, ACTIVE, PAUSED, FAILED):
+            running = job.state == ACTIVE or job.thread.isRunning()
+            job.thread.stop()
+            if running:
+                self.set_state(job, CANCELLING)
+            else:
+                self.set_state(job, CANCELLED)
+                self.schedule()
+
+    def set_priority(self, job_id, priority):
+        self.jobs[job_id].priority = priority
+        self.job_changed.emit(job_id)
+        self.schedule()
+
+    def set_rate_limit(self, job_id, rate):
+        """
+        Gives a job its own rate limit in place of the shared one
+
+        :param rate: The rate in bytes per second, or 0 to use the shared limit
+        :type rate: int
+        """
+        job = self.jobs[job_id]
+        job.rate_limit = rate
+        job.thread.set_rate_limit(rate)
+        self.job_changed.emit(job_id)
+
+    def clear_finished(self):
+        """
+        Removes finished and cancelled jobs from the queue
+        """
+        for job in list(self.jobs.values()):
+            if job.state in (FINISHED, CANCELLED):
+                del self.jobs[job.job_id]
+                self.job_removed.emit(job.job_id)
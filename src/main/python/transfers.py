@@ -0,0 +1,888 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from util import get_filesize, readable_size, scan_files
+
+UPLOAD_CONCURRENCY = 4
+DOWNLOAD_CONCURRENCY = 4
+DOWNLOAD_RANGE_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 0.1
+SCAN_AHEAD = 100000
+SCAN_WAIT = 0.1
+RATE_BURST = 0.5
+RATE_WAIT = 0.1
+MTIME_METADATA = 'mtime'
+PART_SIZE_METADATA = 'partsize'
+VERIFY_ATTEMPTS = 2
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
+
+class DownloadCancelled(Exception):
+    pass
+
+class ChecksumMismatch(IOError):
+    pass
+
+
+class TransferProgress():
+    def __init__(self, publish, interval=PROGRESS_INTERVAL):
+        """
+        TransferProgress adds up the bytes transferred by every worker of a job and hands the totals to publish at most
+        once per interval, so progress costs a counter update per chunk instead of a cross-thread signal.
+
+        Totals are absolute, so a file that is restarted or resumed is counted again from what its new attempt reports
+
+        :param publish: Called with the bytes transferred for the whole job and a dict of the bytes transferred per active file
+        :type publish: function
+        :param interval: The minimum number of seconds between calls to publish
+        :type interval: float
+        """
+        self.publish = publish
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.total = 0
+        self.files = {}
+        self.published = 0
+
+    def start(self, key):
+        """
+        Begins counting a file, dropping what an earlier attempt of the same file counted
+        """
+        with self.lock:
+            self.total -= self.files.pop(key, 0)
+            self.files[key] = 0
+
+    def add(self, key, count):
+        """
+        :param key: The file the bytes belong to
+        :type key: string
+        :param count: The number of bytes transferred since the last call
+        :type count: int
+        """
+        with self.lock:
+            self.files[key] = self.files.get(key, 0) + count
+            self.total += count
+            now = time.monotonic()
+            if now - self.published < self.interval:
+                return
+            self.published = now
+            total, files = self.total, dict(self.files)
+        self.publish(total, files)
+
+    def finish(self, key):
+        """
+        Stops counting a file as active and publishes the totals straight away
+        """
+        with self.lock:
+            self.files.pop(key, None)
+            self.published = time.monotonic()
+            total, files = self.total, dict(self.files)
+        self.publish(total, files)
+
+
+class RateLimiter():
+    def __init__(self, rate=0, shared=None, burst=RATE_BURST):
+        """
+        RateLimiter is a token bucket that keeps the bytes passed through it under rate bytes per second. It is shared by every
+        worker of every transfer it is given to, so they split the rate between them. Workers take the bytes they send or receive
+        and then wait until the bucket is no longer in debt, which lets a chunk larger than the bucket through at the right pace.
+
+        A limiter can override a shared limiter, so a single job can be given its own rate. While the rate of the override is 0
+        its bytes go through the shared limiter instead. The rate of either can be changed while transfers are running
+
+        :param rate: The rate in bytes per second, or 0 for no limit
+        :type rate: int
+        :param shared: The limiter used while this limiter has no rate
+        :type shared: :class: 'RateLimiter'
+        :param burst: The number of seconds of transfer the bucket holds when idle
+        :type burst: float
+        """
+        self.rate = rate
+        self.shared = shared
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate):
+        """
+        :param rate: The new rate in bytes per second, or 0 for no limit
+        :type rate: int
+        """
+        with self.lock:
+            self.refill()
+            self.rate = rate
+            if not rate:
+                self.tokens = 0
+
+    def refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.rate * self.burst)
+        self.updated = now
+
+    def consume(self, count, is_cancelled=None):
+        """
+        Takes count bytes from the bucket and blocks until the rate allows them
+
+        :param count: The number of bytes sent or received
+        :type count: int
+        :param is_cancelled: Optional callable. The wait ends early once it returns True
+        :type is_cancelled: function
+        """
+        with self.lock:
+            limited = self.rate
+            if limited:
+                self.refill()
+                self.tokens -= count
+        if not limited:
+            if self.shared:
+                self.shared.consume(count, is_cancelled)
+            return
+        while not (is_cancelled and is_cancelled()):
+            with self.lock:
+                if not self.rate:
+                    return
+                self.refill()
+                if self.tokens >= 0:
+                    return
+                delay = -self.tokens / self.rate
+            time.sleep(min(delay, RATE_WAIT))
+
+
+class UploadJob():
+    def __init__(self, object_name, file_path, filesize, filesize_bits):
+        """
+        A single file to upload. The job is passed to UploadManager.upload_file as the mixin, so it also records
+        the id of the multipart upload the file is sent with, which is needed to resume or abort the upload
+
+        :param object_name: The name of the object to create
+        :type object_name: string
+        :param file_path: The absolute path of the file
+        :type file_path: string
+        :param filesize: The filesize in format of numeric then abbreviated units e.g '128 KB'
+        :type filesize: string
+        :param filesize_bits: The size of the file in bytes
+        :type filesize_bits: int
+        """
+        self.object_name = object_name
+        self.file_path = file_path
+        self.filesize = filesize
+        self.filesize_bits = filesize_bits
+        self.upload_id = None
+        self.part_size = None
+
+    def signal_upload_id(self, upload_id):
+        self.upload_id = upload_id
+
+
+def mtime_metadata(path):
+    """
+    :return: Object metadata recording the modification time of a file, so it can be restored when the object is downloaded
+    :rtype: dict
+    """
+    return {MTIME_METADATA: repr(os.stat(path).st_mtime)}
+
+def remote_mtime(headers):
+    """
+    :param headers: The headers of a HEAD or GET request for an object
+    :type headers: dict
+
+    :return: The modification time recorded in the object's metadata, or else the time the object was last modified
+    :rtype: float
+    """
+    try:
+        return float(headers['opc-meta-' + MTIME_METADATA])
+    except (KeyError, ValueError):
+        pass
+    try:
+        return parsedate_to_datetime(headers['last-modified']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class PartHasher():
+    def __init__(self, part_size=None):
+        """
+        PartHasher computes MD5s incrementally as data arrives, starting a new one every part_size bytes the way Object Storage
+        hashes the parts of a multipart upload
+
+        :param part_size: The size of each part, or None to hash all the data as one part
+        :type part_size: int
+        """
+        self.part_size = part_size
+        self.part_left = part_size
+        self.md5 = hashlib.md5()
+        self.digests = []
+
+    def update(self, data):
+        data = memoryview(data)
+        while self.part_size and len(data) >= self.part_left:
+            self.md5.update(data[:self.part_left])
+            data = data[self.part_left:]
+            self.digests.append(self.md5.digest())
+            self.md5, self.part_left = hashlib.md5(), self.part_size
+        self.md5.update(data)
+        if self.part_size:
+            self.part_left -= len(data)
+
+    def part_md5s(self):
+        """
+        :return: The base64 encoded MD5 of each part, the last one possibly shorter than part_size
+        :rtype: list
+        """
+        digests = self.digests
+        if self.part_left != self.part_size or not digests:
+            digests = digests + [self.md5.digest()]
+        return [base64.b64encode(digest).decode() for digest in digests]
+
+class OrderedHasher():
+    def __init__(self, window):
+        """
+        OrderedHasher computes the MD5 of a file from ranges that are fetched at once and finish in any order. The range at the
+        first byte not hashed yet is hashed as it arrives, and the ranges after it are held in memory until it reaches them.
+        Ranges are only started within window bytes of that byte, see wait, which bounds the memory held
+
+        :param window: The number of bytes past the first byte not hashed yet that ranges may be fetched up to
+        :type window: int
+        """
+        self.window = window
+        self.hasher = PartHasher()
+        self.offset = 0
+        self.held = {}
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def read(self, path, byte_range):
+        """
+        Hashes a range that is already in the file. It must start at the first byte not hashed yet
+        """
+        hash_range(path, byte_range, hasher=self.hasher)
+        self.offset = byte_range[1] + 1
+
+    def range(self, start):
+        """
+        :return: The hasher a range starting at start is fetched with, see RangedDownloader.fetch_range
+        :rtype: :class: 'transfers.OrderedRange'
+        """
+        return OrderedRange(self, start)
+
+    def wait(self, start):
+        """
+        Blocks until a range starting at start may be fetched, or the hasher is stopped
+
+        :return: False if the hasher was stopped
+        :rtype: boolean
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.stopped or start - self.offset < self.window)
+            return not self.stopped
+
+    def stop(self):
+        """
+        Releases wait, since a range that failed never lets the hash move past it
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def part_md5s(self):
+        return self.hasher.part_md5s()
+
+class OrderedRange():
+    def __init__(self, ordered, start):
+        """
+        The part of an OrderedHasher a single range is fetched with
+
+        :param ordered: The hasher of the whole file
+        :type ordered: :class: 'transfers.OrderedHasher'
+        :param start: The offset of the range
+        :type start: int
+        """
+        self.ordered = ordered
+        self.start = start
+        self.chunks = []
+
+    def update(self, data):
+        ordered = self.ordered
+        with ordered.condition:
+            if self.start == ordered.offset and not self.chunks:
+                ordered.hasher.update(data)
+                ordered.offset += len(data)
+                self.start += len(data)
+                ordered.condition.notify_all()
+            else:
+                self.chunks.append(data)
+
+    def part_md5s(self):
+        """
+        Called once the range is complete. Hashes the range and the complete ranges held after it if the hash has reached it
+
+        :return: None, since the range has no MD5 of its own
+        """
+        ordered = self.ordered
+        with ordered.condition:
+            # A range hashed as it arrived holds nothing, and its end is the start of the next range
+            if self.chunks:
+                ordered.held[self.start] = self.chunks
+            while ordered.offset in ordered.held:
+                for chunk in ordered.held.pop(ordered.offset):
+                    ordered.hasher.update(chunk)
+                    ordered.offset += len(chunk)
+            ordered.condition.notify_all()
+        return None
+
+def multipart_md5(part_md5s):
+    """
+    :param part_md5s: The base64 encoded MD5s of the parts of a multipart upload
+    :type part_md5s: list
+
+    :return: The MD5 Object Storage gives the object, the MD5 of the part MD5s followed by '-' and the part count
+    :rtype: string
+    """
+    digests = b''.join(base64.b64decode(md5) for md5 in part_md5s)
+    return "{}-{}".format(base64.b64encode(hashlib.md5(digests).digest()).decode(), len(part_md5s))
+
+def expected_md5(headers, size):
+    """
+    Reads the checksum of an object from the headers of a HEAD or GET request. The MD5 of a multipart upload can only be
+    rebuilt when the upload recorded its part size in the object's metadata, see UploadManager.upload_file
+
+    :param headers: The headers of the request
+    :type headers: dict
+    :param size: The size of the object in bytes
+    :type size: int
+
+    :return: The MD5 of the object, or None if it cannot be verified, and the part size it was computed with, or None if
+        the object was uploaded in one part
+    :rtype: tuple
+    """
+    md5 = headers.get('content-md5')
+    if md5:
+        return md5, None
+    multipart = headers.get('opc-multipart-md5') or ''
+    try:
+        part_size = int(headers['opc-meta-' + PART_SIZE_METADATA])
+    except (KeyError, ValueError):
+        return None, None
+    if part_size > 0 and multipart.partition('-')[2] == str(-(-size // part_size)):
+        return multipart, part_size
+    return None, None
+
+def hash_range(path, byte_range, part_size=None, hasher=None):
+    """
+    Hashes a byte range of a file that was already written, see PartHasher
+
+    :param hasher: Optional hasher of the bytes before the range, which the range is added to
+    :type hasher: :class: 'PartHasher'
+
+    :return: The base64 encoded MD5 of each part of the range
+    :rtype: list
+    """
+    hasher = hasher or PartHasher(part_size)
+    start, end = byte_range
+    left = end - start + 1
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while left > 0:
+            chunk = f.read(min(DOWNLOAD_RANGE_SIZE, left))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            left -= len(chunk)
+    return hasher.part_md5s()
+
+
+def iter_upload_jobs(path, prefix=''):
+    """
+    :param path: A file, or a directory that is walked as it is read, see util.scan_files
+    :type path: string
+    :param prefix: Prepended to the name of every object
+    :type prefix: string
+
+    :return: An upload job for the file, or for every file under the directory named by its path from the directory's parent
+    :rtype: generator
+    """
+    if os.path.isfile(path):
+        size, readable = get_filesize(path)
+        yield UploadJob(prefix + os.path.basename(path), path, " ".join(readable), size)
+        return
+    prefix += os.path.basename(os.path.abspath(path)) + '/'
+    for name, entry in scan_files(path):
+        size = entry.stat().st_size
+        yield UploadJob(prefix + name, entry.path, " ".join(readable_size(size)), size)
+
+
+class JobScanner():
+    def __init__(self, jobs, publish=None, is_cancelled=None, limit=SCAN_AHEAD, interval=PROGRESS_INTERVAL):
+        """
+        JobScanner reads the jobs of a transfer, e.g. the files under a dropped directory, on a background thread and queues them
+        as they are found, so the transfer starts with the first file instead of waiting for a whole tree to be walked. The number
+        and size of the jobs found so far are handed to publish at most once per interval, so the size of the transfer grows while
+        it runs. At most limit jobs are queued ahead of the transfer, which bounds the memory a tree of millions of files takes
+
+        :param jobs: Returns a generator of jobs with a filesize_bits size. It is called again when a scan that ran to the end is started again
+        :type jobs: function
+        :param publish: Called with the number and the total size of the jobs found
+        :type publish: function
+        :param is_cancelled: Optional callable. The scan stops once it returns True and carries on from there when it is started again
+        :type is_cancelled: function
+        :param limit: The number of jobs queued ahead of the transfer at most
+        :type limit: int
+        :param interval: The minimum number of seconds between calls to publish
+        :type interval: float
+        """
+        self.jobs = jobs
+        self.publish = publish
+        self.is_cancelled = is_cancelled
+        self.interval = interval
+        self.queue = queue.Queue(limit)
+        self.thread = None
+        self.generator = None
+        self.held = None
+        self.count = 0
+        self.size = 0
+        self.published = 0
+
+    def start(self):
+        """
+        Starts the scan unless it is running
+        """
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.scan, daemon=True)
+            self.thread.start()
+
+    def scan(self):
+        if self.generator is None:
+            self.generator = self.jobs()
+        while not (self.is_cancelled and self.is_cancelled()):
+            job = self.held if self.held is not None else next(self.generator, None)
+            if job is None:
+                self.generator = None
+                break
+            if self.held is None:
+                self.count += 1
+                self.size += job.filesize_bits
+                if self.publish and time.monotonic() - self.published >= self.interval:
+                    self.published = time.monotonic()
+                    self.publish(self.count, self.size)
+            try:
+                self.queue.put(job, timeout=SCAN_WAIT)
+                self.held = None
+            except queue.Full:
+                self.held = job
+        if self.publish and self.count:
+            self.publish(self.count, self.size)
+
+    def iter_jobs(self, is_cancelled=None):
+        """
+        :param is_cancelled: Optional callable. Waiting for the scan ends once it returns True
+        :type is_cancelled: function
+
+        :return: The jobs found, waiting for the scan when the transfer is ahead of it. Ends once the scan stopped and every job was taken
+        :rtype: generator
+        """
+        while True:
+            try:
+                yield self.queue.get(timeout=SCAN_WAIT)
+            except queue.Empty:
+                if self.thread is None or not self.thread.is_alive() and self.queue.empty():
+                    return
+                if is_cancelled and is_cancelled():
+                    return
+
+
+def run_concurrently(jobs, function, concurrency, is_cancelled=None):
+    """
+    Calls a function on each job on a pool of worker threads and yields the jobs as they finish. Jobs are only taken from
+    the iterable when a worker is free, so a generator of jobs is never read far ahead of the transfers
+
+    :param jobs: The jobs to run
+    :type jobs: iterable
+    :param function: Called on a worker thread with a single job
+    :type function: function
+    :param concurrency: The number of jobs that may run at once
+    :type concurrency: int
+    :param is_cancelled: Optional callable. No more jobs are started once it returns True, but running jobs are still yielded
+    :type is_cancelled: function
+
+    :return: Tuples of the job, the function's return value and the exception it raised, if any
+    :rtype: generator
+    """
+    jobs = iter(jobs)
+    running = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            while len(running) < concurrency and not (is_cancelled and is_cancelled()):
+                job = next(jobs, None)
+                if job is None:
+                    break
+                running[executor.submit(function, job)] = job
+            if not running:
+                return
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                error = future.exception()
+                yield job, None if error else future.result(), error
+
+
+class DownloadJournal():
+    def __init__(self, path, etag, size, range_size, completed=None, digests=None):
+        """
+        A sidecar record of the byte ranges of an object already written to a partial download, with the MD5s computed while
+        each range was written
+
+        :param path: The path of the journal file, or None to keep the journal in memory only
+        :type path: string
+        :param etag: The etag of the object being downloaded
+        :type etag: string
+        :param size: The size of the object in bytes
+        :type size: int
+        :param range_size: The size of every range but the last
+        :type range_size: int
+        :param completed: The first byte of each completed range
+        :type completed: set
+        :param digests: The MD5s of each completed range, keyed by its first byte, see RangedDownloader.fetch_range
+        :type digests: dict
+        """
+        self.path = path
+        self.etag = etag
+        self.size = size
+        self.range_size = range_size
+        self.completed = completed or set()
+        self.digests = digests or {}
+
+    @staticmethod
+    def load(path, etag, size):
+        """
+        :return: The journal at path, or None if there is none or it was written for a different version of the object
+        :rtype: :class: 'DownloadJournal'
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('etag') != etag or data.get('size') != size:
+            return None
+        digests = {int(start): md5s for start, md5s in data.get('digests', {}).items()}
+        return DownloadJournal(path, etag, size, data['range_size'], set(data['completed']), digests)
+
+    def ranges(self):
+        """
+        :return: The first and last byte of every range of the object
+        :rtype: list
+        """
+        return [(start, min(start + self.range_size, self.size) - 1) for start in range(0, self.size, self.range_size)]
+
+    def completed_bytes(self):
+        return sum(end - start + 1 for start, end in self.ranges() if start in self.completed)
+
+    def completed_prefix(self):
+        """
+        :return: The completed ranges from the start of the object up to the first range that is missing
+        :rtype: list
+        """
+        prefix = []
+        for byte_range in self.ranges():
+            if byte_range[0] not in self.completed:
+                break
+            prefix.append(byte_range)
+        return prefix
+
+    def complete(self, byte_range, part_md5s=None):
+        """
+        Records a written range. The journal is replaced in one rename so a crash never leaves it half written
+
+        :param part_md5s: The MD5s computed while the range was written
+        :type part_md5s: list
+        """
+        self.completed.add(byte_range[0])
+        if part_md5s is not None:
+            self.digests[byte_range[0]] = part_md5s
+        if not self.path:
+            return
+        with open(self.path + '.new', 'w') as f:
+            json.dump({'etag': self.etag, 'size': self.size, 'range_size': self.range_size, 'completed': sorted(self.completed),
+                'digests': self.digests}, f)
+        os.replace(self.path + '.new', self.path)
+
+    def discard(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RangedDownloader():
+    def __init__(self, os_client, namespace, bucket_name, range_size=DOWNLOAD_RANGE_SIZE, concurrency=DOWNLOAD_CONCURRENCY,
+            progress_callback=None, is_cancelled=None, rate_limiter=None):
+        """
+        RangedDownloader fetches an object as byte ranges on several connections at once. The file is preallocated at the size of the
+        object and each range is written at its own offset, so ranges can finish in any order. Objects no larger than two ranges are
+        fetched with a single request. Completed ranges can be recorded in a :class: 'DownloadJournal' so a failed download resumes
+
+        :param os_client: The object storage client shared by every range request
+        :type os_client: :class: 'oci.object_storage.ObjectStorageClient'
+        :param namespace: The namespace of the bucket
+        :type namespace: string
+        :param bucket_name: The name of the bucket to download from
+        :type bucket_name: string
+        :param range_size: The number of bytes fetched per request
+        :type range_size: int
+        :param concurrency: The number of ranges fetched at once
+        :type concurrency: int
+        :param progress_callback: Called with the number of bytes written after each chunk
+        :type progress_callback: function
+        :param is_cancelled: Optional callable. Downloads stop and raise DownloadCancelled once it returns True
+        :type is_cancelled: function
+        :param rate_limiter: Optional limiter every chunk received is passed through
+        :type rate_limiter: :class: 'RateLimiter'
+        """
+        self.os_client = os_client
+        self.namespace = namespace
+        self.bucket_name = bucket_name
+        self.range_size = range_size
+        self.concurrency = concurrency
+        self.progress_callback = progress_callback
+        self.is_cancelled = is_cancelled
+        self.rate_limiter = rate_limiter
+
+    def download(self, object_name, path, journal_path=None):
+        """
+        Downloads an object into a file. With a journal, the ranges written so far and the object's etag are recorded
+        next to the file, and a later call with the same paths only fetches the missing ranges. The journal is ignored
+        and replaced if the object's etag or size changed, and removed once the download completes.
+
+        The file is checked against the MD5 the object's headers carry, see expected_md5, and ranges are hashed as they are
+        written so the file is not read again. The MD5 of an object uploaded in one part can only be computed in order, so its
+        ranges are hashed in order as they complete, see fetch_in_order. A multipart object that does not match has its ranges fetched
+        again until it does, see refetch_ranges, and any other object is downloaded again. ChecksumMismatch is raised if the file
+        still does not match after VERIFY_ATTEMPTS tries. The file is given the modification time of the object, see remote_mtime
+
+        :param object_name: The name of the object
+        :type object_name: string
+        :param path: The path of the file to write
+        :type path: string
+        :param journal_path: Optional path of the sidecar journal of completed ranges
+        :type journal_path: string
+
+        :return: The size of the object in bytes
+        :rtype: int
+        """
+        response = self.os_client.head_object(self.namespace, self.bucket_name, object_name)
+        size = int(response.headers['Content-Length'])
+        etag = response.headers.get('etag')
+        md5, part_size = expected_md5(response.headers, size)
+        range_size = self.range_size if size > 2 * self.range_size else max(size, 1)
+        if part_size and range_size < size:
+            # Ranges start on part boundaries so every part is hashed by a single request
+            range_size = max(range_size // part_size, 1) * part_size
+
+        journal = DownloadJournal.load(journal_path, etag, size) if journal_path else None
+        if journal and part_size and journal.range_size < size and journal.range_size % part_size:
+            journal = None
+        in_order = md5 is not None and not part_size
+        for attempt in range(VERIFY_ATTEMPTS):
+            if journal is None or not os.path.isfile(path) or os.path.getsize(path) != size:
+                journal = DownloadJournal(journal_path, etag, size, range_size)
+                with open(path, 'wb') as f:
+                    f.truncate(size)
+            else:
+                if in_order:
+                    # Only the ranges before the first missing one can be hashed in order, the ranges after it are fetched again
+                    journal.completed = set(start for start, _ in journal.completed_prefix())
+                if self.progress_callback and journal.completed:
+                    self.progress_callback(journal.completed_bytes())
+
+            if size == 0:
+                part_md5s = self.fetch_range(object_name, path, etag, None)
+            elif in_order:
+                part_md5s = self.fetch_in_order(object_name, path, journal)
+            else:
+                self.fetch_ranges(object_name, path, journal, part_size)
+                part_md5s = self.part_md5s(path, journal, part_size)
+            if md5 is None or self.checksum(part_md5s, part_size) == md5:
+                break
+            if part_size and attempt + 1 < VERIFY_ATTEMPTS:
+                logger.warning("{} does not match the MD5 of {}, fetching its ranges again".format(path, object_name))
+                if self.refetch_ranges(object_name, path, journal, part_size, md5):
+                    break
+                raise ChecksumMismatch("{} does not match the MD5 of {}".format(path, object_name))
+            logger.warning("{} does not match the MD5 of {}, downloading it again".format(path, object_name))
+            journal.discard()
+            journal = None
+            if self.progress_callback:
+                self.progress_callback(-size)
+        else:
+            raise ChecksumMismatch("{} does not match the MD5 of {}".format(path, object_name))
+
+        journal.discard()
+        mtime = remote_mtime(response.headers)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return size
+
+    def fetch_ranges(self, object_name, path, journal, part_size=None):
+        """
+        Fetches the ranges the journal has not recorded yet, several at once, and records each as it completes
+        """
+        ranges = [byte_range for byte_range in journal.ranges() if byte_range[0] not in journal.completed]
+        failure = []
+        for byte_range, part_md5s, error in run_concurrently(ranges, lambda byte_range: self.fetch_range(object_name, path, journal.etag,
+                byte_range, part_size), self.concurrency, lambda: bool(failure) or self.cancelled()):
+            if error:
+                failure.append(error)
+            else:
+                journal.complete(byte_range, part_md5s)
+        if failure:
+            raise failure[0]
+        if self.cancelled():
+            raise DownloadCancelled(object_name)
+
+    def fetch_in_order(self, object_name, path, journal):
+        """
+        Fetches the ranges the journal has not recorded yet several at once like fetch_ranges, and hashes them in order with an
+        OrderedHasher, so no more than concurrency ranges are held in memory. The ranges recorded by an earlier attempt, which
+        precede them, are hashed from the file first
+
+        :return: The base64 encoded MD5 of the file
+        :rtype: list
+        """
+        ordered = OrderedHasher(self.concurrency * journal.range_size)
+        ranges = []
+        for byte_range in journal.ranges():
+            if byte_range[0] in journal.completed:
+                ordered.read(path, byte_range)
+            else:
+                ranges.append(byte_range)
+
+        def fetch(byte_range):
+            try:
+                return self.fetch_range(object_name, path, journal.etag, byte_range, hasher=ordered.range(byte_range[0]))
+            except Exception:
+                ordered.stop()
+                raise
+
+        failure = []
+        jobs = (byte_range for byte_range in ranges if ordered.wait(byte_range[0]))
+        for byte_range, _, error in run_concurrently(jobs, fetch, self.concurrency, lambda: bool(failure) or self.cancelled()):
+            if error:
+                failure.append(error)
+            else:
+                journal.complete(byte_range)
+        if failure:
+            raise failure[0]
+        if self.cancelled():
+            raise DownloadCancelled(object_name)
+        return ordered.part_md5s()
+
+    def refetch_ranges(self, object_name, path, journal, part_size, md5):
+        """
+        Fetches the ranges of a multipart object again until the file matches its MD5. Object Storage does not give the MD5 of
+        each part, so a corrupt range is the one whose MD5s change when it is fetched again. Ranges are fetched several at once
+        and no more are started once the file matches, so a bad part is repaired without fetching the whole object again
+
+        :param md5: The multipart MD5 of the object
+        :type md5: string
+
+        :return: Whether the file matches the MD5
+        :rtype: boolean
+        """
+        def refetch(byte_range):
+            if self.progress_callback:
+                self.progress_callback(byte_range[0] - byte_range[1] - 1)
+            return self.fetch_range(object_name, path, journal.etag, byte_range, part_size)
+
+        # Ranges already started when the file matches are still written, so the last check decides
+        matched = [False]
+        failure = []
+        for byte_range, part_md5s, error in run_concurrently(journal.ranges(), refetch, self.concurrency,
+                lambda: matched[0] or bool(failure) or self.cancelled()):
+            if error:
+                failure.append(error)
+            elif part_md5s != journal.digests.get(byte_range[0]):
+                journal.complete(byte_range, part_md5s)
+                matched[0] = self.checksum(self.part_md5s(path, journal, part_size), part_size) == md5
+        if matched[0]:
+            return True
+        if failure:
+            raise failure[0]
+        if self.cancelled():
+            raise DownloadCancelled(object_name)
+        return False
+
+    def part_md5s(self, path, journal, part_size=None):
+        """
+        :return: The MD5s of every range in order. Ranges a journal from an older version recorded without MD5s are read back
+        :rtype: list
+        """
+        part_md5s = []
+        for byte_range in journal.ranges():
+            md5s = journal.digests.get(byte_range[0])
+            part_md5s.extend(md5s if md5s is not None else hash_range(path, byte_range, part_size))
+        return part_md5s
+
+    def checksum(self, part_md5s, part_size=None):
+        """
+        :param part_md5s: The MD5 of each part of a multipart object, or the MD5 of an object uploaded in one part
+        :type part_md5s: list
+
+        :return: The MD5 of the downloaded file in the form Object Storage gives it to the object
+        :rtype: string
+        """
+        if part_size:
+            return multipart_md5(part_md5s)
+        return part_md5s[0]
+
+    def fetch_range(self, object_name, path, etag, byte_range, part_size=None, hasher=None):
+        """
+        Fetches a byte range of an object and writes it at the same offset of the file, hashing it on the way. The request only
+        succeeds if the object still has the given etag, so a range of an object that is overwritten mid-download is never
+        mixed with the others
+
+        :param byte_range: The first and last byte of the range, or None for the whole object
+        :type byte_range: tuple
+        :param part_size: Hash each part of this size separately, see PartHasher. The range must start on a part boundary
+        :type part_size: int
+        :param hasher: Optional hasher the range is handed to in place of a PartHasher of its own, e.g. an OrderedRange
+        :type hasher: :class: 'PartHasher'
+
+        :return: The part_md5s of the hasher, the base64 encoded MD5 of each part of the range or of the whole range without a part size
+        :rtype: list
+        """
+        kwargs = {'if_match': etag} if etag else {}
+        if byte_range:
+            kwargs['range'] = 'bytes={}-{}'.format(*byte_range)
+        response = self.os_client.get_object(self.namespace, self.bucket_name, object_name, **kwargs)
+        hasher = hasher or PartHasher(part_size)
+        written = 0
+        with open(path, 'r+b') as f:
+            f.seek(byte_range[0] if byte_range else 0)
+            for chunk in response.data.iter_content(chunk_size=CHUNK_SIZE):
+                if self.cancelled():
+                    raise DownloadCancelled(object_name)
+                written += f.write(chunk)
+                hasher.update(chunk)
+                if self.rate_limiter:
+                    self.rate_limiter.consume(len(chunk), self.cancelled)
+                if self.progress_callback:
+                    self.progress_callback(len(chunk))
+        if byte_range and written != byte_range[1] - byte_range[0] + 1:
+            raise IOError("Received {} bytes of range {}-{} of {}".format(written, byte_range[0], byte_range[1], object_name))
+        return hasher.part_md5s()
+
+    def cancelled(self):
+        return bool(self.is_cancelled and self.is_cancelled())
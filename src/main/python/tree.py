@@ -1,42 +1,138 @@
 from PySide2.QtCore import Qt, Signal, QSortFilterProxyModel
 from PySide2.QtGui import QColor, QCursor
-from PySide2.QtWidgets import QWidget, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QTreeWidget, QTreeWidgetItem, QDialogButtonBox, QDialog, QLineEdit, QAbstractItemView, QMenuBar, QMenu, QAction, QDialog, QMessageBox, QInputDialog, QLayout
-from rename import RenameWindow
+from PySide2.QtWidgets import QWidget, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QTreeWidget, QTreeWidgetItem, QTreeView, QDialogButtonBox, QDialog, QLineEdit, QAbstractItemView, QMenuBar, QMenu, QAction, QDialog, QMessageBox, QInputDialog, QLayout, QProgressDialog
+from rename import RenameWindow, BulkRenameWindow
+from bulk import renamer, plan_renames
+from object_model import ObjectListModel
+from bulk_thread import BulkThread
+from server_copy import CopySource, CopyItem, CopyDestination
+from util import readable_size
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
 
 byte_type = {'KB':1, 'MB':2, 'GB':3, 'TB':4, 'PB':5}
+MAX_REPORTED_FAILURES = 20
 
 class Tree(QTreeWidget):
-    def __init__(self, accept_drop=False, bucket_name=None, oci_manager=None):
+    def __init__(self):
         """
-        Tree is a widget for displaying object storage information for compartments, buckets, and objects.
-        This especially important for the object tree as the widget has functionality to perform drag and drop uploads
-
-        :param accept_drop: Enable drag and drop events
-        :type accept_drop: boolean
-        :param bucket_name: The name of the bucket for an object tree
-        :type bucket_name: string
-        :param oci_manager: The OCI manager used by the main application
-        :type: oci_manager :class: 'oci_manager.oci_manager'
+        Tree is a widget for displaying object storage information for compartments and buckets.
         """
         super(Tree, self).__init__()
         
         self.setContextMenuPolicy(Qt.CustomContextMenu)
-        
-        self.accept_drop = accept_drop
-        if accept_drop:
-            self.customContextMenuRequested.connect(self.object_context_menu)
-            self.setAcceptDrops(accept_drop)
-            self.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.bucket_name = bucket_name
-        self.oci_manager = oci_manager
         self.proxy_model = SizeSort()
         self.setSortingEnabled(True)
 
-    def object_tree_init(self):
+    def toggle(self):
+        if self.isVisible():
+            self.hide()
+        else:
+            self.show()
+
+class ObjectTree(QTreeView):
+    def __init__(self, listing_service, listing_cache=None):
+        """
+        ObjectTree is a view of the objects in a bucket backed by a :class: 'object_model.ObjectListModel'.
+        The model lists the bucket a page at a time as the view is scrolled, so the view has functionality to perform
+        drag and drop uploads without ever holding the full listing
+
+        :param listing_service: The service that runs listing calls off the GUI thread
+        :type listing_service: :class: 'listing_service.ListingService'
+        :param listing_cache: Optional cache of object listings to show while the bucket is listed again
+        :type listing_cache: :class: 'listing_cache.ListingCache'
+        """
+        super(ObjectTree, self).__init__()
+
+        self.setModel(ObjectListModel(listing_service, listing_cache))
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.object_context_menu)
-        self.setAcceptDrops(True)
         self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setUniformRowHeights(True)
+        self.setRootIsDecorated(False)
+        self.setAcceptDrops(True)
+        self.oci_manager = None
+        self.bulk_threads = set()
+        self.model().fetch_gate = self.last_row_visible
+        self.verticalScrollBar().valueChanged.connect(self.fetch_visible)
+        self.expanded.connect(self.fetch_visible)
+
+    @property
+    def bucket_name(self):
+        return self.model().bucket_name
+
+    @property
+    def accept_drop(self):
+        return bool(self.model().bucket_name)
+
+    def set_bucket(self, oci_manager, bucket_name):
+        """
+        :param oci_manager: The OCI manager used by the main application
+        :type: oci_manager :class: 'oci_manager.oci_manager'
+        :param bucket_name: The name of the bucket to list, or None to clear the view
+        :type bucket_name: string
+        """
+        self.oci_manager = oci_manager
+        self.model().set_bucket(oci_manager, bucket_name)
+        self.resizeColumnToContents(0)
+
+    def last_row_visible(self, node):
+        """
+        :return: True if the last loaded row of a folder is inside the viewport
+        :rtype: boolean
+        """
+        model = self.model()
+        index = model.index(len(node.children) - 1, 0, model.node_index(node))
+        rect = self.visualRect(index)
+        return rect.isValid() and self.viewport().rect().intersects(rect)
+
+    def fetch_visible(self, *args):
+        """
+        Slot to list the next page of every folder whose last loaded row has been scrolled into view.
+        QAbstractItemView only asks the model for more rows of the root, so expanded folders are checked here
+        """
+        model = self.model()
+        index = self.indexAt(self.viewport().rect().bottomLeft())
+        while index.isValid():
+            parent = index.parent()
+            if model.canFetchMore(parent):
+                model.fetchMore(parent)
+            index = parent
+
+    def set_folder_mode(self, enabled):
+        """
+        Slot to switch the view between a flat listing of object names and browsing the bucket by pseudo-folder
+
+        :param enabled: True to browse the bucket by pseudo-folder
+        :type enabled: boolean
+        """
+        self.setRootIsDecorated(enabled)
+        self.model().set_folder_mode(enabled)
+
+    def selected_folders(self):
+        """
+        :return: The rows of the selected folders
+        :rtype: list
+        """
+        model = self.model()
+        rows = [model.object_row(index) for index in self.selectionModel().selectedRows()]
+        return [row for row in rows if row and row.is_folder()]
+
+    def selected_objects(self):
+        """
+        :return: The rows of the selected objects. Selected folders are left out
+        :rtype: list
+        """
+        model = self.model()
+        rows = [model.object_row(index) for index in self.selectionModel().selectedRows()]
+        return [row for row in rows if row and not row.is_folder()]
 
     def dragEnterEvent(self, e):
         if e.mimeData().hasUrls():
@@ -54,43 +150,126 @@ class Tree(QTreeWidget):
         """
         Context menu when the object tree is right clicked
         """
-        selected_items = self.selectedItems()
-        if self.accept_drop and selected_items:
+        selected_items = self.selected_objects()
+        selected_folders = self.selected_folders()
+        copy_source = self.parentWidget().copy_source
+        if self.accept_drop and (selected_items or selected_folders or copy_source):
             menu = QMenu(self)
-            # copy_action = menu.addAction("Copy")
+            copy_action = menu.addAction("Copy")
+            copy_action.setEnabled(bool(selected_items or selected_folders))
+            copy_action.triggered.connect(self.copy_objects)
+            paste_action = menu.addAction("Paste")
+            paste_action.setEnabled(copy_source is not None and len(selected_folders) <= 1 and not selected_items)
+            paste_action.triggered.connect(self.paste_objects)
+            copy_region_action = menu.addAction("Copy to Region...")
+            copy_region_action.setEnabled(bool(selected_items or selected_folders))
+            copy_region_action.triggered.connect(self.copy_to_region)
             download_action = menu.addAction("Download")
             rename_action = menu.addAction("Rename")
-            if len(selected_items) > 1:
+            if len(selected_items) != 1 or selected_folders:
                 rename_action.setEnabled(False)
             rename_action.triggered.connect(self.rename_object)
+            bulk_rename_action = menu.addAction("Rename / Move...")
+            bulk_rename_action.setEnabled(len(selected_items) > 1 or bool(selected_folders))
+            bulk_rename_action.triggered.connect(self.bulk_rename_objects)
             delete_action = menu.addAction("Delete")
+            if not selected_items:
+                download_action.setEnabled(False)
+                delete_action.setEnabled(False)
             delete_action.triggered.connect(self.delete_objects)
             download_action.triggered.connect(self.download_objects)
             menu.exec_(QCursor.pos())
     
     def download_objects(self):
-        objects = [item.text(0) for item in self.selectedItems()]
-        filesizes = [(int(item.text(2)), item.text(1).split(" ")) for item in self.selectedItems() if item.text(2)]
+        rows = self.selected_objects()
+        objects = [row.name for row in rows]
+        filesizes = [(row.size, readable_size(row.size)) for row in rows]
         self.parentWidget().download_files(objects, filesizes, self.bucket_name)
 
     
     def delete_objects(self):
-        items = self.selectedItems()
-        # item_names = [item.text(0) for item in items]
+        items = self.selected_objects()
         delete_confirm = QMessageBox()
-        delete_confirm.setText("Are you sure you want to delete " + (items[0].text(0) if len(items) == 1 else (str(len(items))) + " items")  + "?")
+        delete_confirm.setText("Are you sure you want to delete " + (items[0].name if len(items) == 1 else (str(len(items))) + " items")  + "?")
         delete_confirm.setStandardButtons(QMessageBox.Cancel | QMessageBox.Ok)
         delete_confirm.setDefaultButton(QMessageBox.Cancel)
         delete_confirm.layout().setSizeConstraint(QLayout.SetMinimumSize)
         ret = delete_confirm.exec_()
         if ret == QMessageBox.Ok:
-            for item in items:
-                self.oci_manager.delete_object(self.bucket_name, item.text(0))
-                self.takeTopLevelItem(self.indexOfTopLevelItem(item))
-    
+            bucket_name = self.bucket_name
+            self.run_bulk("Deleting", "Deleted", [item.name for item in items], lambda name: self.oci_manager.delete_object(bucket_name, name),
+                self.model().remove_objects)
+
+    def run_bulk(self, action, past_action, items, function, on_batch, describe=str, on_finished=None):
+        """
+        Runs a request for each of many objects on a :class: 'bulk_thread.BulkThread' while a progress dialog that can cancel it is shown.
+        Failures are reported once every object has been tried
+
+        :param action: Names the operation in the progress dialog, e.g. "Deleting"
+        :type action: string
+        :param past_action: Names the operation in the report, e.g. "Deleted"
+        :type past_action: string
+        :param items: The object names or other items to process. A generator is consumed on the worker thread and
+            the progress dialog then only counts the objects done
+        :type items: list or generator
+        :param function: Called on a worker thread with a single item
+        :type function: function
+        :param on_batch: Slot called with a list of the items that succeeded since the last call
+        :type on_batch: function
+        :param describe: Gives the text an item is reported with
+        :type describe: function
+        :param on_finished: Optional slot called once the operation has finished
+        :type on_finished: function
+        """
+        total = len(items) if isinstance(items, list) else None
+        progress = QProgressDialog("{} {} objects...".format(action, total) if total is not None else "{} objects...".format(action),
+            "Cancel", 0, total or 0, self)
+        progress.setWindowTitle(action)
+        progress.setMinimumDuration(500)
+        done = [0]
+        def batch_done(batch):
+            done[0] += len(batch)
+            if total:
+                progress.setValue(done[0])
+            else:
+                progress.setLabelText("{} {} objects...".format(past_action, done[0]))
+        thread = BulkThread(items, function, self.parentWidget().settings.get_int('bulk_concurrency'))
+        thread.batch_done.connect(on_batch)
+        thread.batch_done.connect(batch_done)
+        thread.bulk_finished.connect(lambda report: self.bulk_finished(thread, progress, past_action, total, report, describe, on_finished))
+        progress.canceled.connect(thread.stop)
+        self.bulk_threads.add(thread)
+        thread.start()
+
+    def bulk_finished(self, thread, progress, past_action, total, report, describe=str, on_finished=None):
+        """
+        Slot for a finished bulk operation. Closes its progress dialog and reports the objects that failed
+
+        :type report: :class: 'bulk.BulkReport'
+        """
+        self.bulk_threads.discard(thread)
+        progress.reset()
+        progress.deleteLater()
+        if on_finished:
+            on_finished()
+        if total is None:
+            total = report.done + len(report.failed)
+        print("{} {} of {} objects".format(past_action, report.done, total))
+        if not report.failed and not report.cancelled:
+            return
+        text = "{} {} of {} objects.".format(past_action, report.done, total)
+        if report.cancelled:
+            text += " The operation was cancelled."
+        if report.failed:
+            text += " {} failed:\n\n".format(len(report.failed)) + "\n".join("{}: {}".format(describe(item), getattr(error, 'message', None) or error)
+                for item, error in report.failed[:MAX_REPORTED_FAILURES])
+            if len(report.failed) > MAX_REPORTED_FAILURES:
+                text += "\n... and {} more, see the log".format(len(report.failed) - MAX_REPORTED_FAILURES)
+        QMessageBox.warning(self, past_action, text)
+
     def rename_object(self):
-        item = self.selectedItems()[0]
-        rename_window = RenameWindow(item.text(0))
+        item = self.selected_objects()[0]
+        rename_window = RenameWindow(item.name)
         rename_window.new_name.connect(self.rename_object_handler)
         ret = rename_window.exec_()
             
@@ -98,13 +277,114 @@ class Tree(QTreeWidget):
         response = self.oci_manager.rename_object(self.bucket_name, source_name, new_name)
         if response.status == 200:
             print("Object {} renamed to {}".format(source_name, new_name))
-            item = self.selectedItems()[0]
-            item.setText(0, new_name)
+            self.model().rename_object(source_name, new_name)
+
+    def bulk_rename_objects(self):
+        """
+        Renames the selected objects, and every object under the selected folders, with a pattern from :class: 'rename.BulkRenameWindow'
+        """
+        names = [row.name for row in self.selected_objects()]
+        prefixes = [row.name for row in self.selected_folders()]
+        rename_window = BulkRenameWindow(prefixes + names, prefixes[0] if len(prefixes) == 1 else '')
+        rename_window.pattern.connect(lambda mode, find, replace: self.bulk_rename_handler(names, prefixes, renamer(find, replace, mode)))
+        rename_window.exec_()
+
+    def bulk_rename_handler(self, names, prefixes, rename):
+        """
+        :param names: The names of the selected objects
+        :type names: list
+        :param prefixes: The selected folders. Every object under them is renamed
+        :type prefixes: list
+        :param rename: Gives the new name of an object, see bulk.renamer
+        :type rename: function
+        """
+        bucket_name = self.bucket_name
+        oci_manager = self.oci_manager
 
+        def renames():
+            # The folders are listed in full before the first rename, so objects moved under a selected folder are not renamed twice
+            listed = dict.fromkeys(names)
+            for prefix in prefixes:
+                listed.update(dict.fromkeys(obj.name for obj in oci_manager.iter_objects(bucket_name, prefix, fields='name')))
+            yield from plan_renames(listed, rename)
+
+        items = list(plan_renames(names, rename)) if not prefixes else renames()
+        self.run_bulk("Renaming", "Renamed", items, lambda names: oci_manager.rename_object(bucket_name, names[0], names[1], overwrite=False),
+            self.model().rename_objects, lambda names: "{} \u2192 {}".format(*names), self.model().refresh if prefixes else None)
+
+
+    def selected_copy_source(self):
+        """
+        :return: The selected objects and folders, each with the part of its name that is replaced when it is pasted
+        :rtype: :class: 'server_copy.CopySource'
+        """
+        folder_mode = self.model().delimiter is not None
+        items = []
+        for row in self.selected_folders() + self.selected_objects():
+            base = row.name[:row.name.rstrip('/').rfind('/') + 1] if folder_mode else ''
+            items.append(CopyItem(row.name, None if row.is_folder() else row.size, base))
+        return CopySource(self.oci_manager, self.bucket_name, items)
+
+    def copy_objects(self):
+        """
+        Remembers the selected objects and folders so they can be pasted into any bucket the application shows
+        """
+        source = self.selected_copy_source()
+        self.parentWidget().copy_source = source
+
+    def paste_objects(self):
+        """
+        Copies the remembered objects and folders into the selected folder, or the top of the bucket, on the service side
+        """
+        folders = self.selected_folders()
+        prefix = folders[0].name if folders else ''
+        destination = CopyDestination(self.oci_manager.get_region(), self.oci_manager.get_namespace(), self.bucket_name, prefix)
+        self.parentWidget().copy_objects(self.parentWidget().copy_source, destination)
+
+    def copy_to_region(self):
+        """
+        Copies the selected objects and folders to a bucket in another region of the tenancy, keeping their names. The regions
+        the tenancy is subscribed to are listed off the GUI thread, and the region is typed in if they cannot be listed
+        """
+        source = self.selected_copy_source()
+        oci_manager = self.oci_manager
+        self.model().listing_service.request('regions', lambda is_cancelled: oci_manager.list_regions(),
+            lambda regions: self.copy_to_region_prompt(source, oci_manager, regions),
+            lambda error: self.regions_failed(source, oci_manager, error))
+
+    def regions_failed(self, source, oci_manager, error):
+        logger.warning("Listing the regions failed", exc_info=error)
+        self.copy_to_region_prompt(source, oci_manager, None)
+
+    def copy_to_region_prompt(self, source, oci_manager, regions):
+        """
+        Asks for the destination region and bucket of copy_to_region, then starts the copies
+
+        :param source: The objects and folders to copy
+        :type source: :class: 'server_copy.CopySource'
+        :param oci_manager: The OCI manager the objects were selected with
+        :type oci_manager: :class: 'oci_manager.oci_manager'
+        :param regions: The regions to choose from, or None to type the region in
+        :type regions: list
+        """
+        current = oci_manager.get_region()
+        if regions:
+            region, ok = QInputDialog.getItem(self, "Copy to Region", "Destination region:", regions,
+                regions.index(current) if current in regions else 0, False)
+        else:
+            region, ok = QInputDialog.getText(self, "Copy to Region", "Destination region:", QLineEdit.Normal, current)
+        if not ok or not region:
+            return
+        bucket_name, ok = QInputDialog.getText(self, "Copy to Region", "Destination bucket:", QLineEdit.Normal, source.bucket_name)
+        if not ok or not bucket_name:
+            return
+        source = source._replace(items=[item._replace(base='') for item in source.items])
+        destination = CopyDestination(region.strip(), oci_manager.get_namespace(), bucket_name, '')
+        self.parentWidget().copy_objects(source, destination)
 
     def dropEvent(self, e):
         """
-        If the event has urls (such as dropped files), and the class is given an OCI manager and and bucket name, upload the files to the bucket
+        If the event has urls (such as dropped files), and the view is listing a bucket, upload the files to the bucket
 
         TODO: Use signals/slots
         """
@@ -115,16 +395,8 @@ class Tree(QTreeWidget):
             for url in e.mimeData().urls():
                 file = url.toLocalFile()
 
-                if os.path.isfile(file):
+                if os.path.isfile(file) or os.path.isdir(file):
                     files.append(file)
-                    
-                elif os.path.isdir(file):
-                    root_dir = True
-                    for dir, _, filenames in os.walk(file):
-                        for filename in filenames:
-                            subfile = "{}/{}".format(dir, filename) if not root_dir else "{}{}".format(dir, filename)
-                            files.append(subfile)
-                        root_dir = False
 
             self.parentWidget().upload_files((files, "All files"), self.bucket_name)
     
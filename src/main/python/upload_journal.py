@@ -0,0 +1,95 @@
+from collections import namedtuple
+import sqlite3
+import threading
+import os
+
+DEFAULT_LOCATION = os.path.expanduser(os.path.join('~', '.oci', 'object_storage_uploads.db'))
+
+PendingUpload = namedtuple('PendingUpload', ['upload_id', 'profile', 'namespace', 'bucket', 'object_name', 'file_path',
+    'file_size', 'mtime_ns', 'part_size', 'content_type'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_id TEXT PRIMARY KEY, profile TEXT, namespace TEXT, bucket TEXT, object_name TEXT, file_path TEXT,
+    file_size INTEGER, mtime_ns INTEGER, part_size INTEGER, content_type TEXT);
+CREATE TABLE IF NOT EXISTS parts (
+    upload_id TEXT, part_num INTEGER, etag TEXT, md5 TEXT,
+    PRIMARY KEY (upload_id, part_num));
+"""
+
+class UploadJournal():
+    def __init__(self, location=DEFAULT_LOCATION):
+        """
+        UploadJournal records every multipart upload in progress in a local SQLite database, together with the identity of the
+        file being sent and each part Object Storage has acknowledged. Entries are written as parts complete and removed when
+        the upload is committed or aborted, so whatever is left after the application exits are uploads that can be resumed
+
+        :param location: The path of the SQLite database
+        :type location: string
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(location, check_same_thread=False)
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+
+    def start_upload(self, upload):
+        """
+        :param upload: The multipart upload that was created
+        :type upload: :class: 'PendingUpload'
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tuple(upload))
+
+    def record_part(self, upload_id, part_num, etag, md5):
+        """
+        Records a part Object Storage has acknowledged
+
+        :param upload_id: The id of the multipart upload
+        :type upload_id: string
+        :param part_num: The number of the part, starting from 1
+        :type part_num: int
+        :param etag: The entity tag returned for the part
+        :type etag: string
+        :param md5: The MD5 returned for the part
+        :type md5: string
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO parts VALUES (?, ?, ?, ?)", (upload_id, part_num, etag, md5))
+
+    def get_parts(self, upload_id):
+        """
+        :return: The etag and MD5 of each recorded part, keyed by part number
+        :rtype: dict
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT part_num, etag, md5 FROM parts WHERE upload_id = ?", (upload_id,)).fetchall()
+        return {part_num: (etag, md5) for part_num, etag, md5 in rows}
+
+    def finish_upload(self, upload_id):
+        """
+        Forgets an upload that was committed or aborted
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM parts WHERE upload_id = ?", (upload_id,))
+            self.connection.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+
+    def pending_uploads(self, profile):
+        """
+        :return: The uploads of a profile that were neither committed nor aborted
+        :rtype: list
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT * FROM uploads WHERE profile = ? ORDER BY object_name", (profile,)).fetchall()
+        return [PendingUpload(*row) for row in rows]
+
+
+def file_unchanged(upload):
+    """
+    :return: True if the file of a pending upload still has the size and modification time it had when the upload started
+    :rtype: boolean
+    """
+    try:
+        stat = os.stat(upload.file_path)
+    except OSError:
+        return False
+    return stat.st_size == upload.file_size and stat.st_mtime_ns == upload.mtime_ns
@@ -0,0 +1,400 @@
+import io
+import os
+import threading
+import logging
+import time
+import oci
+from oci.object_storage.transfer.internal.buffered_part_reader import BufferedPartReader
+from upload_journal import PendingUpload
+from transfers import PART_SIZE_METADATA
+from oci_manager import choose_part_size, choose_parallel_process_count, DEFAULT_PARALLEL_PROCESS_COUNT, MAX_PARTS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
+f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+f_handler.setFormatter(f_format)
+logger.addHandler(f_handler)
+
+class ThrottledPartReader(BufferedPartReader):
+    def __init__(self, file_object, start, size, rate_limiter):
+        """
+        BufferedPartReader that passes every read through a rate limiter, so the request body is sent no faster than the limiter allows
+
+        :param rate_limiter: The limiter to pass reads through
+        :type rate_limiter: :class: 'transfers.RateLimiter'
+        """
+        super().__init__(file_object, start, size)
+        self.rate_limiter = rate_limiter
+
+    def read(self, n=-1):
+        data = super().read(n)
+        self.rate_limiter.consume(len(data))
+        return data
+
+
+class JournaledMultipartObjectAssembler(oci.object_storage.MultipartObjectAssembler):
+    def __init__(self, object_storage_client, namespace_name, bucket_name, object_name, journal=None, rate_limiter=None, **kwargs):
+        """
+        MultipartObjectAssembler that records each part in an upload journal as soon as Object Storage acknowledges it
+
+        :param journal: The journal to record parts in
+        :type journal: :class: 'upload_journal.UploadJournal'
+        :param rate_limiter: Optional limiter the body of every part is read through
+        :type rate_limiter: :class: 'transfers.RateLimiter'
+        """
+        super().__init__(object_storage_client, namespace_name, bucket_name, object_name, **kwargs)
+        self.journal = journal
+        self.rate_limiter = rate_limiter
+
+    def restore_parts(self, upload_id):
+        """
+        Marks the parts recorded in the journal for an upload as uploaded, so they are not sent again
+        """
+        for part_num, (etag, md5) in self.journal.get_parts(upload_id).items():
+            if 0 < part_num <= len(self.manifest["parts"]):
+                self.manifest["parts"][part_num - 1]["etag"] = etag
+                self.manifest["parts"][part_num - 1]["opc_md5"] = md5
+
+    def _upload_part(self, part_num, part, **kwargs):
+        uploaded = "opc_md5" in part
+        super()._upload_part(part_num, part, **kwargs)
+        if self.journal and not uploaded and "etag" in part:
+            self.journal.record_part(self.manifest["uploadId"], part_num, part["etag"], part["opc_md5"])
+
+    def _upload_part_call(self, object_storage_client, **kwargs):
+        if not self.rate_limiter:
+            return super()._upload_part_call(object_storage_client, **kwargs)
+        with io.open(kwargs["part_file_path"], mode='rb') as file_object:
+            reader = ThrottledPartReader(file_object, kwargs["offset"], kwargs["size"], self.rate_limiter)
+            return object_storage_client.upload_part(kwargs["namespace"], kwargs["bucket_name"], kwargs["object_name"],
+                kwargs["upload_id"], kwargs["part_num"], reader, **kwargs['new_kwargs'])
+
+
+class UploadManager(oci.object_storage.UploadManager):
+    def __init__(self, object_storage_client, concurrency=1, part_size=None, parallel_process_count=None, journal=None, profile=None,
+            rate_limiter=None):
+        """
+        UploadManager can upload several files at once through the same object storage client. The client's connection pool is
+        grown to fit every part that may be in flight, so concurrent uploads reuse connections instead of opening new ones.
+
+        The part size and the number of parts in flight are picked per file unless they are given. The rate each part was
+        uploaded at is tracked across uploads, and later files are split into parts that suit it
+
+        :param object_storage_client: The client shared by every upload
+        :type object_storage_client: :class: 'oci.object_storage.ObjectStorageClient'
+        :param concurrency: The number of files that may be uploaded at once
+        :type concurrency: int
+        :param part_size: A fixed multipart part size in bytes
+        :type part_size: int
+        :param parallel_process_count: A fixed number of parts of a file to upload at once
+        :type parallel_process_count: int
+        :param journal: Optional journal that multipart uploads are recorded in until they are committed or aborted
+        :type journal: :class: 'upload_journal.UploadJournal'
+        :param profile: The profile the uploads are made with, recorded in the journal
+        :type profile: string
+        :param rate_limiter: Optional limiter the bytes of every upload, single part or multipart, are passed through
+        :type rate_limiter: :class: 'transfers.RateLimiter'
+        """
+        super().__init__(object_storage_client)
+        self.journal = journal
+        self.rate_limiter = rate_limiter
+        self.profile = profile
+        self.ma = None
+        self.assemblers = {}
+        self.lock = threading.Lock()
+        self.concurrency = concurrency
+        self.part_size = part_size
+        self.parallel_process_count = parallel_process_count
+        self.throughput = None
+        parts_in_flight = concurrency * parallel_process_count if parallel_process_count else max(concurrency, MAX_PARTS_IN_FLIGHT)
+        if parts_in_flight > 1:
+            UploadManager._add_adapter_to_service_client(object_storage_client, True, parts_in_flight)
+
+    def tune(self, file_size, part_size=None):
+        """
+        Picks the part size and parallelism for a file and logs the choice
+
+        :param file_size: The size of the file in bytes
+        :type file_size: int
+        :param part_size: The part size a resumed upload was started with, so only the parallelism is picked
+        :type part_size: int
+
+        :return: The part size in bytes and the number of parts to upload at once
+        :rtype: tuple
+        """
+        fixed = part_size or self.part_size
+        part_size = fixed or choose_part_size(file_size, self.throughput)
+        parallel_process_count = self.parallel_process_count or choose_parallel_process_count(file_size, part_size, self.concurrency)
+        if UploadManager._use_multipart(file_size, part_size=part_size):
+            logger.info("{} byte file: {} parts of {} bytes ({}), {} in flight ({}), part throughput estimate {}".format(file_size,
+                -(-file_size // part_size), part_size, 'fixed' if fixed else 'auto', parallel_process_count,
+                'fixed' if self.parallel_process_count else 'auto', "{:.0f} B/s".format(self.throughput) if self.throughput else 'none'))
+        return part_size, parallel_process_count
+
+    def observe(self, file_size, parallel_process_count, elapsed):
+        """
+        Updates the throughput estimate with a finished multipart upload
+
+        :param file_size: The size of the file in bytes
+        :type file_size: int
+        :param parallel_process_count: The number of parts that were uploaded at once
+        :type parallel_process_count: int
+        :param elapsed: The time the parts took to upload in seconds
+        :type elapsed: float
+        """
+        if elapsed <= 0:
+            return
+        throughput = file_size / elapsed / parallel_process_count
+        with self.lock:
+            self.throughput = throughput if self.throughput is None else (self.throughput + throughput) / 2
+        logger.info("Uploaded {} bytes in {:.1f} s, {:.0f} B/s per part, estimate now {:.0f} B/s".format(file_size, elapsed, throughput, self.throughput))
+
+    def assembler(self, upload_id):
+        """
+        :return: The assembler of a multipart upload in progress, or of the last upload started when no upload id is given
+        :rtype: :class: 'JournaledMultipartObjectAssembler'
+        """
+        with self.lock:
+            return self.assemblers.get(upload_id) if upload_id else self.ma
+
+    def commit(self, upload_id=None):
+        ma = self.assembler(upload_id)
+        if ma:
+            return ma.commit()
+
+    def abort(self, upload_id):
+        with self.lock:
+            ma = self.assemblers.pop(upload_id, None) if upload_id else self.ma
+        if ma:
+            ma.abort()
+            if self.journal:
+                self.journal.finish_upload(ma.manifest['uploadId'])
+
+    def resume(self, upload_id=None):
+        ma = self.assembler(upload_id)
+        if ma:
+            ma.resume(upload_id=ma.manifest['uploadId'])
+    
+    def upload_file(self,
+                    namespace_name,
+                    bucket_name,
+                    object_name,
+                    file_path,
+                    **kwargs):
+        """
+        Uploads an object to Object Storage. Depending on the options provided and the
+        size of the object, the object may be uploaded in multiple parts.
+
+        :param str namespace_name:
+            The namespace containing the bucket in which to store the object.
+
+        :param str bucket_name:
+            The name of the bucket in which to store the object.
+
+        :param str object_name:
+            The name of the object in Object Storage.
+
+        :param file_path:
+            The path to the file to upload.
+
+        :param int part_size (optional):
+            Override the part size picked by tune(), value is in bytes.
+
+        :param int parallel_process_count (optional):
+            Override the number of parts uploaded at once picked by tune().
+
+        :param function progress_callback (optional):
+            Callback function to receive the number of bytes uploaded since
+            the last call to the callback function.
+
+        :param str if_match (optional):
+            The entity tag of the object to match.
+
+        :param str if_none_match (optional):
+            The entity tag of the object to avoid matching. The only valid value is ‘*’,
+            which indicates that the request should fail if the object already exists.
+
+        :param str content_md5: (optional)
+            The base-64 encoded MD5 hash of the body. This parameter is only used if the object is uploaded in a single part.
+
+        :param str content_type (optional):
+            The content type of the object to upload.
+
+        :param str content_language (optional):
+            The content language of the object to upload.
+
+        :param str content_encoding (optional):
+            The content encoding of the object to upload.
+
+        :param dict metadata (optional):
+            A dictionary of string to string values to associate with the object to upload
+
+        :param dict mixin (optional):
+            QT mixin for signal/slots
+
+        :return:
+            The response from multipart commit operation or the put operation.  In both cases this will be a :class:`~oci.response.Response` object with data of type None.
+            For a multipart upload the :class:`~oci.response.Response` will contain the :code:`opc-multipart-md5` header and for a non-multipart upload
+            it will contain the :code:`opc-content-md5 header`.
+        :rtype: :class:`~oci.response.Response`
+        """
+        part_size = None
+        if 'part_size' in kwargs:
+            part_size = kwargs['part_size']
+            kwargs.pop('part_size')
+
+        parallel_process_count = None
+        if 'parallel_process_count' in kwargs:
+            parallel_process_count = kwargs['parallel_process_count']
+            kwargs.pop('parallel_process_count')
+
+        mixin = None
+        if 'mixin' in kwargs:
+            mixin = kwargs['mixin']
+            kwargs.pop('mixin')
+
+        with open(file_path, 'rb') as file_object:
+            file_size = os.fstat(file_object.fileno()).st_size
+            if part_size is None:
+                part_size, tuned_count = self.tune(file_size)
+                parallel_process_count = parallel_process_count or tuned_count
+            if not self.allow_multipart_uploads or not UploadManager._use_multipart(file_size, part_size=part_size):
+                if self.rate_limiter:
+                    kwargs['progress_callback'] = self.throttled_callback(kwargs.get('progress_callback'))
+                return self._upload_singlepart(namespace_name, bucket_name, object_name, file_path, **kwargs)
+            else:
+                if 'content_md5' in kwargs:
+                    kwargs.pop('content_md5')
+
+                kwargs['part_size'] = part_size
+                kwargs['allow_parallel_uploads'] = self.allow_parallel_uploads
+                # The part size lets a download rebuild the multipart MD5 of the object, see transfers.expected_md5
+                kwargs['metadata'] = dict(kwargs.get('metadata') or {}, **{PART_SIZE_METADATA: str(part_size)})
+                parallel_process_count = parallel_process_count or self.parallel_process_count or DEFAULT_PARALLEL_PROCESS_COUNT
+                kwargs['parallel_process_count'] = parallel_process_count
+
+                ma = JournaledMultipartObjectAssembler(self.object_storage_client,
+                                              namespace_name,
+                                              bucket_name,
+                                              object_name,
+                                              journal=self.journal,
+                                              rate_limiter=self.rate_limiter,
+                                              **kwargs)
+
+                self.ma = ma
+
+                upload_kwargs = {}
+                if 'progress_callback' in kwargs:
+                    upload_kwargs['progress_callback'] = kwargs['progress_callback']
+
+                ma.new_upload()
+                with self.lock:
+                    self.assemblers[ma.manifest['uploadId']] = ma
+                if self.journal:
+                    stat = os.fstat(file_object.fileno())
+                    self.journal.start_upload(PendingUpload(ma.manifest['uploadId'], self.profile, namespace_name, bucket_name, object_name,
+                        os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, part_size, kwargs.get('content_type')))
+
+                if mixin:
+                    mixin.signal_upload_id(ma.manifest['uploadId'])
+
+                ma.add_parts_from_file(file_path)
+
+                # try:
+                #     ma.upload(**upload_kwargs)
+                #     response = ma.commit()
+                # except:
+                #     print("Connection failure. Retry with Upload ID {}".format(ma.manifest['uploadId']))
+                # else:
+                #     return response
+
+                start = time.time()
+                ma.upload(**upload_kwargs)
+                self.observe(file_size, parallel_process_count, time.time() - start)
+                response = ma.commit()
+                self.finish(ma)
+                return response
+
+    def resume_upload_file(self,
+                           namespace_name,
+                           bucket_name,
+                           object_name,
+                           file_path,
+                           upload_id,
+                           **kwargs):
+        """
+        Resumes a multipart upload. Parts recorded in the journal are not sent again, and the parts Object Storage already
+        holds are listed so that only the missing parts are uploaded before the upload is committed.
+
+        :param str upload_id:
+            The upload id for the multipart upload to resume.
+
+        :param int part_size:
+            Part size, in bytes, the upload was started with.
+
+        :param int parallel_process_count (optional):
+            Override the number of parts uploaded at once picked by tune().
+
+        :param function progress_callback (optional):
+            Callback function to receive the number of bytes uploaded since
+            the last call to the callback function.
+
+        :return:
+            The response from the multipart commit operation.
+        :rtype: :class:`~oci.response.Response`
+        """
+        resume_kwargs = {}
+        if 'progress_callback' in kwargs:
+            resume_kwargs['progress_callback'] = kwargs['progress_callback']
+            kwargs.pop('progress_callback')
+
+        parallel_process_count = kwargs.pop('parallel_process_count', None)
+        part_size, tuned_count = self.tune(os.path.getsize(file_path), kwargs.get('part_size'))
+        kwargs['part_size'] = part_size
+        kwargs['allow_parallel_uploads'] = self.allow_parallel_uploads
+        kwargs['parallel_process_count'] = parallel_process_count or tuned_count
+
+        ma = JournaledMultipartObjectAssembler(self.object_storage_client,
+                                      namespace_name,
+                                      bucket_name,
+                                      object_name,
+                                      journal=self.journal,
+                                      rate_limiter=self.rate_limiter,
+                                      **kwargs)
+        ma.add_parts_from_file(file_path)
+        ma.manifest['uploadId'] = upload_id
+        if self.journal:
+            ma.restore_parts(upload_id)
+        with self.lock:
+            self.assemblers[upload_id] = ma
+        ma.resume(upload_id=upload_id, **resume_kwargs)
+        response = ma.commit()
+        self.finish(ma)
+        return response
+
+    def throttled_callback(self, progress_callback):
+        """
+        A single part upload reads the file through its progress callback, so throttling the callback throttles the upload
+
+        :return: A progress callback that passes the bytes read through the rate limiter before reporting them
+        :rtype: function
+        """
+        def callback(bytes_read):
+            self.rate_limiter.consume(bytes_read)
+            if progress_callback:
+                progress_callback(bytes_read)
+        return callback
+
+    def finish(self, ma):
+        """
+        Forgets a committed multipart upload
+        """
+        with self.lock:
+            self.assemblers.pop(ma.manifest['uploadId'], None)
+        if self.journal:
+            self.journal.finish_upload(ma.manifest['uploadId'])
+    
+
+
+    
\ No newline at end of file
@@ -1,15 +1,19 @@
 from PySide2.QtCore import Qt, Signal, QObject, QTextCodec, QThread
 from PySide2.QtGui import QColor, QCursor
 from PySide2.QtWidgets import QWidget, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QTreeWidget, QTreeWidgetItem, QDialogButtonBox, QDialog, QLineEdit, QAbstractItemView, QMenuBar, QMenu, QAction, QProgressBar
-from oci_manager import oci_manager, UploadId
+from oci_manager import oci_manager
 from config import ConfigWindow
-from progress import ProgressWindow
-from util import get_filesize
+from util import get_filesize, LazyModule
+from transfers import UploadJob, TransferProgress, RateLimiter, JobScanner, iter_upload_jobs, mtime_metadata, run_concurrently, UPLOAD_CONCURRENCY
 from mimetypes import guess_type
+import itertools
+import threading
 import sys
 import os
 import logging
 
+oci = LazyModule('oci')
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 f_handler = logging.FileHandler(os.path.expanduser(os.path.join('~', '.oci', 'object_storage.log')))
@@ -17,16 +21,29 @@ f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message
 f_handler.setFormatter(f_format)
 logger.addHandler(f_handler)
 
+class UploadId(QObject):
+    test = Signal(str)
+    def __init__(self):
+        super().__init__()
+        self.id = None
+    def signal_upload_id(self, upload_id):
+        self.test.emit(upload_id)
+        self.id = upload_id
+
 class UploadThread(QThread):
 
     file_uploaded = Signal(str, str, str, int)
-    bytes_uploaded = Signal(int)
+    bytes_uploaded = Signal(object, object)
     all_files_uploaded = Signal(int)
     upload_failed = Signal()
+    files_found = Signal(object, object)
 
-    def __init__(self, files, bucket_name, oci_manager, filesizes, thread_id):
+    def __init__(self, files, bucket_name, oci_manager, thread_id, concurrency=UPLOAD_CONCURRENCY, part_size=None, parallel_process_count=None,
+            journal=None, jobs=None, rate_limiter=None):
         """
-        UploadThread allows upload jobs to run in a differen;t thread than the application, so the application doesn't stall or freeze
+        UploadThread allows upload jobs to run in a differen;t thread than the application, so the application doesn't stall or freeze.
+        Several files are uploaded at once through one object storage client, so many small files are not held back by the round trip of each request.
+        Files and directories are walked on a background scanner as the uploads run, and the files found so far are emitted with files_found
         
         :param files: A tuple of files. First element is a list of absolute paths to the files. Second element is the mimetype of files
         :type files: tuple
@@ -34,123 +51,164 @@ class UploadThread(QThread):
         :type bucket_name: string
         :param oci_manager: The OCI manager to use for OCI related tasks
         :type: :class: 'oci_manager.oci_manager'
+        :param concurrency: The number of files uploaded at once
+        :type concurrency: int
+        :param part_size: The multipart part size in bytes, or None to pick it for each file
+        :type part_size: int
+        :param parallel_process_count: The number of parts of a file uploaded at once, or None to pick it for each file
+        :type parallel_process_count: int
+        :param journal: Optional journal that keeps multipart uploads resumable after the application exits
+        :type journal: :class: 'upload_journal.UploadJournal'
+        :param jobs: Upload jobs to resume instead of uploading files. files then only describes the jobs
+        :type jobs: list
+        :param rate_limiter: Optional limiter shared by every upload. The job's own rate set with set_rate_limit overrides it
+        :type rate_limiter: :class: 'transfers.RateLimiter'
         """
         super().__init__()
         self.files = files[0].copy()
         self.bucket_name = bucket_name
+        self.manager = oci_manager
         self.os_client = oci_manager.get_os()
         self.namespace = oci_manager.get_namespace()
-        self.upload_manager = oci_manager.get_upload_manager()
-        self.upload_id_manager = UploadId()
-        self.upload_id = None
-        self.upload_id_manager.test.connect(self.log_id)
-        self.filesizes = filesizes.copy()
+        self.concurrency = concurrency
+        self.journal = journal
+        self.rate_limiter = RateLimiter(shared=rate_limiter)
+        self.upload_manager = oci_manager.get_upload_manager(concurrency, part_size, parallel_process_count, journal, self.rate_limiter)
         self.threadactive = True
+        self.paused = False
         self.setTerminationEnabled()
         self.thread_id = thread_id
-        self.current_upload = None
+        self.scanner = JobScanner(self.iter_jobs, self.files_found.emit, lambda: self.failed or not self.threadactive)
+        self.running_jobs = set()
         self.retry_jobs = []
+        self.progress = TransferProgress(self.publish_progress)
+        if jobs:
+            self.files, self.retry_jobs = [], list(jobs)
+        self.failed = False
 
-    def log_id(self, id):
+    def iter_jobs(self):
         """
-        Slot that prints the upload id when a new upload is created
+        Runs on the scanner. Stops at the next file or directory once the upload failed, leaving the rest to the scan that follows the retry
 
-        :param id: Upload ID of upload
-        :type id: string
+        :return: An upload job for every file, walking directories as they are reached
+        :rtype: generator
         """
-        print("Upload ID: {}".format(id))
-        self.upload_id = id
-    
-    def retry(self):
-        self.upload_manager.resume_upload_file(self.namespace, self.bucket_name, self.current_upload["object_name"],\
-                self.current_upload["file_path"], self.upload_id, progress_callback=self.progress_callback, mixin=self.upload_id_manager)
-        self.file_uploaded.emit(self.current_upload["object_name"], self.current_upload["filesize"], self.bucket_name, self.current_upload["filesize_bits"])
-    
+        while self.files and not self.failed:
+            filename = self.files.pop()
+
+            if os.path.isfile(filename):
+                filesize_bits, filesize = get_filesize(filename)
+                yield UploadJob(filename.split('/')[-1], filename, " ".join(filesize), filesize_bits)
+            elif os.path.isdir(filename):
+                yield from iter_upload_jobs(filename)
+
     def connection_failed(self):
         print("Connection failed")
         self.upload_failed.emit()
-        self.retry_jobs.append(self.current_upload)
     
-    def progress_callback(self, bits):
+    def publish_progress(self, total, files):
         """
-        Callback function for the uploading
+        Called by the job's TransferProgress at most PROGRESS_INTERVAL seconds apart
 
-        :param bits: The amount of bits uploaded
-        :type bits: int
+        :param total: The bytes uploaded for the whole job
+        :type total: int
+        :param files: The bytes uploaded for each file in progress
+        :type files: dict
         """
-        self.bytes_uploaded.emit(bits)
+        self.bytes_uploaded.emit(total, files)
         
     def __del__(self):
         self.wait()
 
+    def set_rate_limit(self, rate):
+        """
+        :param rate: The rate in bytes per second for this job, or 0 to use the shared limit
+        :type rate: int
+        """
+        self.rate_limiter.set_rate(rate)
+
+    def pause(self):
+        """
+        Lets the files in flight finish without starting new ones. Starting the thread again continues with the remaining files
+        """
+        self.paused = True
+
     def stop(self):
+        """
+        Stops the thread without waiting for it. The multipart uploads of the files in flight and of the failed files are aborted
+        in the background, which also cuts the uploads in flight short
+        """
         print("Connection stopped")
         self.threadactive = False
-        self.upload_manager.abort(self.upload_id)
-        self.wait()
+        upload_ids = [job.upload_id for job in list(self.running_jobs) + self.retry_jobs if job.upload_id]
+        if upload_ids:
+            threading.Thread(target=self.abort_uploads, args=(upload_ids,), daemon=True).start()
+
+    def abort_uploads(self, upload_ids):
+        for upload_id in upload_ids:
+            try:
+                self.upload_manager.abort(upload_id)
+            except Exception:
+                logger.exception("Aborting upload {} failed".format(upload_id))
     
-    def upload_file(self, file, object_name):
+    def upload_file(self, job):
         """
-        Upload the file and pass in a callback function
+        Upload the file and pass in a callback function. A job that failed part way through a multipart upload resumes that upload
 
-        :param file: The absolute path of the file
-        :type file: string
+        :param job: The file to upload
+        :type job: :class: 'transfers.UploadJob'
         """
-        content_type = guess_type(object_name)[0]
-        if content_type == None:
-            content_type = 'application/octet-stream'
-        print(content_type)
-        response = self.upload_manager.upload_file(self.namespace, self.bucket_name, object_name, file, progress_callback=self.progress_callback, mixin=self.upload_id_manager, part_size=10485760, content_type=content_type)
-        return response
+        self.running_jobs.add(job)
+        self.progress.start(job.object_name)
+        progress_callback = lambda bits: self.progress.add(job.object_name, bits)
+        try:
+            if job.upload_id:
+                print("Retrying file upload")
+                try:
+                    return self.upload_manager.resume_upload_file(self.namespace, self.bucket_name, job.object_name, job.file_path, job.upload_id,
+                        progress_callback=progress_callback, part_size=job.part_size)
+                except oci.exceptions.ServiceError as e:
+                    if e.status != 404:
+                        raise
+                    print("Upload {} no longer exists, starting over".format(job.upload_id))
+                    if self.journal:
+                        self.journal.finish_upload(job.upload_id)
+                    job.upload_id = None
+                    self.progress.start(job.object_name)
+            job.part_size, parallel_process_count = self.upload_manager.tune(job.filesize_bits)
+            content_type = guess_type(job.object_name)[0]
+            if content_type == None:
+                content_type = 'application/octet-stream'
+            return self.upload_manager.upload_file(self.namespace, self.bucket_name, job.object_name, job.file_path,
+                progress_callback=progress_callback, mixin=job, part_size=job.part_size, parallel_process_count=parallel_process_count, content_type=content_type,
+                metadata=mtime_metadata(job.file_path))
+        finally:
+            self.running_jobs.discard(job)
+            self.progress.finish(job.object_name)
     
     def run(self):
         """
-
+        Uploads the files on a pool of concurrency workers. After a failed upload or a pause no new files are started, and the failed files
+        are uploaded first when the thread is started again
         """
+        self.failed = False
+        retry_jobs, self.retry_jobs = iter(self.retry_jobs), []
+        is_cancelled = lambda: self.failed or self.paused or not self.threadactive
+        self.scanner.start()
+        jobs = itertools.chain(retry_jobs, self.scanner.iter_jobs(is_cancelled))
 
-        while self.files or self.current_upload:
-            if self.current_upload:
-                print("Retrying file upload")
-                self.retry()
-                self.current_upload = None
-            else:
-                filename = self.files.pop()
-                filesize_bits = self.filesizes.pop()
-                filesize = " ".join(filesize_bits[1])
-
-                if os.path.isfile(filename) and self.threadactive:
-                    self.current_upload = {"object_name":filename.split('/')[-1], "file_path":filename, "filesize": filesize, "filesize_bits": filesize_bits[0]}
-                    
-                    try:
-                        response = self.upload_file(filename, filename.split('/')[-1])
-                    except Exception as e:
-                        logger.exception("Exception occured")
-                        if self.threadactive:
-                            self.connection_failed()
-                        break
-                    if response:
-                        self.file_uploaded.emit(filename.split('/')[-1], filesize, self.bucket_name, filesize_bits[0])
-                        self.current_upload = None
-                elif os.path.isdir(filename) and self.threadactive:
-                    split_dir = filename.split('/')
-                    dir_length = len(filename) - len(split_dir[-2]) - 1
-                    root_dir = True
-                    for dir, _, filenames in os.walk(filename):
-                        for filename in filenames:
-                            subfile = "{}/{}".format(dir, filename) if not root_dir else "{}{}".format(dir, filename)
-                            print(subfile[dir_length:])
-                            self.current_upload = {"object_name":subfile[dir_length:], "file_path":subfile, "filesize": filesize}
-                            try:
-                                response = self.upload_file(subfile, subfile[dir_length:])
-                            except Exception as e:
-                                logger.exception("Exception occured")
-                                if self.threadactive:
-                                    self.connection_failed()
-                                break
-                            if response:
-                                self.file_uploaded.emit(filename.split('/')[-1], filesize, self.bucket_name, filesize_bits[0])
-                                self.current_upload = None
-                        root_dir = False
-
-        if not self.files and not self.current_upload:
-            self.all_files_uploaded.emit(self.thread_id)
\ No newline at end of file
+        for job, response, error in run_concurrently(jobs, self.upload_file, self.concurrency, is_cancelled):
+            if error:
+                logger.error("Exception occured", exc_info=error)
+                self.retry_jobs.append(job)
+                self.failed = True
+            elif response:
+                self.file_uploaded.emit(job.object_name, job.filesize, self.bucket_name, job.filesize_bits)
+        # The jobs to retry that were not started yet. Files the scanner found are kept by the scanner
+        self.retry_jobs.extend(retry_jobs)
+
+        if self.failed:
+            if self.threadactive:
+                self.connection_failed()
+        elif self.threadactive and not self.paused:
+            self.all_files_uploaded.emit(self.thread_id)
@@ -1,17 +1,82 @@
+import importlib
 import os
+import threading
 
-def get_filesize(file):
+def readable_size(filesize):
+    """
+    :param filesize: A size in bytes
+    :type filesize: int
+
+    :return: The size as a rounded numeric string and an abbreviated unit e.g ['1.5', 'MB']
+    :rtype: list
+    """
     byte_type = ['KB', 'MB', 'GB', 'TB', 'PB']
+    byte_type_pointer = 0
+    byte_size = filesize/1024.0
+    while byte_size > 1024 and byte_type_pointer < len(byte_type) - 1:
+        byte_size = byte_size/1024.0
+        byte_type_pointer += 1
+    byte_size = round(byte_size, 2)
+    return [str(byte_size), byte_type[byte_type_pointer]]
+
+def get_filesize(file):
     try:
         filesize = os.stat(file).st_size
-        byte_type_pointer = 0
-        byte_size = filesize/1024.0
-        while byte_size > 1024:
-            byte_size = byte_size/1024.0
-            byte_type_pointer += 1
-        byte_size = round(byte_size, 2)
-        filesize_readable = [str(byte_size), byte_type[byte_type_pointer]]
-        return (filesize, filesize_readable)
+        return (filesize, readable_size(filesize))
     except FileNotFoundError as e:
         print(e)
-        return (0, ['0', 'KB'])
\ No newline at end of file
+        return (0, ['0', 'KB'])
+
+def scan_files(directory):
+    """
+    Walks a directory with os.scandir, which reads the type of each entry along with the listing, so only files are ever stat'ed.
+    Files are yielded as they are found, in the order of their relative names, so a large tree can be consumed from its first file
+    and merged with an object listing. Only the entries of the directories being walked are held in memory. As with os.walk,
+    unreadable directories are skipped and links to directories are not followed
+
+    :param directory: The directory to walk
+    :type directory: string
+
+    :return: Tuples of the path of each file relative to the directory with '/' separators and its os.DirEntry
+    :rtype: generator
+    """
+    def entries(path):
+        try:
+            # A directory sorts as its name followed by '/', the way the names of the files under it compare. Sorting reads the
+            # listing to its end, which closes it
+            return iter(sorted(os.scandir(path), key=lambda entry: entry.name + '/' if entry.is_dir() else entry.name))
+        except OSError:
+            return iter(())
+
+    stack = [(entries(directory), '')]
+    while stack:
+        listing, relative = stack[-1]
+        entry = next(listing, None)
+        if entry is None:
+            stack.pop()
+        elif entry.is_dir():
+            if not entry.is_symlink():
+                stack.append((entries(entry.path), relative + entry.name + '/'))
+        else:
+            yield relative + entry.name, entry
+
+class LazyModule():
+    def __init__(self, name):
+        """
+        Stands in for a module that is imported the first time one of its attributes is used, so large packages such as the
+        OCI SDK are not loaded before the window is shown. The import is made under a lock, so worker threads that reach the
+        module at the same time wait for a single import
+
+        :param name: The name of the module
+        :type name: string
+        """
+        self.name = name
+        self.module = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            with self.lock:
+                if self.module is None:
+                    self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'main', 'python'))
+
+# The application's modules log to ~/.oci/object_storage.log as they are imported, so give them a home of their own
+os.environ['HOME'] = tempfile.mkdtemp()
+os.makedirs(os.path.join(os.environ['HOME'], '.oci'))
@@ -0,0 +1,23 @@
+from bulk import renamer, plan_renames, REPLACE_PREFIX, FIND_REPLACE
+
+
+def test_prefix_rename():
+    rename = renamer('logs/2019/', 'archive/2019/', REPLACE_PREFIX)
+    assert rename('logs/2019/a.txt') == 'archive/2019/a.txt'
+    assert rename('other/logs/2019/a.txt') is None
+    assert rename('logs/2019/') == 'archive/2019/'
+
+
+def test_find_replace_rename():
+    rename = renamer('.jpeg', '.jpg', FIND_REPLACE)
+    assert rename('a/b.jpeg') == 'a/b.jpg'
+    assert rename('a.jpeg/b.jpeg') == 'a.jpg/b.jpg'
+    assert rename('a/b.png') is None
+    assert renamer('', 'x', FIND_REPLACE)('name') is None
+
+
+def test_plan_renames_skips_unchanged_names():
+    names = ['photos/a.jpeg', 'photos/b.png', 'notes.txt']
+    assert list(plan_renames(names, renamer('photos/', 'pictures/'))) == [('photos/a.jpeg', 'pictures/a.jpeg'),
+        ('photos/b.png', 'pictures/b.png')]
+    assert list(plan_renames(names, renamer('.jpeg', '.jpg', FIND_REPLACE))) == [('photos/a.jpeg', 'photos/a.jpg')]
@@ -0,0 +1,19 @@
+from object_model import ObjectRow, diff_rows
+
+
+def test_diff_rows():
+    shown = [ObjectRow('a', 1, etag='1'), ObjectRow('b', 2, etag='2'), ObjectRow('c/', 0, folder=True), ObjectRow('d', 4, etag='4')]
+    listed = [ObjectRow('a', 1, etag='1'), ObjectRow('b', 2, etag='changed'), ObjectRow('c/', 0, folder=True), ObjectRow('d', 4, folder=True),
+        ObjectRow('e', 5, etag='5')]
+    added, removed, changed = diff_rows(shown, listed)
+    assert [row.name for row in added] == ['d', 'e']
+    assert [row.name for row in removed] == ['d']
+    assert [row.name for row in changed] == ['b']
+
+
+def test_diff_rows_size_change_and_nothing_listed():
+    shown = [ObjectRow('a', 1, etag='1')]
+    added, removed, changed = diff_rows(shown, [ObjectRow('a', 2, etag='1')])
+    assert (added, removed, [row.name for row in changed]) == ([], [], ['a'])
+    added, removed, changed = diff_rows(shown, [])
+    assert (added, [row.name for row in removed], changed) == ([], ['a'], [])
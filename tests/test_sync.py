@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pytest
+
+from oci_manager import MEBIBYTE
+from sync import LocalFile, SyncAction, compare, plan_sync, file_md5, multipart_part_sizes, same_content, UPLOAD, DOWNLOAD, DELETE
+from transfers import PartHasher, multipart_md5
+
+Remote = namedtuple('Remote', ['name', 'size', 'md5', 'time_modified'])
+
+MODIFIED = 1600000000
+
+
+def md5_of(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+def remote(name='file', size=4, md5=None, modified=MODIFIED):
+    return Remote(name, size, md5, datetime.fromtimestamp(modified, timezone.utc) if modified is not None else None)
+
+
+class Hashes():
+    """
+    Stands in for sync.file_md5 and records the files hashed
+    """
+    def __init__(self, md5):
+        self.md5 = md5
+        self.calls = []
+
+    def __call__(self, path, part_size=None):
+        self.calls.append((path, part_size))
+        return self.md5
+
+
+def test_compare_size_differs():
+    hashes = Hashes('md5')
+    assert compare(LocalFile('file', '/file', 5, MODIFIED + 10), remote(md5='md5'), True, hash_file=hashes) == "size differs"
+    assert hashes.calls == []
+
+
+def test_compare_file_older_than_object_is_not_uploaded():
+    heads = []
+    hashes = Hashes('other')
+    assert compare(LocalFile('file', '/file', 4, MODIFIED - 10), remote(md5='md5'), True, hash_file=hashes, head_object=heads.append) is None
+    assert heads == [] and hashes.calls == []
+
+
+def test_compare_object_older_than_file_is_not_downloaded():
+    hashes = Hashes('other')
+    assert compare(LocalFile('file', '/file', 4, MODIFIED + 10), remote(md5='md5'), False, hash_file=hashes) is None
+    assert hashes.calls == []
+
+
+def test_compare_recorded_mtime_skips_hashing():
+    hashes = Hashes('other')
+    head_object = lambda name: {'opc-meta-mtime': str(MODIFIED - 100.4)}
+    local = LocalFile('file', '/file', 4, MODIFIED - 100)
+    assert compare(local, remote(md5='md5', modified=MODIFIED - 200), True, hash_file=hashes, head_object=head_object) is None
+    assert hashes.calls == []
+
+
+@pytest.mark.parametrize('upload, md5, expected', [
+    (True, 'md5', None),
+    (True, 'other', "MD5 differs"),
+    (False, 'other', "MD5 differs"),
+])
+def test_compare_hashes_when_the_times_disagree(upload, md5, expected):
+    hashes = Hashes(md5)
+    head_object = lambda name: {'opc-meta-mtime': str(MODIFIED + 500)}
+    local = LocalFile('file', '/file', 4, MODIFIED + 10 if upload else MODIFIED - 10)
+    assert compare(local, remote(md5='md5'), upload, hash_file=hashes, head_object=head_object) == expected
+    assert hashes.calls == [('/file', None)]
+
+
+@pytest.mark.parametrize('upload, expected', [(True, "newer"), (False, "older")])
+def test_compare_without_md5_goes_by_time(upload, expected):
+    local = LocalFile('file', '/file', 4, MODIFIED + 10 if upload else MODIFIED - 10)
+    assert compare(local, remote(md5=None), upload, hash_file=Hashes('md5')) == expected
+
+
+def test_compare_checksum_hashes_every_file():
+    hashes = Hashes('other')
+    local = LocalFile('file', '/file', 4, MODIFIED - 10)
+    assert compare(local, remote(md5='md5'), True, checksum=True, hash_file=hashes) == "MD5 differs"
+    assert hashes.calls == [('/file', None)]
+    assert compare(local, remote(md5=None), True, checksum=True, hash_file=hashes) == "MD5 unavailable"
+
+
+def test_compare_multipart_uses_recorded_part_size():
+    hashes = Hashes('md5-3')
+    head_object = lambda name: {'opc-meta-partsize': str(10 * MEBIBYTE)}
+    local = LocalFile('file', '/file', 25 * MEBIBYTE, MODIFIED + 10)
+    assert compare(local, remote(size=25 * MEBIBYTE, md5='md5-3'), True, hash_file=hashes, head_object=head_object) is None
+    assert hashes.calls == [('/file', 10 * MEBIBYTE)]
+
+
+def test_compare_cancelled_before_hashing():
+    hashes = Hashes('other')
+    local = LocalFile('file', '/file', 4, MODIFIED + 10)
+    assert compare(local, remote(md5='md5'), True, hash_file=hashes, is_cancelled=lambda: True) is None
+    assert hashes.calls == []
+
+
+def test_multipart_part_sizes():
+    assert multipart_part_sizes(21 * MEBIBYTE, 3) == [10 * MEBIBYTE, 7 * MEBIBYTE]
+    assert multipart_part_sizes(21 * MEBIBYTE, 1) == [128 * MEBIBYTE, 21 * MEBIBYTE]
+    assert multipart_part_sizes(21 * MEBIBYTE, 50) == []
+
+
+def test_file_md5_multipart(tmp_path):
+    data = os.urandom(2500)
+    path = tmp_path / 'file'
+    path.write_bytes(data)
+    parts = [md5_of(data[start:start + 1000]) for start in range(0, len(data), 1000)]
+    assert file_md5(str(path)) == md5_of(data)
+    assert file_md5(str(path), 1000) == multipart_md5(parts)
+    assert multipart_md5(parts).endswith('-3')
+
+
+def test_same_content_guesses_the_part_size(tmp_path):
+    data = os.urandom(21 * MEBIBYTE)
+    path = tmp_path / 'file'
+    path.write_bytes(data)
+    hasher = PartHasher(7 * MEBIBYTE)
+    hasher.update(data)
+    local = LocalFile('file', str(path), len(data), MODIFIED)
+    assert same_content(local, multipart_md5(hasher.part_md5s())) is True
+    assert same_content(local, 'unknown-3') is None
+    assert same_content(local, md5_of(data)) is True
+    assert same_content(local, md5_of(b'other')) is False
+    assert same_content(local, None) is None
+
+
+def test_plan_sync_upload():
+    local_files = [LocalFile(name, '/dir/' + name, 4, MODIFIED + 10) for name in ['a', 'b/c', 'd']]
+    remote_objects = [remote('p/', 0), remote('p/a', 5), remote('p/b/c', 4, 'md5'), remote('p/e', 4)]
+    actions = list(plan_sync('/dir', local_files, remote_objects, 'p/', upload=True, hash_file=Hashes('md5')))
+    assert actions == [SyncAction(UPLOAD, 'p/a', '/dir/a', 4, "size differs"), SyncAction(UPLOAD, 'p/d', '/dir/d', 4, "missing")]
+
+    actions = list(plan_sync('/dir', local_files, remote_objects, 'p/', upload=True, delete=True, hash_file=Hashes('md5')))
+    assert SyncAction(DELETE, 'p/e', None, 4, "not in directory") in actions
+
+
+def test_plan_sync_download():
+    local_files = [LocalFile('a', '/dir/a', 4, MODIFIED - 10), LocalFile('z', '/dir/z', 4, MODIFIED)]
+    remote_objects = [remote('p/a', 4, 'md5'), remote('p/b/c', 4)]
+    actions = list(plan_sync('/dir', local_files, remote_objects, 'p/', upload=False, delete=True, hash_file=Hashes('other')))
+    assert actions == [SyncAction(DOWNLOAD, 'p/a', '/dir/a', 4, "MD5 differs"),
+        SyncAction(DOWNLOAD, 'p/b/c', os.path.join('/dir', 'b', 'c'), 4, "missing"),
+        SyncAction(DELETE, None, '/dir/z', 4, "not in bucket")]
+
+
+def test_plan_sync_stops_when_cancelled():
+    local_files = [LocalFile(str(i), '/dir/' + str(i), 4, MODIFIED) for i in range(10)]
+    checks = []
+    is_cancelled = lambda: checks.append(None) or len(checks) > 3
+    assert len(list(plan_sync('/dir', local_files, [], '', upload=True, is_cancelled=is_cancelled))) == 3
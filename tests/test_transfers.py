@@ -0,0 +1,156 @@
+import base64
+import hashlib
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from transfers import OrderedHasher, RangedDownloader, DownloadJournal, ChecksumMismatch, expected_md5
+
+
+def md5_of(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+class Response():
+    def __init__(self, headers=None, data=None):
+        self.headers = headers or {}
+        self.data = data
+
+
+class Body():
+    def __init__(self, client, data, delay=0):
+        self.client = client
+        self.content = data
+        self.delay = delay
+
+    def iter_content(self, chunk_size):
+        with self.client.lock:
+            self.client.running += 1
+            self.client.most_running = max(self.client.most_running, self.client.running)
+        try:
+            for start in range(0, len(self.content), chunk_size):
+                time.sleep(self.delay)
+                yield self.content[start:start + chunk_size]
+        finally:
+            with self.client.lock:
+                self.client.running -= 1
+
+
+class FakeObjectStorage():
+    """
+    Serves one object, with a random delay per chunk so ranges finish out of order
+    """
+    def __init__(self, data, headers, corrupt=0):
+        self.data = data
+        self.headers = headers
+        self.corrupt = corrupt
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+        self.gets = []
+
+    def head_object(self, namespace, bucket_name, object_name):
+        return Response(dict(self.headers, **{'Content-Length': str(len(self.data)), 'etag': 'etag'}))
+
+    def get_object(self, namespace, bucket_name, object_name, range=None, if_match=None):
+        start, end = (int(n) for n in range[len('bytes='):].split('-')) if range else (0, len(self.data) - 1)
+        data = bytearray(self.data[start:end + 1])
+        with self.lock:
+            self.gets.append(start)
+            if self.corrupt:
+                self.corrupt -= 1
+                data[len(data) // 2] ^= 0xff
+        return Response(data=Body(self, bytes(data), random.random() / 1000))
+
+
+def test_ordered_hasher_hashes_ranges_finished_out_of_order():
+    data = os.urandom(10000)
+    ordered = OrderedHasher(len(data))
+    ranges = [(start, min(start + 1000, len(data)) - 1) for start in range(0, len(data), 1000)]
+    hashers = [ordered.range(start) for start, _ in ranges]
+    # Half of each range arrives, then the ranges finish last to first
+    for hasher, (start, end) in zip(hashers, ranges):
+        hasher.update(data[start:start + 500])
+    for hasher, (start, end) in reversed(list(zip(hashers, ranges))):
+        hasher.update(data[start + 500:end + 1])
+        hasher.part_md5s()
+    assert ordered.part_md5s() == [md5_of(data)]
+    assert not ordered.held
+
+
+def test_ordered_hasher_waits_for_the_window():
+    ordered = OrderedHasher(2000)
+    first = ordered.range(0)
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(ordered.wait(2000)))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    first.update(b'x' * 1000)
+    waiter.join(1)
+    assert waited == [True]
+    assert ordered.wait(0)
+    ordered.stop()
+    assert not ordered.wait(10 ** 6)
+
+
+@pytest.mark.parametrize('size', [0, 5, 3 * 4096 + 1, 20 * 4096 + 7])
+def test_single_part_download_is_fetched_concurrently_and_checked(tmp_path, size):
+    data = os.urandom(size)
+    client = FakeObjectStorage(data, {'content-md5': md5_of(data)})
+    downloader = RangedDownloader(client, 'namespace', 'bucket', range_size=4096, concurrency=4)
+    path = str(tmp_path / 'object')
+    downloader.download('object', path)
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    if size > 8 * 4096:
+        assert client.most_running > 1
+
+
+def test_single_part_download_is_fetched_again_on_a_mismatch(tmp_path):
+    data = os.urandom(20 * 4096)
+    client = FakeObjectStorage(data, {'content-md5': md5_of(data)}, corrupt=1)
+    downloader = RangedDownloader(client, 'namespace', 'bucket', range_size=4096, concurrency=4)
+    path = str(tmp_path / 'object')
+    downloader.download('object', path)
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert len(client.gets) == 40
+
+    client.corrupt = 2 * 20
+    with pytest.raises(ChecksumMismatch):
+        downloader.download('object', path)
+
+
+@pytest.mark.parametrize('headers, size, expected', [
+    ({'content-md5': 'md5'}, 10, ('md5', None)),
+    ({'opc-multipart-md5': 'md5-3', 'opc-meta-partsize': '4'}, 10, ('md5-3', 4)),
+    ({'opc-multipart-md5': 'md5-2', 'opc-meta-partsize': '4'}, 10, (None, None)),
+    ({'opc-multipart-md5': 'md5-3'}, 10, (None, None)),
+    ({'opc-multipart-md5': 'md5-3', 'opc-meta-partsize': 'big'}, 10, (None, None)),
+    ({}, 10, (None, None)),
+])
+def test_expected_md5(headers, size, expected):
+    assert expected_md5(headers, size) == expected
+
+
+def test_download_journal_records_ranges(tmp_path):
+    path = str(tmp_path / 'object.journal')
+    journal = DownloadJournal(path, 'etag', 10, 4)
+    assert journal.ranges() == [(0, 3), (4, 7), (8, 9)]
+    journal.complete((0, 3), ['md5'])
+    journal.complete((8, 9))
+
+    loaded = DownloadJournal.load(path, 'etag', 10)
+    assert loaded.completed == {0, 8}
+    assert loaded.digests == {0: ['md5']}
+    assert loaded.completed_bytes() == 6
+    assert loaded.completed_prefix() == [(0, 3)]
+    assert DownloadJournal.load(path, 'changed', 10) is None
+    assert DownloadJournal.load(path, 'etag', 11) is None
+
+    loaded.discard()
+    assert DownloadJournal.load(path, 'etag', 10) is None
@@ -0,0 +1,66 @@
+import threading
+
+from transfers import UploadJob
+from upload_thread import UploadThread
+
+
+class FakeManager():
+    def get_os(self):
+        return None
+
+    def get_namespace(self):
+        return 'namespace'
+
+    def get_upload_manager(self, *args, **kwargs):
+        return None
+
+
+def make_jobs(count):
+    return [UploadJob('file{}'.format(i), '/nowhere/file{}'.format(i), '1 KB', 1024) for i in range(count)]
+
+
+def test_failed_resumed_upload_keeps_jobs_not_started():
+    jobs = make_jobs(10)
+    thread = UploadThread(([], None), 'bucket', FakeManager(), 0, concurrency=2, jobs=jobs)
+    uploaded = []
+    finished = []
+    thread.file_uploaded.connect(lambda name, size, bucket, bits: uploaded.append(name))
+    thread.all_files_uploaded.connect(finished.append)
+    thread.connection_failed = lambda: None
+    first_failed = threading.Event()
+
+    def fail_first(job):
+        if job is jobs[0]:
+            first_failed.set()
+            raise IOError("Connection reset")
+        first_failed.wait(5)
+        return True
+
+    thread.upload_file = fail_first
+    thread.run()
+    assert thread.failed
+    assert not finished
+    assert jobs[0] in thread.retry_jobs
+    assert sorted(uploaded + [job.object_name for job in thread.retry_jobs]) == sorted(job.object_name for job in jobs)
+
+    thread.upload_file = lambda job: True
+    thread.run()
+    assert sorted(uploaded) == sorted(job.object_name for job in jobs)
+    assert finished == [0]
+    assert thread.retry_jobs == []
+
+
+def test_paused_resumed_upload_keeps_jobs_not_started():
+    jobs = make_jobs(6)
+    thread = UploadThread(([], None), 'bucket', FakeManager(), 0, concurrency=1, jobs=jobs)
+    uploaded = []
+    thread.file_uploaded.connect(lambda name, size, bucket, bits: uploaded.append(name))
+
+    def pause_after_first(job):
+        thread.paused = True
+        return True
+
+    thread.upload_file = pause_after_first
+    thread.run()
+    assert uploaded == ['file0']
+    assert thread.retry_jobs == jobs[1:]